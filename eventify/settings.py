@@ -25,6 +25,8 @@ env = environ.Env()
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = env('SECRET_KEY', default='django-insecure-jm&m3yai0_h&k=o+&q)*fb2l4%d%8e8qtzh0ph8v3-egnxw4zh')
+# Anciennes clés encore acceptées (rotation) : sessions, QR signés des billets déjà émis
+SECRET_KEY_FALLBACKS = env.list('SECRET_KEY_FALLBACKS', default=[])
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool('DEBUG', default=True)
@@ -88,6 +90,11 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 }
 
+# Cache partagé entre workers en production (ex. CACHE_URL=redis://…) ; mémoire locale par défaut
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
 
 
 # Password validation
@@ -128,6 +135,69 @@ STATIC_URL = 'static/'
 
 MEDIA_URL  = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# En production les médias (dont les PDF privés) ne passent pas par Django
+SERVE_MEDIA = env.bool('SERVE_MEDIA', default=DEBUG)
+
+# Téléchargement des PDF après contrôle des droits : "" (Django), "nginx" (X-Accel-Redirect)
+# ou "apache" (X-Sendfile). Le préfixe doit correspondre à une location `internal` du proxy.
+TICKET_PDF_SENDFILE     = env.str('TICKET_PDF_SENDFILE', default='')
+TICKET_PDF_ACCEL_PREFIX = env.str('TICKET_PDF_ACCEL_PREFIX', default='/protected-media/')
+
+# Génération des PDF de billets : "eager" (après commit), "lazy" (au premier
+# téléchargement) ou "background" (file PdfJob consommée par `manage.py pdf_worker`)
+TICKET_PDF_MODE          = env.str('TICKET_PDF_MODE', default='background')
+# Moteur : "template" (PDF de base par catégorie + QR tamponné) ou "weasyprint" (HTML complet)
+TICKET_PDF_RENDERER      = env.str('TICKET_PDF_RENDERER', default='template')
+TICKET_PDF_TEMPLATE_DIR  = env.str('TICKET_PDF_TEMPLATE_DIR', default=str(BASE_DIR / 'var' / 'ticket_templates'))
+TICKET_QR_CACHE_SIZE     = env.int('TICKET_QR_CACHE_SIZE', default=2048)  # QR vectoriels gardés en mémoire
+TICKET_QR_ACCEPT_LEGACY  = env.bool('TICKET_QR_ACCEPT_LEGACY', default=True)  # QR non signés (billets antérieurs)
+PDF_WORKER_PROCESSES     = env.int('PDF_WORKER_PROCESSES', default=2)
+PDF_WORKER_BATCH_SIZE    = env.int('PDF_WORKER_BATCH_SIZE', default=50)
+PDF_WORKER_MAX_ATTEMPTS  = env.int('PDF_WORKER_MAX_ATTEMPTS', default=5)
+PDF_WORKER_RETRY_BACKOFF = env.int('PDF_WORKER_RETRY_BACKOFF', default=30)  # secondes
+PDF_WORKER_POLL_INTERVAL = env.float('PDF_WORKER_POLL_INTERVAL', default=1.0)  # secondes
+
+# Journal des scans écrit par lots, hors du chemin de réponse (tickets/utils/scan_log.py)
+SCAN_LOG_WRITE_BEHIND       = env.bool('SCAN_LOG_WRITE_BEHIND', default=False)
+SCAN_LOG_BATCH_SIZE         = env.int('SCAN_LOG_BATCH_SIZE', default=200)
+SCAN_LOG_FLUSH_INTERVAL_MS  = env.int('SCAN_LOG_FLUSH_INTERVAL_MS', default=250)
+SCAN_LOG_QUEUE_SIZE         = env.int('SCAN_LOG_QUEUE_SIZE', default=10000)  # au-delà : back-pressure
+# Recul du curseur de manifeste (s) : couvre les transactions committées en retard
+SCAN_MANIFEST_CURSOR_LAG    = env.int('SCAN_MANIFEST_CURSOR_LAG', default=30)
+SCAN_BATCH_MAX_SIZE         = env.int('SCAN_BATCH_MAX_SIZE', default=10000)  # entrées par POST scan/batch
+# Index qr_hash en mémoire par worker, jour J (tickets/utils/scan_cache.py)
+SCAN_CACHE_ENABLED          = env.bool('SCAN_CACHE_ENABLED', default=False)
+SCAN_CACHE_WINDOW_HOURS     = env.int('SCAN_CACHE_WINDOW_HOURS', default=12)  # événements préchargés
+SCAN_CACHE_REFRESH_INTERVAL = env.float('SCAN_CACHE_REFRESH_INTERVAL', default=2.0)  # secondes
+SCAN_CACHE_RELOAD_INTERVAL  = env.float('SCAN_CACHE_RELOAD_INTERVAL', default=300.0)  # secondes
+
+# Catégories découpées en buckets (tickets/utils/inventory.py) : période de `manage.py rebalance_inventory`
+INVENTORY_REBALANCE_INTERVAL = env.float('INVENTORY_REBALANCE_INTERVAL', default=2.0)  # secondes
+
+# Retenue des places d'une commande PENDING jusqu'au paiement (tickets/utils/holds.py) ;
+# 0 = vente immédiate. Les retenues échues sont libérées par `manage.py expire_holds`.
+ORDER_HOLD_TTL            = env.int('ORDER_HOLD_TTL', default=0)  # secondes (ex. 900)
+ORDER_HOLD_SWEEP_CHUNK    = env.int('ORDER_HOLD_SWEEP_CHUNK', default=500)  # commandes par transaction
+ORDER_HOLD_SWEEP_INTERVAL = env.float('ORDER_HOLD_SWEEP_INTERVAL', default=15.0)  # secondes
+
+# File d'attente des ouvertures de vente (tickets/utils/waiting_room.py), activée par événement
+QUEUE_ADMISSION_WINDOW  = env.int('QUEUE_ADMISSION_WINDOW', default=600)  # validité (s) d'un jeton admis
+QUEUE_POLL_MAX_INTERVAL = env.int('QUEUE_POLL_MAX_INTERVAL', default=30)  # secondes entre deux sondages
+
+# Clés Idempotency-Key de POST /api/orders/ (tickets/utils/idempotency.py), purgées par `manage.py purge_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', default=86400)  # secondes
+
+# GET /api/events/<id>/availability (tickets/utils/availability.py) : fraîcheur puis valeur périmée servie
+# pendant le recalcul par un seul worker
+AVAILABILITY_CACHE_TTL   = env.float('AVAILABILITY_CACHE_TTL', default=2.0)  # secondes
+AVAILABILITY_CACHE_STALE = env.float('AVAILABILITY_CACHE_STALE', default=30.0)  # secondes
+
+# Lectures événements / lieux en cache, invalidées par version de modèle (tickets/utils/response_cache.py)
+RESPONSE_CACHE_ENABLED = env.bool('RESPONSE_CACHE_ENABLED', default=False)
+RESPONSE_CACHE_TTL     = env.int('RESPONSE_CACHE_TTL', default=3600)  # secondes : purge des versions dépassées
+
+# Listes commandes / billets / scans paginées par clé (tickets/pagination.py) ; ?page_size= jusqu'à 500
+API_PAGE_SIZE = env.int('API_PAGE_SIZE', default=50)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -10,5 +10,8 @@ urlpatterns = [
     path("", include("web.urls")),
 ]
 
+# Médias servis par Django uniquement en développement ; en production le proxy
+# frontal s'en charge (PDF des billets : X-Accel-Redirect / X-Sendfile)
+if settings.SERVE_MEDIA:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,53 @@
+"""
+Champs de modèle propres à l'application.
+"""
+from django.core import exceptions
+from django.db import models
+
+
+class HexDigestField(models.BinaryField):
+    """Empreinte stockée en binaire (`max_length` octets), manipulée en hexadécimal.
+
+    La colonne (bytea / BLOB) et son index font la moitié d'un CharField
+    hexadécimal ; côté Python, formulaires, API et requêtes (`exact`, `in`)
+    la valeur reste une chaîne hexadécimale minuscule.
+    """
+
+    description = "Empreinte binaire exposée en hexadécimal"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("max_length", 32)
+        super().__init__(*args, **kwargs)
+
+    def get_default(self):
+        default = super().get_default()
+        return "" if default == b"" else default
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else bytes(value).hex()
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return bytes(value).hex()
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, memoryview)):
+            return value
+        try:
+            raw = bytes.fromhex(value)
+        except (TypeError, ValueError):
+            raise exceptions.ValidationError(
+                "« %(value)s » n'est pas une empreinte hexadécimale valide.",
+                code="invalid", params={"value": value},
+            )
+        if len(raw) != self.max_length:
+            raise exceptions.ValidationError(
+                "Empreinte de %(size)d octets attendue.",
+                code="invalid", params={"size": self.max_length},
+            )
+        return raw
+
+    def value_to_string(self, obj):
+        # Sérialisation (dumpdata) en hexadécimal plutôt qu'en base64
+        return self.value_from_object(obj) or ""
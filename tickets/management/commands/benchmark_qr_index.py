@@ -0,0 +1,84 @@
+import hashlib
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# Deux tables jetables, même contenu : empreinte hexadécimale (avant) et binaire (après)
+TABLES = {
+    "hexa (varchar 64)": ("tickets_bench_qr_hex", "varchar(64)", lambda digest: digest.hex()),
+    "binaire (32 octets)": ("tickets_bench_qr_bin", None, lambda digest: digest),
+}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark de l'index unique sur qr_hash : taille de l'index et latence de recherche, "
+            "stockage hexadécimal (CharField) contre binaire (HexDigestField). Les tables sont supprimées ensuite.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5_000_000, help="Nombre de billets simulés.")
+        parser.add_argument("--lookups", type=int, default=20_000, help="Nombre de recherches chronométrées.")
+
+    def handle(self, *args, **options):
+        rows, lookups = options["rows"], options["lookups"]
+        binary_type = "bytea" if connection.vendor == "postgresql" else "blob"
+        seed = os.urandom(16)
+        probes = [self._digest(seed, random.randrange(rows)) for _ in range(lookups)]
+        try:
+            for label, (table, column_type, convert) in TABLES.items():
+                self._create(table, column_type or binary_type)
+                start = time.perf_counter()
+                self._fill(table, seed, rows, convert)
+                fill = time.perf_counter() - start
+                size = self._index_size(table)
+                latency = self._lookup(table, [convert(p) for p in probes])
+                self.stdout.write(
+                    f"{label:<20} {rows} lignes (remplissage {fill:.1f}s) — index "
+                    f"{size / 1024 / 1024:,.1f} Mo, {size / rows:.1f} o/ligne — "
+                    f"recherche {latency:.1f} µs"
+                )
+        finally:
+            with connection.cursor() as cursor:
+                for table, _, _ in TABLES.values():
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    @staticmethod
+    def _digest(seed, number):
+        return hashlib.sha256(seed + number.to_bytes(8, "big")).digest()
+
+    def _create(self, table, column_type):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE TABLE {table} (id integer PRIMARY KEY, qr_hash {column_type} NOT NULL)")
+            cursor.execute(f"CREATE UNIQUE INDEX {table}_qr_hash ON {table} (qr_hash)")
+
+    def _fill(self, table, seed, rows, convert, chunk=10_000):
+        sql = f"INSERT INTO {table} (id, qr_hash) VALUES (%s, %s)"
+        for start in range(0, rows, chunk):
+            params = [(n, convert(self._digest(seed, n))) for n in range(start, min(start + chunk, rows))]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {table}")
+
+    def _index_size(self, table):
+        """Taille de l'index unique en octets (pages réellement occupées)."""
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_relation_size(%s)", [f"{table}_qr_hash"])
+            else:
+                cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s", [f"{table}_qr_hash"])
+            return cursor.fetchone()[0] or 0
+
+    def _lookup(self, table, probes):
+        """Latence moyenne (µs) d'un SELECT par égalité sur qr_hash."""
+        sql = f"SELECT id FROM {table} WHERE qr_hash = %s"
+        with connection.cursor() as cursor:
+            start = time.perf_counter()
+            for probe in probes:
+                cursor.execute(sql, [probe])
+                cursor.fetchone()
+            elapsed = time.perf_counter() - start
+        return elapsed / len(probes) * 1_000_000
@@ -0,0 +1,89 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from tickets.models import Event, Order, ScanLog, Ticket, TicketType, Venue
+from tickets.serializers import ScanBatchEntrySerializer
+from tickets.utils.scan import scan_batch, scan_ticket
+from tickets.utils.scan_cache import scan_cache
+from tickets.utils.scan_log import scan_log_buffer
+
+
+class Command(BaseCommand):
+    help = ("Benchmark du scan au portique : scans/s pour les chemins VALID, DUPLICATE et INVALID, "
+            "un par un ou par lots rejoués (--batch). Les données de test sont créées puis supprimées.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=2000, help="Nombre de billets scannés.")
+        parser.add_argument("--write-behind", action="store_true",
+                            help="Journal des scans différé (SCAN_LOG_WRITE_BEHIND) pendant le benchmark.")
+        parser.add_argument("--cache", action="store_true",
+                            help="Index qr_hash en mémoire (SCAN_CACHE_ENABLED), préchargé hors chronométrage.")
+        parser.add_argument("--batch", type=int, default=0,
+                            help="Taille des lots rejoués via scan/batch (ex. 10000) ; 0 = scans unitaires.")
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        user = get_user_model().objects.create_user(f"benchmark_scan_{uuid.uuid4().hex[:8]}")
+        venue = Venue.objects.create(name="Benchmark Scan", address="Benchmark", capacity=count)
+        try:
+            event = Event.objects.create(title="Benchmark Scan", venue=venue, quota_global=count,
+                                         start_time=timezone.now(), end_time=timezone.now())
+            ticket_type = TicketType.objects.create(event=event, name="Standard",
+                                                    price=Decimal("1000.00"), quota=count)
+            order = Order.objects.create(user=user)
+            tickets = [Ticket(order=order, ticket_type=ticket_type) for _ in range(count)]
+            for ticket in tickets:
+                ticket.qr_hash = ticket._generate_qr_hash()
+            Ticket.objects.bulk_create(tickets, batch_size=500)
+            hashes = [t.qr_hash for t in tickets]
+
+            # Premier passage : VALID, second : DUPLICATE, puis QR inconnus
+            if options["batch"]:
+                self._run_batches("VALID", hashes, options["batch"])
+                self._run_batches("DUPLICATE", hashes, options["batch"])
+                self._run_batches("INVALID", [uuid.uuid4().hex * 2 for _ in range(count)], options["batch"])
+                return
+            with override_settings(SCAN_LOG_WRITE_BEHIND=options["write_behind"], SCAN_CACHE_ENABLED=options["cache"]):
+                if options["cache"]:
+                    scan_cache().load()
+                self._run("VALID", hashes)
+                self._run("DUPLICATE", hashes)
+                self._run("INVALID", [uuid.uuid4().hex * 2 for _ in range(count)])
+            if options["write_behind"]:
+                scan_log_buffer().close()  # attend aussi le lot en cours d'écriture
+        finally:
+            ScanLog.objects.filter(device_info="benchmark_scan").delete()
+            user.delete()  # commandes et billets en cascade
+            venue.events.all().delete()
+            venue.delete()
+
+    def _run(self, expected, hashes):
+        start = time.perf_counter()
+        results = [scan_ticket(qr_hash, device_info="benchmark_scan")[0] for qr_hash in hashes]
+        self._report(expected, expected, results, time.perf_counter() - start)
+
+    def _run_batches(self, expected, hashes, size):
+        """Chemin complet hors HTTP : validation du corps JSON + application du lot."""
+        now = timezone.now()
+        payload = [{"qr_hash": h, "scanned_at": now.isoformat(), "device": "benchmark_scan"} for h in hashes]
+        start = time.perf_counter()
+        results = []
+        for offset in range(0, len(payload), size):
+            serializer = ScanBatchEntrySerializer(data=payload[offset:offset + size], many=True)
+            serializer.is_valid(raise_exception=True)
+            results += scan_batch(serializer.validated_data)
+        self._report(expected, f"{expected} (lots de {size})", results, time.perf_counter() - start)
+
+    def _report(self, expected, label, results, elapsed):
+        if any(result != expected for result in results):
+            self.stdout.write(self.style.ERROR(f"{label}: résultats inattendus"))
+        self.stdout.write(
+            f"{label:<9} {len(results)} scans en {elapsed:.3f}s → "
+            f"{len(results) / elapsed:,.0f} scans/s ({elapsed / len(results) * 1000:.3f} ms/scan)"
+        )
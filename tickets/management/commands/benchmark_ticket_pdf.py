@@ -0,0 +1,69 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tickets.models import Event, Ticket, TicketType, Venue
+from tickets.utils import qr
+from tickets.utils.pdf import build_ticket_pdf_html
+from tickets.utils.pdf_template import get_compiled_template, render_ticket_pdf
+
+
+class Command(BaseCommand):
+    help = ("Micro-benchmark du rendu des billets, modèle compilé vs WeasyPrint complet : encodage QR "
+            "seul, premier rendu (cache QR froid) et rendu suivant (cache QR chaud) chronométrés séparément.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500, help="Nombre de billets rendus par moteur.")
+        parser.add_argument("--renderer", choices=["template", "weasyprint", "all"], default="all")
+
+    def handle(self, *args, **options):
+        # Objets non sauvegardés : le benchmark ne touche pas à la base
+        venue = Venue(pk=1, name="Palais des Sports", address="Warda, Yaoundé", capacity=5000)
+        event = Event(pk=1, title="Benchmark Live", venue=venue, quota_global=5000,
+                      start_time=timezone.now(), end_time=timezone.now())
+        ticket_type = TicketType(pk=1, event=event, name="Standard", price=Decimal("5000.00"), quota=5000)
+        tickets = [Ticket(id=uuid.uuid4(), ticket_type=ticket_type) for _ in range(options["count"])]
+        for ticket in tickets:
+            ticket.qr_hash = ticket._generate_qr_hash()  # QR = contenu signé, comme en production
+
+        # Pour chaque moteur : (encodage QR seul, rendu complet)
+        # --count au-delà de TICKET_QR_CACHE_SIZE : le passage « cached » réencode une partie des QR
+        renderers = {
+            "template": (qr.qr_pdf_ops, render_ticket_pdf),
+            "weasyprint": (qr.qr_svg, build_ticket_pdf_html),
+        }
+        if options["renderer"] != "all":
+            renderers = {options["renderer"]: renderers[options["renderer"]]}
+
+        get_compiled_template(ticket_type)  # compilation du PDF de base hors chronométrage
+        for name, (encode_qr, render) in renderers.items():
+            qr.clear_cache()
+            qr_time = self._time(lambda t: encode_qr(t.qr_code), tickets)
+            try:
+                # Premier rendu d'un billet : encodage QR compris (cache vidé)
+                qr.clear_cache()
+                cold_time = self._time(render, tickets)
+                # Rendus suivants : QR servis par le cache, reste l'assemblage / la mise en page
+                cached_time = self._time(render, tickets)
+            except (ImportError, OSError) as exc:
+                self.stdout.write(self.style.WARNING(f"{name:<11} indisponible : {exc}"))
+                continue
+            self._report(name, "qr", qr_time, len(tickets))
+            self._report(name, "cold", cold_time, len(tickets))
+            self._report(name, "cached", cached_time, len(tickets))
+
+    def _report(self, renderer, phase, elapsed, count):
+        self.stdout.write(
+            f"{renderer:<11} {phase:<7} {count} billets en {elapsed:.3f}s → "
+            f"{count / elapsed:,.0f} billets/s ({elapsed / count * 1000:.3f} ms/billet)"
+        )
+
+    @staticmethod
+    def _time(func, tickets) -> float:
+        start = time.perf_counter()
+        for ticket in tickets:
+            func(ticket)
+        return time.perf_counter() - start
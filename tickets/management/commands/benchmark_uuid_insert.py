@@ -0,0 +1,74 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tickets.utils.ids import uuid7
+
+# Table jetable calquée sur ScanLog : clé primaire UUID + quelques colonnes
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark d'insertion : clés primaires UUID v4 (aléatoires) contre v7 (ordonnées dans le temps). "
+            "Débit global et du dernier dixième, taille de l'index de clé primaire. Les tables sont supprimées ensuite.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Nombre de lignes insérées par variante.")
+        parser.add_argument("--batch", type=int, default=1000, help="Lignes par transaction.")
+
+    def handle(self, *args, **options):
+        rows, batch = options["rows"], options["batch"]
+        postgres = connection.vendor == "postgresql"
+        try:
+            for name, generate in GENERATORS.items():
+                table = f"tickets_bench_{name}"
+                self._create(table, postgres)
+                timings = self._fill(table, generate, rows, batch, postgres)
+                elapsed = sum(timings)
+                tail = timings[-max(1, len(timings) // 10):]
+                tail_rows = min(rows, len(tail) * batch)
+                size = self._index_size(table, postgres)
+                self.stdout.write(
+                    f"{name}  {rows} lignes en {elapsed:.2f}s → {rows / elapsed:,.0f} lignes/s "
+                    f"(dernier dixième : {tail_rows / sum(tail):,.0f} lignes/s) — index PK "
+                    f"{size / 1024 / 1024:,.1f} Mo"
+                )
+        finally:
+            with connection.cursor() as cursor:
+                for name in GENERATORS:
+                    cursor.execute(f"DROP TABLE IF EXISTS tickets_bench_{name}")
+
+    def _create(self, table, postgres):
+        id_type = "uuid" if postgres else "char(32)"
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE TABLE {table} (id {id_type} NOT NULL PRIMARY KEY, "
+                f"result varchar(10) NOT NULL, device_info varchar(120) NOT NULL)"
+            )
+
+    def _fill(self, table, generate, rows, batch, postgres):
+        """Insère par transactions de `batch` lignes ; retourne la durée de chacune."""
+        sql = f"INSERT INTO {table} (id, result, device_info) VALUES (%s, %s, %s)"
+        timings = []
+        for start in range(0, rows, batch):
+            params = [
+                (value if postgres else value.hex, "VALID", "benchmark_uuid_insert")
+                for value in (generate() for _ in range(min(batch, rows - start)))
+            ]
+            began = time.perf_counter()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            timings.append(time.perf_counter() - began)
+        return timings
+
+    def _index_size(self, table, postgres):
+        """Taille de l'index de clé primaire en octets."""
+        with connection.cursor() as cursor:
+            if postgres:
+                cursor.execute("SELECT pg_relation_size(%s)", [f"{table}_pkey"])
+            else:
+                cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s", [f"sqlite_autoindex_{table}_1"])
+            return cursor.fetchone()[0] or 0
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tickets.utils.holds import expire_holds
+
+
+class Command(BaseCommand):
+    help = ("Libère les places retenues par les commandes non payées à l'échéance : "
+            "commandes CANCELLED, billets invalidés, quotas rendus (par tranches).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=settings.ORDER_HOLD_SWEEP_CHUNK,
+                            help="Commandes libérées par transaction.")
+        parser.add_argument("--interval", type=float, default=settings.ORDER_HOLD_SWEEP_INTERVAL,
+                            help="Délai (s) entre deux passages.")
+        parser.add_argument("--once", action="store_true", help="Un seul passage puis arrêt.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                released = expire_holds(options["chunk_size"])
+                if released or options["once"]:
+                    self.stdout.write(f"{released} commande(s) expirée(s), places libérées.")
+                if options["once"]:
+                    break
+                connections.close_all()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du balayage des retenues.")
@@ -0,0 +1,80 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tickets.utils import pdf_queue
+from tickets.utils.pdf import init_render_process
+
+
+class Command(BaseCommand):
+    help = "Consomme la file PdfJob et génère les PDF des billets dans un pool de processus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=settings.PDF_WORKER_PROCESSES,
+                            help="Taille du pool de rendu (0 = rendu dans le processus courant).")
+        parser.add_argument("--batch-size", type=int, default=settings.PDF_WORKER_BATCH_SIZE)
+        parser.add_argument("--max-attempts", type=int, default=settings.PDF_WORKER_MAX_ATTEMPTS)
+        parser.add_argument("--backoff", type=int, default=settings.PDF_WORKER_RETRY_BACKOFF,
+                            help="Délai (s) avant le premier nouvel essai, doublé à chaque échec.")
+        parser.add_argument("--poll-interval", type=float, default=settings.PDF_WORKER_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Traiter les jobs prêts puis s'arrêter.")
+
+    def handle(self, *args, **options):
+        executor = None
+        if options["processes"] > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=options["processes"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_render_process,
+            )
+        try:
+            while True:
+                processed = self._run_batch(executor, options)
+                if options["once"] and not processed:
+                    break
+                if not processed:
+                    # Connexion rendue entre deux sondages (la file peut rester vide longtemps)
+                    connections.close_all()
+                    time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du worker PDF.")
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def _run_batch(self, executor, options) -> int:
+        jobs = pdf_queue.claim_jobs(options["batch_size"])
+        if not jobs:
+            return 0
+
+        done, failures = [], []
+        if executor is None:
+            for job_id, ticket_id, attempts in jobs:
+                try:
+                    pdf_queue.render_ticket(ticket_id)
+                    done.append(job_id)
+                except Exception as exc:
+                    failures.append((job_id, ticket_id, attempts, repr(exc)))
+        else:
+            futures = {
+                executor.submit(pdf_queue.render_ticket, ticket_id): (job_id, ticket_id, attempts)
+                for job_id, ticket_id, attempts in jobs
+            }
+            for future in as_completed(futures):
+                job_id, ticket_id, attempts = futures[future]
+                try:
+                    future.result()
+                    done.append(job_id)
+                except Exception as exc:
+                    failures.append((job_id, ticket_id, attempts, repr(exc)))
+
+        pdf_queue.mark_done(done)
+        for job_id, ticket_id, attempts, error in failures:
+            pdf_queue.mark_failed(job_id, ticket_id, attempts, error,
+                                  options["max_attempts"], options["backoff"])
+        self.stdout.write(f"{len(done)} PDF générés, {len(failures)} échec(s).")
+        return len(jobs)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tickets.utils.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Supprime par tranches les clés Idempotency-Key plus vieilles que IDEMPOTENCY_KEY_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Clés supprimées par requête.")
+
+    def handle(self, *args, **options):
+        purged = purge_expired(options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{purged} clé(s) d'idempotence supprimée(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tickets.utils.waiting_room import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Supprime par tranches les jetons de file d'attente expirés."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Jetons supprimés par requête.")
+
+    def handle(self, *args, **options):
+        purged = purge_expired(options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{purged} jeton(s) expiré(s) supprimé(s)."))
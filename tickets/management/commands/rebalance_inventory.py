@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tickets.models import TicketType
+from tickets.utils import inventory
+
+
+class Command(BaseCommand):
+    help = ("Inventaire découpé en buckets (ventes flash) : découpe une catégorie (--shard) "
+            "ou redistribue en boucle le stock restant entre les buckets.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ticket-type", type=int, action="append", dest="ticket_types",
+                            help="Limiter à une ou plusieurs catégories (id).")
+        parser.add_argument("--shard", type=int, metavar="N",
+                            help="Découper les catégories données en N buckets (0 = revenir au compteur unique).")
+        parser.add_argument("--interval", type=float, default=settings.INVENTORY_REBALANCE_INTERVAL,
+                            help="Délai (s) entre deux passages.")
+        parser.add_argument("--once", action="store_true", help="Un seul passage puis arrêt.")
+
+    def handle(self, *args, **options):
+        if options["shard"] is not None:
+            if not options["ticket_types"]:
+                raise CommandError("--shard exige --ticket-type.")
+            for ticket_type in TicketType.objects.filter(pk__in=options["ticket_types"]):
+                stock = inventory.shard(ticket_type, options["shard"])
+                self.stdout.write(f"{ticket_type} : {stock} place(s) en {options['shard']} bucket(s).")
+            return
+
+        try:
+            while True:
+                types = TicketType.objects.filter(inventory_shards__gt=0)
+                if options["ticket_types"]:
+                    types = types.filter(pk__in=options["ticket_types"])
+                moved = sum(inventory.rebalance(ticket_type) for ticket_type in types)
+                if moved or options["once"]:
+                    self.stdout.write(f"{moved} place(s) redistribuée(s).")
+                if options["once"]:
+                    break
+                connections.close_all()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du rééquilibrage.")
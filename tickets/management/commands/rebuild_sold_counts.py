@@ -0,0 +1,63 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from tickets.models import Event, InventoryBucket, SeatHold, TicketType
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs sold_count et held_count (TicketType et Event) à partir des billets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--event", type=int, action="append", dest="events",
+                            help="Limiter à un ou plusieurs événements (id).")
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options["events"]:
+            events = events.filter(pk__in=options["events"])
+
+        fixed = 0
+        for event in events.iterator():
+            with transaction.atomic():
+                # Même ordre de verrouillage que les achats : catégories puis événement
+                types = list(
+                    TicketType.objects.select_for_update()
+                    .filter(event=event)
+                    .order_by("pk")
+                )
+                Event.objects.select_for_update().get(pk=event.pk)
+                counts = dict(
+                    TicketType.objects.filter(event=event)
+                    .annotate(n=Count("tickets", filter=~Q(tickets__status="REFUNDED")))
+                    .values_list("pk", "n")
+                )
+                # Le stock découpé en buckets et non vendu reste compté (cf. utils/inventory.py)
+                for pk, free in (
+                    InventoryBucket.objects.filter(ticket_type__event=event)
+                    .order_by().values("ticket_type").annotate(free=Sum(F("capacity") - F("sold_count")))
+                    .values_list("ticket_type", "free")
+                ):
+                    counts[pk] += free
+                # Billets des commandes en attente : retenus, pas encore vendus (cf. utils/holds.py)
+                held = Counter(dict(
+                    SeatHold.objects.filter(ticket_type__event=event, bucketed=False)
+                    .order_by().values("ticket_type").annotate(n=Sum("quantity"))
+                    .values_list("ticket_type", "n")
+                ))
+                for tt in types:
+                    sold = counts[tt.pk] - held[tt.pk]
+                    if (tt.sold_count, tt.held_count) != (sold, held[tt.pk]):
+                        tt.sold_count, tt.held_count = sold, held[tt.pk]
+                        fixed += 1
+                TicketType.objects.bulk_update(types, ["sold_count", "held_count"])
+
+                total_held = sum(held.values())
+                total = sum(counts.values()) - total_held
+                fixed += (Event.objects.filter(pk=event.pk)
+                          .exclude(sold_count=total, held_count=total_held)
+                          .update(sold_count=total, held_count=total_held))
+
+        self.stdout.write(self.style.SUCCESS(f"Compteurs recalculés ({fixed} corrigé(s))."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tickets import views
+from tickets.utils.response_cache import VersionedCacheMixin, metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = "Hits / misses du cache des réponses de lecture (événements, lieux), tous workers confondus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Remet les compteurs à zéro après affichage.")
+
+    def handle(self, *args, **options):
+        names = [view.cache_name for view in vars(views).values()
+                 if isinstance(view, type) and issubclass(view, VersionedCacheMixin) and view.cache_name]
+        for name, stats in metrics(names).items():
+            ratio = "—" if stats["hit_ratio"] is None else f"{stats['hit_ratio']:.1%}"
+            self.stdout.write(f"{name:<10} hits {stats['hits']:>8}  misses {stats['misses']:>8}  taux {ratio}")
+        if options["reset"]:
+            reset_metrics(names)
+            self.stdout.write("Compteurs remis à zéro.")
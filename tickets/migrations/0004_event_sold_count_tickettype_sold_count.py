@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_sold_counts(apps, schema_editor):
+    Event = apps.get_model("tickets", "Event")
+    TicketType = apps.get_model("tickets", "TicketType")
+    sold = Count("tickets", filter=~Q(tickets__status="REFUNDED"))
+    for tt in TicketType.objects.annotate(n=sold).iterator():
+        TicketType.objects.filter(pk=tt.pk).update(sold_count=tt.n)
+    sold = Count("ticket_types__tickets", filter=~Q(ticket_types__tickets__status="REFUNDED"))
+    for event in Event.objects.annotate(n=sold).iterator():
+        Event.objects.filter(pk=event.pk).update(sold_count=event.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_pdf_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='sold_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Compteur dénormalisé des billets vendus (hors remboursés).'),
+        ),
+        migrations.AddField(
+            model_name='tickettype',
+            name='sold_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_sold_counts, migrations.RunPython.noop),
+    ]
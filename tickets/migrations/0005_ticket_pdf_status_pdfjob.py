@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_pdf_status(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    PdfJob = apps.get_model("tickets", "PdfJob")
+    Ticket.objects.exclude(pdf_file="").exclude(pdf_file__isnull=True).update(pdf_status="READY")
+    pending = Ticket.objects.filter(pdf_status="PENDING").values_list("pk", flat=True)
+    PdfJob.objects.bulk_create((PdfJob(ticket_id=pk) for pk in pending.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_event_sold_count_tickettype_sold_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='pdf_status',
+            field=models.CharField(choices=[('PENDING', 'PDF en attente de génération'), ('READY', 'PDF disponible'), ('FAILED', 'Échec de génération')], default='PENDING', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='PdfJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('DONE', 'Terminé'), ('FAILED', 'Échec définitif')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_job', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='pdfjob_status_run_after')],
+            },
+        ),
+        migrations.RunPython(backfill_pdf_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_pdf_status_pdfjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scanlog',
+            name='scanned_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations, models
+
+import tickets.fields
+
+CHUNK_SIZE = 2000
+
+
+def _copy(apps, source, target):
+    """Recopie une colonne dans l'autre par tranches de pk (une transaction par tranche)."""
+    Ticket = apps.get_model("tickets", "Ticket")
+    last_pk = None
+    while True:
+        rows = Ticket.objects.order_by("pk").only("pk", source)
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        chunk = list(rows[:CHUNK_SIZE])
+        if not chunk:
+            return
+        for ticket in chunk:
+            setattr(ticket, target, getattr(ticket, source))
+        Ticket.objects.bulk_update(chunk, [target])
+        last_pk = chunk[-1].pk
+
+
+def hex_to_binary(apps, schema_editor):
+    _copy(apps, "qr_hash", "qr_hash_bin")
+
+
+def binary_to_hex(apps, schema_editor):
+    _copy(apps, "qr_hash_bin", "qr_hash")
+
+
+class Migration(migrations.Migration):
+    # Pas de transaction globale : chaque tranche est committée (tables de plusieurs millions de lignes)
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0007_ticket_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='qr_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='qr_hash_bin',
+            field=tickets.fields.HexDigestField(editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(hex_to_binary, binary_to_hex),
+        migrations.RemoveField(
+            model_name='ticket',
+            name='qr_hash',
+        ),
+        migrations.RenameField(
+            model_name='ticket',
+            old_name='qr_hash_bin',
+            new_name='qr_hash',
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='qr_hash',
+            field=tickets.fields.HexDigestField(editable=False, max_length=32, unique=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+import tickets.utils.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_qr_hash_binary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='id',
+            field=models.UUIDField(default=tickets.utils.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='id',
+            field=models.UUIDField(default=tickets.utils.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='scanlog',
+            name='id',
+            field=models.UUIDField(default=tickets.utils.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='id',
+            field=models.UUIDField(default=tickets.utils.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickettype',
+            name='inventory_shards',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text="Nombre de buckets d'inventaire (0 = compteur unique), cf. utils/inventory.py."),
+        ),
+        migrations.CreateModel(
+            name='InventoryBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('sold_count', models.PositiveIntegerField(default=0)),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='tickets.tickettype')),
+            ],
+            options={
+                'ordering': ['ticket_type', 'index'],
+                'unique_together': {('ticket_type', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_inventory_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='held_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Places retenues par des commandes en attente de paiement.'),
+        ),
+        migrations.AddField(
+            model_name='tickettype',
+            name='held_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('bucketed', models.BooleanField(default=False, help_text="Places prises dans les buckets d'inventaire (held_count inchangé).")),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='tickets.order')),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='tickets.tickettype')),
+            ],
+            options={
+                'unique_together': {('order', 'ticket_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Lignes existantes : dernière modification connue = création
+    for name in ("Venue", "Event", "TicketType"):
+        apps.get_model("tickets", name).objects.update(updated_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='tickettype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def hold_pending_tickets(apps, schema_editor):
+    # Billets déjà émis pour des commandes retenues : plus scannables avant paiement
+    Ticket = apps.get_model("tickets", "Ticket")
+    SeatHold = apps.get_model("tickets", "SeatHold")
+    orders = SeatHold.objects.values("order_id")
+    Ticket.objects.filter(order_id__in=orders, status="UNUSED").update(status="HELD")
+
+
+def release_held_tickets(apps, schema_editor):
+    apps.get_model("tickets", "Ticket").objects.filter(status="HELD").update(status="UNUSED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0015_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='status',
+            field=models.CharField(choices=[('HELD', 'Retenu – commande en attente de paiement'), ('UNUSED', 'Valide – non scanné'), ('USED', 'Déjà scanné'), ('REFUNDED', 'Remboursé / Invalide')], default='UNUSED', max_length=10),
+        ),
+        migrations.RunPython(hold_pending_tickets, release_held_tickets),
+    ]
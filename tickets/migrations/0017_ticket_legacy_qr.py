@@ -0,0 +1,43 @@
+import base64
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.crypto import salted_hmac
+
+
+def _signed_hashes(ticket_id, event_id):
+    # Copie figée de tickets.utils.qr_signing : la migration ne doit pas suivre ses évolutions
+    message = f"{ticket_id.hex}.{event_id}"
+    for secret in [settings.SECRET_KEY, *settings.SECRET_KEY_FALLBACKS]:
+        digest = salted_hmac("tickets.qr", message, secret=secret, algorithm="sha256").digest()
+        mac = base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
+        yield hashlib.sha256(f"{message}.{mac}".encode()).hexdigest()
+
+
+def flag_legacy_tickets(apps, schema_editor):
+    # Billets dont le qr_hash n'est pas celui d'un contenu signé : QR opaque déjà imprimé
+    Ticket = apps.get_model("tickets", "Ticket")
+    rows = Ticket.objects.values_list("pk", "qr_hash", "ticket_type__event_id")
+    legacy = [
+        pk for pk, qr_hash, event_id in rows.iterator(chunk_size=5000)
+        if qr_hash not in set(_signed_hashes(pk, event_id))
+    ]
+    for start in range(0, len(legacy), 5000):
+        Ticket.objects.filter(pk__in=legacy[start:start + 5000]).update(legacy_qr=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0016_held_ticket_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='legacy_qr',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(flag_legacy_tickets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+def flag_sharded_events(apps, schema_editor):
+    Event = apps.get_model("tickets", "Event")
+    Event.objects.filter(ticket_types__inventory_shards__gt=0).update(sharded_inventory=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0017_ticket_legacy_qr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='sharded_inventory',
+            field=models.BooleanField(default=False, editable=False, help_text='Au moins une catégorie découpée en buckets.'),
+        ),
+        migrations.RunPython(flag_sharded_events, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,17 @@
+import random
 import uuid
-import hashlib
 from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MinValueValidator
 from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from .fields import HexDigestField
+from .utils.ids import uuid7
+from .utils.qr_signing import issued_payload, payload_hash, sign_payload
+
 User = get_user_model()
 
 # ──────────────────── 1. Référentiels ──────────────────── #
@@ -14,6 +21,7 @@ class Venue(models.Model):
     address    = models.TextField()
     capacity   = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # ETag des lectures (cf. utils/http.py)
 
     def __str__(self):
         return self.name
@@ -27,7 +35,15 @@ class Event(models.Model):
     end_time     = models.DateTimeField()
     venue        = models.ForeignKey(Venue, on_delete=models.PROTECT, related_name="events")
     quota_global = models.PositiveIntegerField(help_text="Nombre total de billets toutes catégories confondues.")
+    sold_count   = models.PositiveIntegerField(default=0, editable=False,
+                                               help_text="Compteur dénormalisé des billets vendus (hors remboursés).")
+    held_count   = models.PositiveIntegerField(default=0, editable=False,
+                                               help_text="Places retenues par des commandes en attente de paiement.")
+    # Tenu par utils/inventory.shard : sans catégorie découpée, quota_used se passe de l'agrégat des buckets
+    sharded_inventory = models.BooleanField(default=False, editable=False,
+                                            help_text="Au moins une catégorie découpée en buckets.")
     created_at   = models.DateTimeField(auto_now_add=True)
+    updated_at   = models.DateTimeField(auto_now=True)  # compteurs exclus : mis à jour par UPDATE, non exposés
 
     class Meta:
         ordering = ["start_time"]
@@ -37,11 +53,21 @@ class Event(models.Model):
 
     # --- Logiciel : contrôles simples -------------------- #
     def quota_used(self) -> int:
-        return Ticket.objects.filter(ticket_type__event=self).count()
+        # sold_count inclut la capacité découpée en buckets encore invendue (cf. utils/inventory.py)
+        if self.sharded_inventory:
+            return self.sold_count + self.held_count - InventoryBucket.free_stock(ticket_type__event=self)
+        return self.sold_count + self.held_count
 
     def quota_remaining(self) -> int:
         return max(self.quota_global - self.quota_used(), 0)
 
+    def take_quota(self, quantity: int = 1, field: str = "sold_count") -> bool:
+        """Réserve `quantity` places sur le quota global (UPDATE conditionnel atomique)."""
+        return _take(Event, self.pk, "quota_global", quantity, field)
+
+    def release_quota(self, quantity: int = 1) -> None:
+        _release(Event, self.pk, quantity)
+
 
 class TicketType(models.Model):
     """Catégorie de billet (Standard, VIP…)."""
@@ -49,7 +75,13 @@ class TicketType(models.Model):
     name        = models.CharField(max_length=60)
     price       = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
     quota       = models.PositiveIntegerField()
+    sold_count  = models.PositiveIntegerField(default=0, editable=False)
+    held_count  = models.PositiveIntegerField(default=0, editable=False)
+    inventory_shards = models.PositiveSmallIntegerField(
+        default=0, editable=False,
+        help_text="Nombre de buckets d'inventaire (0 = compteur unique), cf. utils/inventory.py.")
     created_at  = models.DateTimeField(auto_now_add=True)
+    updated_at  = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("event", "name")
@@ -60,11 +92,138 @@ class TicketType(models.Model):
 
     # Disponibilités restantes pour ce type précis
     def quota_used(self) -> int:
-        return Ticket.objects.filter(ticket_type=self).count()
+        if self.inventory_shards:
+            return self.sold_count + self.held_count - InventoryBucket.free_stock(ticket_type=self)
+        return self.sold_count + self.held_count
 
     def quota_remaining(self) -> int:
         return max(self.quota - self.quota_used(), 0)
 
+    def take_quota(self, quantity: int = 1, field: str = "sold_count") -> bool:
+        return _take(TicketType, self.pk, "quota", quantity, field)
+
+    @classmethod
+    def add_sold(cls, quantities, field: str = "sold_count") -> None:
+        """Incrémente plusieurs compteurs en un seul UPDATE ({pk: quantité}).
+
+        `field` : `sold_count` (vente) ou `held_count` (retenue d'une commande en attente).
+        L'appelant doit détenir le verrou des lignes et avoir vérifié les quotas.
+        """
+        adjust_counters(cls, quantities, **{field: 1})
+
+    def release_quota(self, quantity: int = 1) -> None:
+        _release(TicketType, self.pk, quantity)
+
+
+class InventoryBucket(models.Model):
+    """Part du stock d'une catégorie découpée pour les ventes flash (cf. utils/inventory.py).
+
+    La capacité des buckets est déjà comptée dans les `sold_count` de la
+    catégorie et de l'événement : un achat ne modifie que le bucket.
+    """
+    ticket_type = models.ForeignKey(TicketType, on_delete=models.CASCADE, related_name="buckets")
+    index       = models.PositiveSmallIntegerField()
+    capacity    = models.PositiveIntegerField(default=0)
+    sold_count  = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("ticket_type", "index")
+        ordering = ["ticket_type", "index"]
+
+    def __str__(self) -> str:
+        return f"{self.ticket_type_id}#{self.index} ({self.sold_count}/{self.capacity})"
+
+    @classmethod
+    def free_stock(cls, **filters) -> int:
+        """Places découpées et pas encore vendues."""
+        free = cls.objects.filter(**filters).aggregate(n=Sum(F("capacity") - F("sold_count")))["n"]
+        return free or 0
+
+    @classmethod
+    def take(cls, ticket_type_id, shards: int, quantity: int) -> bool:
+        """Prend `quantity` places dans les buckets de la catégorie ; False si le stock manque.
+
+        Un bucket tiré au hasard, puis les suivants s'il est vide : chaque essai
+        est un UPDATE conditionnel qui ne verrouille que ce bucket. En fin de
+        vente, la quantité peut être répartie sur plusieurs buckets (pris dans
+        l'ordre des index). À appeler dans la transaction de la commande : un
+        échec partiel est annulé avec elle.
+        """
+        if not shards:
+            return False
+        buckets = cls.objects.filter(ticket_type_id=ticket_type_id)
+        start = random.randrange(shards)
+        for offset in range(shards):
+            if buckets.filter(
+                index=(start + offset) % shards, sold_count__lte=F("capacity") - quantity
+            ).update(sold_count=F("sold_count") + quantity):
+                return True
+
+        remaining = quantity
+        leftovers = (buckets.filter(sold_count__lt=F("capacity"))
+                     .annotate(free=F("capacity") - F("sold_count"))
+                     .order_by("index").values_list("pk", "free"))
+        for pk, free in leftovers:
+            n = min(free, remaining)
+            if cls.objects.filter(pk=pk, sold_count__lte=F("capacity") - n).update(sold_count=F("sold_count") + n):
+                remaining -= n
+                if not remaining:
+                    return True
+        return False
+
+    @classmethod
+    def release(cls, ticket_type_id, quantity: int = 1) -> int:
+        """Rend `quantity` places aux buckets, les plus vendus d'abord ; retourne le nombre rendu.
+
+        Une retenue prise sur plusieurs buckets (fin de vente) y retourne en
+        plusieurs morceaux. Le reste (buckets redécoupés entre-temps) est à
+        rendre par l'appelant aux compteurs de la catégorie et de l'événement.
+        """
+        remaining = quantity
+        candidates = (cls.objects.filter(ticket_type_id=ticket_type_id, sold_count__gt=0)
+                      .order_by("-sold_count").values_list("pk", "sold_count"))
+        for pk, sold in candidates:
+            n = min(sold, remaining)
+            if cls.objects.filter(pk=pk, sold_count__gte=n).update(sold_count=F("sold_count") - n):
+                remaining -= n
+                if not remaining:
+                    break
+        return quantity - remaining
+
+
+# Les compteurs `sold_count` / `held_count` ne sont jamais lus puis réécrits en
+# Python : chaque variation passe par un UPDATE ... SET sold_count = sold_count ± n,
+# conditionné par le quota (vendues + retenues) pour les incréments (pas de survente possible).
+def _take(model, pk, quota_field: str, quantity: int, field: str = "sold_count") -> bool:
+    updated = model.objects.filter(
+        pk=pk, sold_count__lte=F(quota_field) - F("held_count") - quantity
+    ).update(**{field: F(field) + quantity})
+    return updated == 1
+
+
+def adjust_counters(model, quantities, **steps) -> None:
+    """Un seul UPDATE pour plusieurs lignes : `champ = champ + pas × n` ({pk: n}).
+
+    Ex. `adjust_counters(TicketType, {3: 2}, held_count=-1, sold_count=1)`
+    convertit 2 places retenues en ventes.
+    """
+    if not quantities:
+        return
+    model.objects.filter(pk__in=quantities).update(**{
+        field: F(field) + Case(
+            *[When(pk=pk, then=Value(step * n)) for pk, n in quantities.items()],
+            default=Value(0),
+            output_field=models.IntegerField(),
+        )
+        for field, step in steps.items()
+    })
+
+
+def _release(model, pk, quantity: int) -> None:
+    model.objects.filter(pk=pk, sold_count__gte=quantity).update(
+        sold_count=F("sold_count") - quantity
+    )
+
 
 # ──────────────────── 2. Commande & paiement ──────────────────── #
 class Order(models.Model):
@@ -75,7 +234,7 @@ class Order(models.Model):
         ("CANCELLED", "Annulée"),
     ]
 
-    id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id          = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user        = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
     status      = models.CharField(max_length=10, choices=STATUS, default="PENDING")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
@@ -83,6 +242,11 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        # Pagination par clé (tickets/pagination.py) : liste staff et liste d'un acheteur
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_id"),
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_created_id"),
+        ]
 
     def __str__(self) -> str:
         return f"Order {self.id} – {self.status}"
@@ -93,23 +257,98 @@ class Order(models.Model):
         self.save(update_fields=["total_amount"])
 
 
+class SeatHold(models.Model):
+    """Places retenues par une commande PENDING jusqu'à `expires_at` (cf. utils/holds.py)."""
+    order       = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="holds")
+    ticket_type = models.ForeignKey(TicketType, on_delete=models.CASCADE, related_name="holds")
+    quantity    = models.PositiveIntegerField()
+    bucketed    = models.BooleanField(default=False,
+                                      help_text="Places prises dans les buckets d'inventaire (held_count inchangé).")
+    expires_at  = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("order", "ticket_type")
+
+    def __str__(self) -> str:
+        return f"{self.quantity} × {self.ticket_type_id} jusqu'à {self.expires_at:%H:%M:%S}"
+
+
+class WaitingRoom(models.Model):
+    """File d'attente d'une ouverture de vente : admissions cadencées (cf. utils/waiting_room.py)."""
+    event      = models.OneToOneField(Event, on_delete=models.CASCADE, related_name="waiting_room")
+    rate       = models.PositiveIntegerField(validators=[MinValueValidator(1)], help_text="Admissions par minute.")
+    is_active  = models.BooleanField(default=True)
+    # Prochain créneau d'admission libre (ligne à part : pas de contention avec les achats sur Event)
+    next_slot  = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def __str__(self) -> str:
+        return f"File {self.event_id} ({self.rate}/min)"
+
+
+class QueueTicket(models.Model):
+    """Jeton de file d'attente : créneau d'admission d'un acheteur pour un événement."""
+    token      = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # aléatoire : sert de secret
+    event      = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="queue_tickets")
+    user       = models.ForeignKey(User, on_delete=models.CASCADE, related_name="queue_tickets")
+    admit_at   = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    used_at    = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["event", "user"])]
+
+    def __str__(self) -> str:
+        return f"{self.token} → {self.admit_at:%H:%M:%S}"
+
+
+class IdempotencyKey(models.Model):
+    """Réponse d'une création de commande rejouée pour la même clé `Idempotency-Key` (cf. utils/idempotency.py)."""
+    user        = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key         = models.CharField(max_length=255)
+    fingerprint = HexDigestField(editable=False)  # SHA‑256 de la requête : une clé = une seule requête
+    status_code = models.PositiveSmallIntegerField(default=0)
+    response    = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    created_at  = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ("user", "key")
+
+    def __str__(self) -> str:
+        return f"{self.user_id}:{self.key} → {self.status_code}"
+
+
 # ──────────────────── 3. Billets & contrôle d'accès ──────────────────── #
 class Ticket(models.Model):
     """Billet individuel contenant un QR‑code."""
     STATUS = [
+        ("HELD", "Retenu – commande en attente de paiement"),  # non scannable (cf. utils/holds.py)
         ("UNUSED", "Valide – non scanné"),
         ("USED", "Déjà scanné"),
         ("REFUNDED", "Remboursé / Invalide"),
     ]
 
-    id           = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    PDF_STATUS = [
+        ("PENDING", "PDF en attente de génération"),
+        ("READY", "PDF disponible"),
+        ("FAILED", "Échec de génération"),
+    ]
+
+    id           = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order        = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="tickets")
     ticket_type  = models.ForeignKey(TicketType, on_delete=models.PROTECT, related_name="tickets")
     status       = models.CharField(max_length=10, choices=STATUS, default="UNUSED")
-    qr_hash      = models.CharField(max_length=64, unique=True, editable=False)  # SHA‑256 stocké en hexa
+    qr_hash      = HexDigestField(unique=True, editable=False)  # SHA‑256 : 32 octets en base, hexa en Python
     pdf_file = models.FileField(upload_to="tickets/", null=True, blank=True)
+    pdf_status   = models.CharField(max_length=10, choices=PDF_STATUS, default="PENDING")
     created_at   = models.DateTimeField(auto_now_add=True)
+    # Curseur de synchronisation des portiques : à mettre à jour à chaque changement de statut
+    updated_at   = models.DateTimeField(auto_now=True, db_index=True)
     scanned_at   = models.DateTimeField(null=True, blank=True)
+    # QR opaque imprimé avant la signature : seul cas où le `qr_hash` brut est accepté au scan
+    legacy_qr    = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["-created_at", "-id"], name="ticket_created_id")]
 
     def __str__(self) -> str:
         return f"{self.ticket_type.name} – {self.id}"
@@ -121,18 +360,53 @@ class Ticket(models.Model):
         super().save(*args, **kwargs)
 
     def _generate_qr_hash(self):
-        """Generate a unique QR hash for this ticket"""
-        # Use ticket ID, order ID, and current timestamp to ensure uniqueness
-        unique_string = f"{self.id}-{self.order.id}-{timezone.now().isoformat()}"
-        return hashlib.sha256(unique_string.encode()).hexdigest()
-
-    # Validation simple (utilisé par le scan)
+        """SHA-256 du contenu signé du QR (unique : il contient l'id du billet)"""
+        return payload_hash(self.qr_payload)
+
+    # Contenu signé « billet.événement.mac » (cf. utils/qr_signing.py) : clé courante
+    # à l'émission, puis celle (courante ou ancienne) qui a produit le `qr_hash` stocké
+    @property
+    def qr_payload(self) -> str:
+        event_id = self.ticket_type.event_id
+        if self.qr_hash:
+            payload = issued_payload(self.id, event_id, self.qr_hash)
+            if payload is not None:
+                return payload
+        return sign_payload(self.id, event_id)
+
+    # Ce qu'encode le QR imprimé : contenu signé, ou hash opaque des billets antérieurs
+    @property
+    def qr_code(self) -> str:
+        if self.legacy_qr:
+            return self.qr_hash
+        return issued_payload(self.id, self.ticket_type.event_id, self.qr_hash) or self.qr_hash
+
+    # Remboursement : libère la place sur les deux compteurs
+    def refund(self) -> None:
+        if SeatHold.objects.filter(order_id=self.order_id).exists():
+            raise ValueError("Commande en attente de paiement : l'annuler plutôt que rembourser.")
+        with transaction.atomic():
+            updated = (Ticket.objects.filter(pk=self.pk)
+                       .exclude(status="REFUNDED")
+                       .update(status="REFUNDED", updated_at=timezone.now()))
+            if not updated:
+                raise ValueError("Billet déjà remboursé.")
+            ticket_type = self.ticket_type
+            # Catégorie découpée : la place retourne dans un bucket, les compteurs restent
+            if not (ticket_type.inventory_shards and InventoryBucket.release(ticket_type.pk, 1)):
+                _release(TicketType, ticket_type.pk, 1)
+                _release(Event, ticket_type.event_id, 1)
+        self.status = "REFUNDED"
+
+    # Validation : compare-and-set, un seul appelant peut passer UNUSED → USED
     def mark_used(self) -> None:
-        if self.status != "UNUSED":
+        now = timezone.now()
+        updated = (Ticket.objects.filter(pk=self.pk, status="UNUSED")
+                   .update(status="USED", scanned_at=now, updated_at=now))
+        if not updated:
             raise ValueError("Ticket déjà utilisé ou invalide.")
         self.status = "USED"
-        self.scanned_at = timezone.now()
-        self.save(update_fields=["status", "scanned_at"])
+        self.scanned_at = now
 
 
 class ScanLog(models.Model):
@@ -143,15 +417,16 @@ class ScanLog(models.Model):
         ("INVALID", "Échec – ticket inconnu"),
     ]
 
-    id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id          = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     ticket      = models.ForeignKey(Ticket, on_delete=models.SET_NULL, null=True, blank=True)
     scanner     = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     result      = models.CharField(max_length=9, choices=RESULT)
     device_info = models.CharField(max_length=120, blank=True)
-    scanned_at  = models.DateTimeField(auto_now_add=True)
+    scanned_at  = models.DateTimeField(default=timezone.now)  # heure du scan, pas de l'écriture différée
 
     class Meta:
         ordering = ["-scanned_at"]
+        indexes = [models.Index(fields=["-scanned_at", "-id"], name="scanlog_scanned_id")]
 
 
 # ──────────────────── 4. Notifications ──────────────────── #
@@ -159,7 +434,7 @@ class NotificationLog(models.Model):
     """Trace toute notification sortante (e‑mail, SMS…)."""
     CHANNEL = [("EMAIL", "Email"), ("SMS", "SMS")]
 
-    id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id          = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user        = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
     event       = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True)
     channel     = models.CharField(max_length=8, choices=CHANNEL)
@@ -169,4 +444,29 @@ class NotificationLog(models.Model):
     created_at  = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["-created_at"]
\ No newline at end of file
+        ordering = ["-created_at"]
+
+
+# ──────────────────── 5. Tâches de fond ──────────────────── #
+class PdfJob(models.Model):
+    """Rendu PDF d'un billet en attente, consommé par `manage.py pdf_worker`."""
+    STATUS = [
+        ("PENDING", "En attente"),
+        ("RUNNING", "En cours"),
+        ("DONE", "Terminé"),
+        ("FAILED", "Échec définitif"),
+    ]
+
+    ticket      = models.OneToOneField(Ticket, on_delete=models.CASCADE, related_name="pdf_job")
+    status      = models.CharField(max_length=10, choices=STATUS, default="PENDING")
+    attempts    = models.PositiveSmallIntegerField(default=0)
+    run_after   = models.DateTimeField(default=timezone.now)
+    last_error  = models.TextField(blank=True)
+    created_at  = models.DateTimeField(auto_now_add=True)
+    updated_at  = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"], name="pdfjob_status_run_after")]
+
+    def __str__(self) -> str:
+        return f"PdfJob {self.ticket_id} – {self.status}"
@@ -0,0 +1,90 @@
+"""
+Pagination par clé (keyset) des grandes listes : commandes, billets, scans.
+
+La pagination par décalage (`OFFSET n`) relit et jette les n premières
+lignes : la page 2 000 d'une liste de 100 000 billets coûte 2 000 pages.
+Ici la liste est triée du plus récent au plus ancien sur (horodatage, id)
+et le curseur `next` contient la dernière position servie ; la page
+suivante est lue par
+`horodatage <= t AND (horodatage < t OR id < id0) ORDER BY horodatage DESC, id DESC LIMIT n + 1`.
+La première condition borne le parcours de l'index composite (horodatage,
+id) : chaque page coûte la même chose, quelle que soit sa profondeur.
+
+Parcours vers l'avant uniquement (pas de `previous`) ; une ligne insérée
+pendant le parcours apparaît en tête, jamais en double.
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Pages de `page_size` lignes, de la plus récente à la plus ancienne, sur (`time_field`, pk)."""
+    time_field = "created_at"
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    invalid_cursor_message = "Curseur invalide."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        field = self.time_field
+        queryset = queryset.order_by(f"-{field}", "-pk")
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            moment, pk = self.decode_cursor(encoded, queryset.model)
+            queryset = queryset.filter(Q(**{f"{field}__lte": moment}),
+                                       Q(**{f"{field}__lt": moment}) | Q(pk__lt=pk))
+        rows = list(queryset[:size + 1])
+        last = rows[size - 1] if len(rows) > size else None
+        self.next_cursor = self.encode_cursor(getattr(last, field), last.pk) if last is not None else None
+        return rows[:size]
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, settings.API_PAGE_SIZE))
+        except ValueError:
+            size = settings.API_PAGE_SIZE
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    @staticmethod
+    def encode_cursor(moment: datetime, pk) -> str:
+        return base64.urlsafe_b64encode(f"{moment.isoformat()}|{pk}".encode()).decode().rstrip("=")
+
+    def decode_cursor(self, encoded: str, model):
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+            moment, pk = raw.split("|", 1)
+            return datetime.fromisoformat(moment), model._meta.pk.to_python(pk)
+        except (ValueError, UnicodeDecodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ScanLogPagination(KeysetPagination):
+    time_field = "scanned_at"
@@ -1,19 +1,25 @@
 # On importe DRF
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
+from collections import Counter
+from datetime import timedelta
 
 # On importe nos modèles
-from .models import Venue, Event, TicketType, Order, Ticket
+from .models import Venue, Event, TicketType, InventoryBucket, Order, SeatHold, Ticket, ScanLog, WaitingRoom
+from .utils.pdf_queue import schedule_ticket_pdfs
+from .utils.sparse_fields import SparseFieldsMixin
 
 # 1) Serializer pour Venue
-class VenueSerializer(serializers.ModelSerializer):
+class VenueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Venue
         fields = '__all__'  # Tous les champs de Venue
 
 # 2) Serializer pour TicketType
-class TicketTypeSerializer(serializers.ModelSerializer):
+class TicketTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Lecture : on peut renvoyer l'event complet (optionnel)
     event = serializers.SerializerMethodField(read_only=True)
     # Écriture : l’API attend event_id pour lier l’event
@@ -22,10 +28,14 @@ class TicketTypeSerializer(serializers.ModelSerializer):
         write_only=True,
         source="event"
     )
+    # ?expand= sans "event" : seulement l'id de l'événement
+    expandable_fields = {
+        "event": (lambda: serializers.IntegerField(source="event_id", read_only=True), "select"),
+    }
 
     class Meta:
         model = TicketType
-        fields = ["id", "event", "event_id", "name", "price", "quota", "created_at"]
+        fields = ["id", "event", "event_id", "name", "price", "quota", "created_at", "updated_at"]
 
     def get_event(self, obj):
         # Option simple : renvoyer juste l'id (ou un sous-serializer si tu préfères)
@@ -40,7 +50,7 @@ class TicketTypeSerializer(serializers.ModelSerializer):
             )
         return data
 # 3) Serializer pour Event
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # On veut inclure le détail du lieu (lecture seule)
     venue = VenueSerializer(read_only=True)
     # Mais permettre d'envoyer juste l'ID du lieu quand on crée un événement
@@ -51,6 +61,13 @@ class EventSerializer(serializers.ModelSerializer):
     )
     # On veut aussi voir les ticket types attachés à l'événement
     ticket_types = TicketTypeSerializer(read_only=True, many=True)
+    # ?expand= : relations non citées rendues par leurs ids
+    expandable_fields = {
+        "venue": (lambda: serializers.PrimaryKeyRelatedField(read_only=True), "select"),
+        "ticket_types": (lambda: serializers.PrimaryKeyRelatedField(read_only=True, many=True), "prefetch"),
+    }
+    # Catégories embarquées : TicketTypeSerializer.get_event relit le titre de l'événement
+    expanded_columns = {"ticket_types": ("title",)}
 
     class Meta:
         model = Event
@@ -64,6 +81,7 @@ class EventSerializer(serializers.ModelSerializer):
             "venue_id",    # pour création
             "quota_global",
             "created_at",
+            "updated_at",
             "ticket_types" # liste des catégories
         ]
 
@@ -84,19 +102,49 @@ class EventSerializer(serializers.ModelSerializer):
         return data
 
 class TicketSerializer(serializers.ModelSerializer):
+    # Contenu à encoder dans le QR (signé ; hash opaque pour les anciens billets)
+    qr_payload = serializers.CharField(source="qr_code", read_only=True)
+
     class Meta:
         model = Ticket
-        fields = ["id", "ticket_type", "status", "created_at", "qr_hash"]
+        fields = ["id", "ticket_type", "status", "created_at", "qr_hash", "qr_payload"]
         read_only_fields = ["id", "status", "created_at", "qr_hash"]
 
+class ScanLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScanLog
+        fields = ["id", "ticket", "scanner", "result", "device_info", "scanned_at"]
+
+class ScanBatchEntrySerializer(serializers.Serializer):
+    """Scan rejoué par un portique : `scanned_at` est l'heure du portique, pas du serveur."""
+    qr_hash = serializers.CharField(max_length=128)  # contenu signé du QR ou ancien hash
+    scanned_at = serializers.DateTimeField()
+    device = serializers.CharField(max_length=120, required=False, allow_blank=True, default="")
+
+class WaitingRoomSerializer(serializers.ModelSerializer):
+    """Réglage de la file d'attente d'un événement (staff)."""
+    class Meta:
+        model = WaitingRoom
+        fields = ["rate", "is_active", "next_slot"]
+        read_only_fields = ["next_slot"]
+
+class OrderTicketSerializer(serializers.Serializer):
+    """Ligne de commande : seulement l'id de catégorie, résolu en bloc dans create()."""
+    ticket_type = serializers.IntegerField(min_value=1)
+
 class OrderSerializer(serializers.ModelSerializer):
-    tickets = TicketSerializer(many=True, write_only=True)
+    tickets = OrderTicketSerializer(many=True, write_only=True)
+    hold_expires_at = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
-        fields = ["id", "user", "status", "total_amount", "tickets", "created_at"]
+        fields = ["id", "user", "status", "total_amount", "tickets", "hold_expires_at", "created_at"]
         read_only_fields = ["id", "status", "total_amount", "created_at", "user"]
 
+    def get_hold_expires_at(self, order):
+        """Échéance de paiement des places retenues (None : pas de retenue)."""
+        return min((hold.expires_at for hold in order.holds.all()), default=None)
+
     def validate_tickets(self, value):
         """Validate that at least one ticket is provided"""
         if not value:
@@ -106,20 +154,65 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         ticket_data = validated_data.pop("tickets")
         user = self.context["request"].user
-        
+
+        # Quantités par catégorie : le nombre de requêtes ne dépend plus du nombre de billets
+        quantities = Counter(t["ticket_type"] for t in ticket_data)
+        # Places retenues jusqu'au paiement (cf. utils/holds.py) ou vendues directement
+        hold_ttl = settings.ORDER_HOLD_TTL
+        field = "held_count" if hold_ttl else "sold_count"
+
         with transaction.atomic():  # si quelque chose plante, rien n'est enregistré
-            order = Order.objects.create(user=user)
-            
-            for t in ticket_data:
-                tt = TicketType.objects.select_for_update().get(pk=t["ticket_type"].id)
+            # Un seul verrou par catégorie, pris dans l'ordre des pk pour éviter les deadlocks
+            locked = {
+                tt.pk: tt
+                for tt in TicketType.objects.select_for_update()
+                .filter(pk__in=quantities, inventory_shards=0).order_by("pk")
+            }
+            types = dict(locked)
+            if len(types) < len(quantities):
+                # Catégories découpées en buckets : lues sans verrou (cf. utils/inventory.py)
+                types.update((tt.pk, tt) for tt in TicketType.objects.filter(pk__in=set(quantities) - set(types)))
+            missing = sorted(set(quantities) - set(types))
+            if missing:
+                raise serializers.ValidationError(
+                    {"tickets": f"Catégorie(s) de billet inconnue(s) : {missing}"}
+                )
 
-                # Vérification des quotas
-                if tt.quota_remaining() <= 0:
+            # Vérification des quotas sur la quantité totale (lignes verrouillées → lecture fiable)
+            per_event = Counter()
+            for pk, tt in types.items():
+                if pk not in locked:
+                    # La capacité des buckets est déjà retirée des compteurs de l'événement
+                    if not InventoryBucket.take(pk, tt.inventory_shards, quantities[pk]):
+                        raise serializers.ValidationError(f"Plus de places pour {tt.name}")
+                    continue
+                if tt.quota_remaining() < quantities[pk]:
                     raise serializers.ValidationError(f"Plus de places pour {tt.name}")
-                if tt.event.quota_remaining() <= 0:
+                per_event[tt.event_id] += quantities[pk]
+            for event_id, quantity in sorted(per_event.items()):
+                if not Event(pk=event_id).take_quota(quantity, field):
                     raise serializers.ValidationError("Quota global de l'événement atteint")
+            if locked:
+                TicketType.add_sold({pk: quantities[pk] for pk in locked}, field)
+
+            order = Order.objects.create(
+                user=user,
+                total_amount=sum(types[pk].price * n for pk, n in quantities.items()),
+            )
+            # Commande retenue : billets HELD (ni scannables ni téléchargeables) jusqu'au paiement
+            tickets = [Ticket(order=order, ticket_type=types[t["ticket_type"]], status="HELD" if hold_ttl else "UNUSED")
+                       for t in ticket_data]
+            for ticket in tickets:
+                ticket.qr_hash = ticket._generate_qr_hash()
+            Ticket.objects.bulk_create(tickets)
+            if hold_ttl:
+                expires_at = timezone.now() + timedelta(seconds=hold_ttl)
+                SeatHold.objects.bulk_create([
+                    SeatHold(order=order, ticket_type_id=pk, quantity=n, bucketed=pk not in locked,
+                             expires_at=expires_at)
+                    for pk, n in quantities.items()
+                ])
 
-                Ticket.objects.create(order=order, ticket_type=tt)
-            
-            order.recompute_total()
-        return order
\ No newline at end of file
+            # Rendu PDF hors transaction (worker, après commit ou à la demande)
+            schedule_ticket_pdfs(tickets)
+        return order
@@ -1,12 +1,35 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.core.files.base import ContentFile
-from .models import Ticket
-from .utils.pdf import build_ticket_pdf
+from .models import Event, Ticket, TicketType, Venue
+from .utils.pdf_queue import schedule_ticket_pdfs
+from .utils.pdf_template import invalidate_templates
+from .utils.response_cache import bump_version
 
 @receiver(post_save, sender=Ticket)
 def generate_pdf_on_create(sender, instance, created, **kwargs):
+    # Rendu selon TICKET_PDF_MODE, jamais dans la transaction courante
     if created and not instance.pdf_file:
-        pdf_io = build_ticket_pdf(instance)
-        filename = f"ticket_{instance.id}.pdf"
-        instance.pdf_file.save(filename, ContentFile(pdf_io.read()), save=True)
+        schedule_ticket_pdfs([instance])
+
+# PDF de base compilés (pdf_template) : purge du cache disque à chaque modification
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_event_templates(sender, instance, **kwargs):
+    invalidate_templates(instance.pk)
+
+@receiver([post_save, post_delete], sender=TicketType)
+def invalidate_ticket_type_templates(sender, instance, **kwargs):
+    invalidate_templates(instance.event_id, instance.pk)
+
+@receiver(post_save, sender=Venue)
+def invalidate_venue_templates(sender, instance, created, **kwargs):
+    if not created:
+        for event_id in instance.events.values_list("pk", flat=True):
+            invalidate_templates(event_id)
+
+# Cache des réponses de lecture : nouvelle version du modèle une fois la modification validée
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=Venue)
+@receiver([post_save, post_delete], sender=TicketType)
+def bump_response_cache_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(sender))
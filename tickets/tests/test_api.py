@@ -16,13 +16,14 @@ Les cas négatifs ci‑dessous cherchent à produire **des true positives** :
 l'API doit refuser la requête et retourner un code 4xx attendu.
 """
 
+import uuid
 from decimal import Decimal 
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from tickets.models import Venue, Event, TicketType, Order, Ticket
+from tickets.models import Venue, Event, TicketType, Order, Ticket, ScanLog
 
 User = get_user_model()
 
@@ -303,15 +304,15 @@ class OrderTicketCRUDTest(APITestCase):
         self.client.force_authenticate(user=self.user1)
         res = self.client.get("/api/orders/")
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["user"], self.user1.id)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["user"], self.user1.id)
         
         # User2 ne voit que ses commandes
         self.client.force_authenticate(user=self.user2)
         res = self.client.get("/api/orders/")
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["user"], self.user2.id)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["user"], self.user2.id)
 
     def test_order_admin_sees_all(self):
         """True Negative : l'admin voit toutes les commandes"""
@@ -334,7 +335,7 @@ class OrderTicketCRUDTest(APITestCase):
         self.client.force_authenticate(user=self.admin)
         res = self.client.get("/api/orders/")
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(res.data), 2)
+        self.assertGreaterEqual(len(res.data["results"]), 2)
 
     def test_order_unauthenticated_denied(self):
         """True Positive : utilisateur non connecté → 401 ou 403"""
@@ -547,6 +548,27 @@ class OrderTicketCRUDTest(APITestCase):
             self.assertIsNotNone(qr_hash)
             self.assertTrue(len(qr_hash) > 0)
 
+    def test_order_query_count_constant(self):
+        """True Negative : le nombre de requêtes ne dépend pas de la quantité commandée"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user=self.user1)
+
+        def count_queries(quantity):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(
+                    "/api/orders/",
+                    {"tickets": [{"ticket_type": self.standard_ticket.id}] * quantity
+                                + [{"ticket_type": self.vip_ticket.id}]},
+                    format="json"
+                )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(1), count_queries(20))
+        self.assertEqual(Ticket.objects.filter(ticket_type=self.standard_ticket).count(), 21)
+
 
 class TicketManagementTest(APITestCase):
     """
@@ -587,4 +609,2247 @@ class TicketManagementTest(APITestCase):
         
         # Tentative de réutilisation doit échouer
         with self.assertRaises(ValueError):
-            ticket.mark_used()
\ No newline at end of file
+            ticket.mark_used()
+
+class SoldCounterTest(APITestCase):
+    """
+    Compteurs dénormalisés sold_count (TicketType / Event)
+    - Incrément à l'achat, décrément au remboursement
+    - Reconstruction via la commande rebuild_sold_counts
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("counter_user", password="pass123")
+        self.venue = Venue.objects.create(name="Salle Counter", address="Akwa, Douala", capacity=100)
+        self.event = Event.objects.create(
+            title="Counter Event",
+            start_time=timezone.now() + timezone.timedelta(days=3),
+            end_time=timezone.now() + timezone.timedelta(days=3, hours=2),
+            venue=self.venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(
+            event=self.event, name="Standard", price=Decimal("2000.00"), quota=5
+        )
+
+    def _buy(self, n=1):
+        self.client.force_authenticate(user=self.user)
+        return self.client.post(
+            "/api/orders/",
+            {"tickets": [{"ticket_type": self.ticket_type.id}] * n},
+            format="json"
+        )
+
+    def test_counters_follow_purchase_and_refund(self):
+        """True Negative : achat puis remboursement"""
+        res = self._buy(2)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.ticket_type.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.ticket_type.sold_count, 2)
+        self.assertEqual(self.event.sold_count, 2)
+
+        ticket = Ticket.objects.filter(order_id=res.data["id"]).first()
+        ticket.refund()
+        self.ticket_type.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.ticket_type.quota_remaining(), 4)
+        self.assertEqual(self.event.quota_remaining(), 9)
+
+        # Double remboursement refusé, compteurs inchangés
+        with self.assertRaises(ValueError):
+            ticket.refund()
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.sold_count, 1)
+
+    def test_event_quota_reads_counters_only(self):
+        """True Negative : sans catégorie découpée, disponibilités de l'événement sans requête"""
+        from tickets.utils.inventory import shard
+
+        self._buy(2)
+        self.event.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.event.quota_remaining(), 8)
+        shard(self.ticket_type, 2)
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.sharded_inventory)
+        self.assertEqual(self.event.quota_remaining(), 8)  # capacité découpée encore libre
+        shard(self.ticket_type, 0)
+        self.event.refresh_from_db()
+        self.assertFalse(self.event.sharded_inventory)
+        self.assertEqual(self.event.quota_remaining(), 8)
+
+    def test_failed_order_rolls_back_counters(self):
+        """True Positive : commande au-delà du quota → 400 et compteurs intacts"""
+        res = self._buy(6)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.ticket_type.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.ticket_type.sold_count, 0)
+        self.assertEqual(self.event.sold_count, 0)
+
+    def test_rebuild_sold_counts_command(self):
+        """True Negative : la commande corrige des compteurs désynchronisés"""
+        from django.core.management import call_command
+        from io import StringIO
+
+        self._buy(3)
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(sold_count=0)
+        Event.objects.filter(pk=self.event.pk).update(sold_count=42)
+
+        call_command("rebuild_sold_counts", stdout=StringIO())
+        self.ticket_type.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.ticket_type.sold_count, 3)
+        self.assertEqual(self.event.sold_count, 3)
+
+
+class PdfJobQueueTest(APITestCase):
+    """
+    File de rendu PDF (PdfJob + manage.py pdf_worker)
+    - La commande n'attend plus le rendu : un job par billet
+    - Le worker génère le PDF, réessaie puis abandonne en cas d'échec
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("pdf_user", password="pass123")
+        venue = Venue.objects.create(name="Salle PDF", address="Bonapriso, Douala", capacity=100)
+        event = Event.objects.create(
+            title="PDF Event",
+            start_time=timezone.now() + timezone.timedelta(days=2),
+            end_time=timezone.now() + timezone.timedelta(days=2, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(
+            event=event, name="Standard", price=Decimal("1000.00"), quota=10
+        )
+
+    def _order(self, n=2):
+        self.client.force_authenticate(user=self.user)
+        res = self.client.post(
+            "/api/orders/",
+            {"tickets": [{"ticket_type": self.ticket_type.id}] * n},
+            format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Order.objects.get(pk=res.data["id"])
+
+    def _run_worker(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command("pdf_worker", once=True, processes=0, stdout=StringIO(), **options)
+
+    def test_order_enqueues_jobs(self):
+        """True Negative : un job PENDING par billet, aucun PDF rendu pendant la requête"""
+        from tickets.models import PdfJob
+        order = self._order(3)
+        self.assertEqual(PdfJob.objects.filter(ticket__order=order, status="PENDING").count(), 3)
+        self.assertFalse(order.tickets.exclude(pdf_status="PENDING").exists())
+
+    def test_worker_renders_pdf(self):
+        """True Negative : le worker génère et enregistre les PDF"""
+        import io
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        from tickets.models import PdfJob
+
+        order = self._order(2)
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), \
+                mock.patch("tickets.utils.pdf.build_ticket_pdf", side_effect=lambda t: io.BytesIO(b"%PDF-1.7")):
+            self._run_worker()
+            for ticket in order.tickets.all():
+                self.assertEqual(ticket.pdf_status, "READY")
+                self.assertTrue(ticket.pdf_file)
+        self.assertEqual(PdfJob.objects.filter(status="DONE").count(), 2)
+
+    def test_worker_retries_then_fails(self):
+        """True Positive : rendu en échec → nouvel essai planifié, puis FAILED"""
+        from unittest import mock
+        from tickets.models import PdfJob
+
+        order = self._order(1)
+        with mock.patch("tickets.utils.pdf.build_ticket_pdf", side_effect=RuntimeError("boom")):
+            self._run_worker(max_attempts=2, backoff=0)
+        job = PdfJob.objects.get(ticket__order=order)
+        self.assertEqual(job.status, "FAILED")
+        self.assertEqual(job.attempts, 2)
+        self.assertIn("boom", job.last_error)
+        self.assertEqual(order.tickets.get().pdf_status, "FAILED")
+
+    def test_lazy_mode_renders_on_first_download(self):
+        """True Negative : mode lazy → pas de job, rendu au premier GET puis copie stockée"""
+        import io
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        from tickets.models import PdfJob
+
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media, TICKET_PDF_MODE="lazy"), \
+                mock.patch("tickets.utils.pdf.build_ticket_pdf",
+                           return_value=io.BytesIO(b"%PDF-1.7 lazy")) as build:
+            ticket = self._order(1).tickets.get()
+            self.assertFalse(PdfJob.objects.filter(ticket=ticket).exists())
+
+            for _ in range(2):
+                res = self.client.get(f"/api/tickets/{ticket.id}/pdf/")
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(b"".join(res.streaming_content), b"%PDF-1.7 lazy")
+                res.close()
+            self.assertEqual(build.call_count, 1)
+            ticket.refresh_from_db()
+            self.assertEqual(ticket.pdf_status, "READY")
+
+    def test_eager_mode_renders_after_commit(self):
+        """True Negative : mode eager → rendu déclenché par transaction.on_commit"""
+        import io
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media, TICKET_PDF_MODE="eager"), \
+                mock.patch("tickets.utils.pdf.build_ticket_pdf",
+                           side_effect=lambda t: io.BytesIO(b"%PDF-1.7")):
+            with self.captureOnCommitCallbacks(execute=True):
+                order = self._order(2)
+            self.assertEqual(order.tickets.filter(pdf_status="READY").count(), 2)
+
+
+class CompiledPdfTemplateTest(APITestCase):
+    """
+    PDF de base compilé par (Event, TicketType) + QR tamponné par billet
+    """
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.template_dir = tmp.name
+        override = override_settings(TICKET_PDF_TEMPLATE_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        user = User.objects.create_user("tpl_user", password="pass123")
+        venue = Venue.objects.create(name="Salle (Akwa)", address="Akwa, Douala", capacity=100)
+        self.event = Event.objects.create(
+            title="Nuit du Bikutsi",
+            start_time=timezone.now() + timezone.timedelta(days=5),
+            end_time=timezone.now() + timezone.timedelta(days=5, hours=3),
+            venue=venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("15000.00"), quota=10
+        )
+        order = Order.objects.create(user=user)
+        self.tickets = [Ticket.objects.create(order=order, ticket_type=self.ticket_type) for _ in range(2)]
+
+    def test_stamped_pdf_structure(self):
+        """True Negative : PDF complet, identifiant du billet tamponné, base partagée"""
+        import os
+        from tickets.utils.pdf import build_ticket_pdf
+
+        first = build_ticket_pdf(self.tickets[0]).getvalue()
+        second = build_ticket_pdf(self.tickets[1]).getvalue()
+        self.assertTrue(first.startswith(b"%PDF-"))
+        self.assertTrue(first.rstrip().endswith(b"%%EOF"))
+        self.assertIn(str(self.tickets[0].id).encode(), first)
+        self.assertIn(b"(Nuit du Bikutsi)", first)
+        self.assertIn(b"Salle \\(Akwa\\)", first)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(os.listdir(self.template_dir)), 1)
+
+    def test_base_invalidated_on_edit(self):
+        """True Negative : modifier l'événement purge et recompile le PDF de base"""
+        import os
+        from tickets.utils.pdf import build_ticket_pdf
+
+        build_ticket_pdf(self.tickets[0])
+        self.event.title = "Nuit du Makossa"
+        self.event.save()
+        self.assertEqual(os.listdir(self.template_dir), [])
+
+        ticket = Ticket.objects.select_related("ticket_type__event__venue").get(pk=self.tickets[0].pk)
+        pdf = build_ticket_pdf(ticket).getvalue()
+        self.assertIn(b"(Nuit du Makossa)", pdf)
+        self.assertNotIn(b"Bikutsi", pdf)
+
+    def test_qr_cache_skips_reencoding(self):
+        """True Negative : un second rendu du même billet ne réencode pas le QR"""
+        from unittest import mock
+        from tickets.utils import qr
+        from tickets.utils.pdf import build_ticket_pdf
+
+        qr.clear_cache()
+        with mock.patch("tickets.utils.qr.qr_matrix", wraps=qr.qr_matrix) as encode:
+            build_ticket_pdf(self.tickets[0])
+            build_ticket_pdf(self.tickets[0])
+            svg = qr.qr_svg(self.tickets[0].qr_hash)
+            qr.qr_svg(self.tickets[0].qr_hash)
+        self.assertEqual(encode.call_count, 2)  # une fois pour le PDF, une fois pour le SVG
+        self.assertTrue(svg.startswith("<svg") and "<path d=\"M" in svg)
+
+    def test_qr_quiet_zone(self):
+        """True Negative : 4 modules blancs autour du QR (PDF et SVG), zone entièrement dans le cadre"""
+        from tickets.utils import pdf_template, qr
+
+        data = self.tickets[0].qr_code
+        n, ops = qr.qr_pdf_ops(data)
+        rects = [tuple(int(v) for v in line.split()[:3]) for line in ops.splitlines()]
+        self.assertEqual(min(x for x, _, _ in rects), 4)
+        self.assertEqual(max(x + w for x, _, w in rects), n - 4)
+        self.assertEqual((min(y for _, y, _ in rects), max(y for _, y, _ in rects)), (4, n - 5))
+        svg = qr.qr_svg(data)
+        self.assertIn(f'viewBox="0 0 {n} {n}"', svg)
+        self.assertIn('d="M4 4h7', svg)  # motif de repérage après la zone de silence
+        # Zone de silence à l'intérieur du trait du cadre (0,75 pt centré sur MARGIN)
+        self.assertGreater(pdf_template.QR_LEFT, pdf_template.MARGIN + 0.375)
+        self.assertGreater(pdf_template.QR_TOP - pdf_template.QR_SIZE, pdf_template.BOX_BOTTOM)
+
+
+class TicketExportTest(APITestCase):
+    """
+    Téléchargement groupé : PDF multi-pages et ZIP streamés (commande, événement)
+    """
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(TICKET_PDF_TEMPLATE_DIR=tmp.name, MEDIA_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("export_user", password="pass123")
+        self.other = User.objects.create_user("export_other", password="pass123")
+        self.admin = User.objects.create_superuser("export_admin", "admin@test.com", "admin123")
+        venue = Venue.objects.create(name="Stade Omnisports", address="Mfandena, Yaoundé", capacity=100)
+        self.event = Event.objects.create(
+            title="Finale Coupe",
+            start_time=timezone.now() + timezone.timedelta(days=7),
+            end_time=timezone.now() + timezone.timedelta(days=7, hours=2),
+            venue=venue,
+            quota_global=50
+        )
+        standard = TicketType.objects.create(event=self.event, name="Tribune", price=Decimal("3000.00"), quota=40)
+        vip = TicketType.objects.create(event=self.event, name="Loge", price=Decimal("20000.00"), quota=10)
+        self.client.force_authenticate(user=self.user)
+        res = self.client.post(
+            "/api/orders/",
+            {"tickets": [{"ticket_type": standard.id}] * 3 + [{"ticket_type": vip.id}]},
+            format="json"
+        )
+        self.order = Order.objects.get(pk=res.data["id"])
+
+    def test_order_tickets_pdf(self):
+        """True Negative : une page par billet, réponse streamée"""
+        res = self.client.get(f"/api/orders/{self.order.id}/tickets.pdf")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        pdf = b"".join(res.streaming_content)
+        self.assertTrue(pdf.startswith(b"%PDF-") and pdf.rstrip().endswith(b"%%EOF"))
+        self.assertIn(b"/Count 4", pdf)
+        for ticket in self.order.tickets.all():
+            self.assertIn(str(ticket.id).encode(), pdf)
+
+    def test_order_tickets_zip(self):
+        """True Negative : archive ZIP lisible, un PDF par billet"""
+        import io
+        import zipfile
+
+        res = self.client.get(f"/api/orders/{self.order.id}/tickets.zip")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(res.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            sorted(archive.namelist()),
+            sorted(f"ticket_{t.id}.pdf" for t in self.order.tickets.all())
+        )
+
+    def test_refunded_tickets_not_exported(self):
+        """True Positive : billet remboursé absent de l'export de la commande"""
+        refunded = self.order.tickets.first()
+        refunded.refund()
+        res = self.client.get(f"/api/orders/{self.order.id}/tickets.pdf")
+        pdf = b"".join(res.streaming_content)
+        self.assertIn(b"/Count 3", pdf)
+        self.assertNotIn(str(refunded.id).encode(), pdf)
+
+    def test_order_export_other_user_denied(self):
+        """True Positive : la commande d'un autre utilisateur → 404"""
+        self.client.force_authenticate(user=self.other)
+        res = self.client.get(f"/api/orders/{self.order.id}/tickets.pdf")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_event_export_staff_only(self):
+        """True Positive / Negative : export événement réservé au staff"""
+        res = self.client.get(f"/api/events/{self.event.id}/tickets.zip")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        res = self.client.get(f"/api/events/{self.event.id}/tickets.pdf")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b"/Count 4", b"".join(res.streaming_content))
+
+
+class TicketPdfDeliveryTest(APITestCase):
+    """
+    Téléchargement d'un PDF : requêtes conditionnelles, intervalles, délégation au proxy
+    """
+
+    PDF = b"%PDF-1.4\n" + b"x" * 1000 + b"\n%%EOF\n"
+
+    def setUp(self):
+        import tempfile
+        from django.core.files.base import ContentFile
+        from django.test import override_settings
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=tmp.name, TICKET_PDF_SENDFILE="")
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("dl_user", password="pass123")
+        venue = Venue.objects.create(name="Salle DL", address="Bastos, Yaoundé", capacity=100)
+        event = Event.objects.create(
+            title="DL Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        ticket_type = TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=10)
+        self.ticket = Ticket.objects.create(order=Order.objects.create(user=self.user), ticket_type=ticket_type)
+        self.ticket.pdf_file.save("ticket.pdf", ContentFile(self.PDF))
+        self.url = f"/api/tickets/{self.ticket.id}/pdf/"
+        self.client.force_authenticate(user=self.user)
+
+    def test_etag_then_304(self):
+        """True Negative : If-None-Match identique → 304 sans corps"""
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(res.streaming_content), self.PDF)
+        res.close()
+        etag = res["ETag"]
+        self.assertTrue(res.has_header("Last-Modified"))
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_requests(self):
+        """True Negative : 206 pour un intervalle, 416 hors fichier"""
+        res = self.client.get(self.url, HTTP_RANGE="bytes=0-8")
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(res.streaming_content), self.PDF[:9])
+        self.assertEqual(res["Content-Range"], f"bytes 0-8/{len(self.PDF)}")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=-7")
+        self.assertEqual(b"".join(res.streaming_content), self.PDF[-7:])
+
+        res = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.PDF)}-")
+        self.assertEqual(res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_inverted_range_ignored(self):
+        """True Negative : début > fin → en-tête ignoré, fichier entier en 200"""
+        res = self.client.get(self.url, HTTP_RANGE="bytes=5-3")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.has_header("Content-Range"))
+        self.assertEqual(b"".join(res.streaming_content), self.PDF)
+
+    def test_x_accel_redirect(self):
+        """True Negative : mode nginx → aucun octet envoyé par Django"""
+        from django.test import override_settings
+
+        with override_settings(TICKET_PDF_SENDFILE="nginx", TICKET_PDF_ACCEL_PREFIX="/protected-media/"):
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["X-Accel-Redirect"], f"/protected-media/{self.ticket.pdf_file.name}")
+        self.assertEqual(res.content, b"")
+
+
+class TicketScanTest(APITestCase):
+    """
+    Scan d'un billet : compare-and-set + journal dans la même transaction
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("scan_user", password="pass123")
+        venue = Venue.objects.create(name="Stade Omnisports", address="Mfandena, Yaoundé", capacity=100)
+        event = Event.objects.create(
+            title="Scan Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(event=event, name="VIP", price=Decimal("5000.00"), quota=10)
+        self.ticket = Ticket.objects.create(order=Order.objects.create(user=self.user), ticket_type=self.ticket_type)
+        self.client.force_authenticate(user=self.user)
+
+    def test_scan_valid_then_duplicate(self):
+        """True Negative : premier scan VALID, le suivant DUPLICATE, chacun journalisé"""
+        res = self.client.post("/api/tickets/scan/", {"qr_hash": self.ticket.qr_payload}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"result": "VALID", "event": "Scan Event", "category": "VIP"})
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, "USED")
+        self.assertIsNotNone(self.ticket.scanned_at)
+
+        res = self.client.post("/api/tickets/scan/", {"qr_hash": self.ticket.qr_payload}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["result"], "DUPLICATE")
+
+        logs = list(ScanLog.objects.order_by("scanned_at").values_list("result", "ticket_id", "scanner_id"))
+        self.assertEqual(logs, [("VALID", self.ticket.id, self.user.id), ("DUPLICATE", self.ticket.id, self.user.id)])
+
+    def test_scan_invalid(self):
+        """True Positive : QR inconnu → INVALID, journalisé sans billet"""
+        res = self.client.post("/api/tickets/scan/", {"qr_hash": "0" * 64}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(res.data["result"], "INVALID")
+        self.assertTrue(ScanLog.objects.filter(result="INVALID", ticket__isnull=True).exists())
+
+    def test_scan_missing_hash(self):
+        """True Positive : hash absent → 400 sans journal"""
+        res = self.client.post("/api/tickets/scan/", {}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ScanLog.objects.exists())
+
+    def test_refunded_ticket_not_valid(self):
+        """True Positive : un billet remboursé ne passe pas le portique"""
+        self.ticket.refund()
+        res = self.client.post("/api/tickets/scan/", {"qr_hash": self.ticket.qr_payload}, format="json")
+        self.assertEqual(res.data["result"], "DUPLICATE")
+
+    def test_scan_query_count(self):
+        """True Negative : UPDATE conditionnel + lecture + journal, sans lecture préalable"""
+        from tickets.utils.scan import scan_ticket
+
+        # SAVEPOINT, UPDATE, SELECT, INSERT ScanLog, RELEASE
+        with self.assertNumQueries(5):
+            result, _ = scan_ticket(self.ticket.qr_hash)
+        self.assertEqual(result, "VALID")
+
+
+class ScanLogWriteBehindTest(APITestCase):
+    """
+    Journal des scans différé : lots par taille / par délai, back-pressure,
+    état du billet committé avant la réponse
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("scanlog_user", password="pass123")
+        venue = Venue.objects.create(name="Salle WB", address="Akwa, Douala", capacity=100)
+        event = Event.objects.create(
+            title="WB Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        ticket_type = TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=10)
+        self.ticket = Ticket.objects.create(order=Order.objects.create(user=self.user), ticket_type=ticket_type)
+
+    def _buffer(self, **kwargs):
+        from tickets.utils.scan_log import ScanLogBuffer
+
+        options = {"batch_size": 100, "flush_interval": 30, "max_size": 1000, **kwargs}
+        buffer = ScanLogBuffer(**options)
+        self.addCleanup(buffer._stopping.set)
+        return buffer
+
+    def _record_writes(self, buffer, expected):
+        """Remplace l'écriture en base par un enregistrement des lots (thread d'écriture)."""
+        import threading
+
+        batches, done = [], threading.Event()
+
+        def write(batch):
+            batches.append(len(batch))
+            if sum(batches) >= expected:
+                done.set()
+        buffer._write = write
+        return batches, done
+
+    def test_scan_does_not_wait_for_log(self):
+        """True Negative : VALID renvoyé, billet USED en base, ScanLog écrit au flush"""
+        from unittest import mock
+        from django.test import override_settings
+        from tickets.utils.scan import scan_ticket
+
+        buffer = self._buffer()
+        with override_settings(SCAN_LOG_WRITE_BEHIND=True), \
+                mock.patch("tickets.utils.scan.scan_log_buffer", return_value=buffer), \
+                mock.patch.object(buffer, "_ensure_started"):
+            before = timezone.now()
+            result, info = scan_ticket(self.ticket.qr_hash, device_info="gate-1")
+
+        self.assertEqual(result, "VALID")
+        self.assertEqual(info["event"], "WB Event")
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, "USED")
+        self.assertFalse(ScanLog.objects.exists())
+
+        buffer.flush()
+        log = ScanLog.objects.get()
+        self.assertEqual((log.ticket_id, log.result, log.device_info), (self.ticket.id, "VALID", "gate-1"))
+        self.assertGreaterEqual(log.scanned_at, before)
+
+    def test_flush_on_batch_size(self):
+        """True Negative : N entrées en file → un lot écrit sans attendre le délai"""
+        buffer = self._buffer(batch_size=3, flush_interval=30)
+        batches, done = self._record_writes(buffer, 6)
+        for _ in range(6):
+            buffer.add(ScanLog(result="INVALID"))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(batches, [3, 3])
+
+    def test_flush_on_interval(self):
+        """True Negative : lot incomplet écrit après flush_interval"""
+        buffer = self._buffer(batch_size=100, flush_interval=0.05)
+        batches, done = self._record_writes(buffer, 2)
+        buffer.add(ScanLog(result="INVALID"))
+        buffer.add(ScanLog(result="INVALID"))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(batches, [2])
+
+    def test_back_pressure_when_full(self):
+        """True Positive : file pleine → add() bloque jusqu'à ce qu'une place se libère"""
+        import threading
+        from unittest import mock
+
+        buffer = self._buffer(max_size=1)
+        with mock.patch.object(buffer, "_ensure_started"):
+            buffer.add(ScanLog(result="INVALID"))
+            blocked = threading.Thread(target=buffer.add, args=(ScanLog(result="INVALID"),))
+            blocked.start()
+            blocked.join(0.2)
+            self.assertTrue(blocked.is_alive())
+
+            self.assertEqual(len(buffer._drain(1)), 1)
+            blocked.join(5)
+            self.assertFalse(blocked.is_alive())
+        buffer.flush()
+        self.assertEqual(ScanLog.objects.count(), 1)
+
+    def test_close_drains_queue(self):
+        """True Negative : arrêt du processus → rien ne reste en file"""
+        buffer = self._buffer(batch_size=100, flush_interval=0.05)
+        batches, _ = self._record_writes(buffer, 5)
+        for _ in range(5):
+            buffer.add(ScanLog(result="INVALID"))
+        buffer.close()
+        self.assertEqual(sum(batches), 5)
+        self.assertTrue(buffer._queue.empty())
+
+
+class ScanManifestTest(APITestCase):
+    """
+    Manifeste hors-ligne des portiques : préfixes triés des billets valides + deltas
+    """
+
+    def setUp(self):
+        from django.test import override_settings
+
+        override = override_settings(SCAN_MANIFEST_CURSOR_LAG=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("manifest_user", password="pass123")
+        self.admin = User.objects.create_superuser("manifest_admin", "admin@test.com", "admin123")
+        venue = Venue.objects.create(name="Stade Ahmadou Ahidjo", address="Mfandena, Yaoundé", capacity=100)
+        self.event = Event.objects.create(
+            title="Manifest Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=20
+        )
+        self.ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=20)
+        order = Order.objects.create(user=self.user)
+        self.tickets = [Ticket.objects.create(order=order, ticket_type=self.ticket_type) for _ in range(4)]
+        self.url = f"/api/events/{self.event.id}/scan-manifest"
+        self.client.force_authenticate(user=self.admin)
+
+    def _manifest(self):
+        import struct
+
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/octet-stream")
+        magic, version, count, cursor = struct.unpack(">4sBIQ", res.content[:17])
+        self.assertEqual((magic, version), (b"EVTM", 1))
+        body = res.content[17:]
+        prefixes = [body[i:i + 8] for i in range(0, len(body), 8)]
+        self.assertEqual(len(prefixes), count)
+        return cursor, prefixes
+
+    def test_manifest_lists_valid_prefixes_sorted(self):
+        """True Negative : billets UNUSED seulement, préfixes de 8 octets triés"""
+        self.tickets[0].mark_used()
+        _, prefixes = self._manifest()
+        expected = sorted(bytes.fromhex(t.qr_hash[:16]) for t in self.tickets[1:])
+        self.assertEqual(prefixes, expected)
+
+    def test_delta_since_cursor(self):
+        """True Negative : seuls les billets émis / utilisés / remboursés depuis le curseur"""
+        cursor, _ = self._manifest()
+        self.tickets[0].mark_used()
+        self.tickets[1].refund()
+        new = Ticket.objects.create(order=self.tickets[0].order, ticket_type=self.ticket_type)
+
+        res = self.client.get(f"{self.url}/delta", {"since": cursor})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["add"], [new.qr_hash[:16]])
+        self.assertEqual(sorted(res.data["remove"]), sorted(t.qr_hash[:16] for t in self.tickets[:2]))
+        self.assertGreaterEqual(int(res.data["cursor"]), cursor)
+
+        # Rien de neuf depuis le nouveau curseur
+        res = self.client.get(f"{self.url}/delta", {"since": res.data["cursor"]})
+        self.assertEqual((res.data["add"], res.data["remove"]), ([], []))
+
+    def test_delta_invalid_cursor(self):
+        """True Positive : curseur absent ou illisible → 400"""
+        self.assertEqual(self.client.get(f"{self.url}/delta").status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(f"{self.url}/delta", {"since": "hier"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_manifest_staff_only(self):
+        """True Positive : un acheteur ne télécharge pas le manifeste"""
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(f"{self.url}/delta", {"since": 0}).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TicketScanBatchTest(APITestCase):
+    """
+    Rejeu groupé des scans hors-ligne : premier scan gagnant selon l'heure du portique
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("batch_user", password="pass123", is_staff=True)  # compte portique
+        venue = Venue.objects.create(name="Stade de la Réunification", address="Bépanda, Douala", capacity=100)
+        event = Event.objects.create(
+            title="Batch Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=20
+        )
+        ticket_type = TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=20)
+        order = Order.objects.create(user=self.user)
+        self.tickets = [Ticket.objects.create(order=order, ticket_type=ticket_type) for _ in range(3)]
+        self.t0 = timezone.now() - timezone.timedelta(minutes=30)
+        self.client.force_authenticate(user=self.user)
+
+    def _at(self, minutes):
+        return (self.t0 + timezone.timedelta(minutes=minutes)).isoformat()
+
+    def test_first_scan_wins_by_device_time(self):
+        """True Negative : l'entrée la plus ancienne est VALID, même reçue en dernier"""
+        a, b, _ = self.tickets
+        payload = [
+            {"qr_hash": a.qr_payload, "scanned_at": self._at(5), "device": "gate-2"},
+            {"qr_hash": b.qr_payload, "scanned_at": self._at(1), "device": "gate-1"},
+            {"qr_hash": "f" * 64, "scanned_at": self._at(2), "device": "gate-1"},
+            {"qr_hash": a.qr_payload, "scanned_at": self._at(3), "device": "gate-1"},
+        ]
+        res = self.client.post("/api/tickets/scan/batch/", payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["result"] for r in res.data], ["DUPLICATE", "VALID", "INVALID", "VALID"])
+        self.assertEqual(res.data[0]["qr_hash"], a.qr_payload)
+
+        a.refresh_from_db()
+        self.assertEqual(a.status, "USED")
+        self.assertEqual(a.scanned_at, self.t0 + timezone.timedelta(minutes=3))
+        logs = ScanLog.objects.filter(ticket=a).order_by("scanned_at")
+        self.assertEqual([(l.result, l.device_info) for l in logs], [("VALID", "gate-1"), ("DUPLICATE", "gate-2")])
+        self.assertEqual(ScanLog.objects.count(), 4)
+
+    def test_already_used_ticket_is_duplicate(self):
+        """True Positive : billet déjà validé en ligne → DUPLICATE, scanned_at avancé si plus ancien"""
+        ticket = self.tickets[0]
+        ticket.mark_used()
+        payload = [{"qr_hash": ticket.qr_payload, "scanned_at": self._at(0)}]
+        res = self.client.post("/api/tickets/scan/batch/", payload, format="json")
+        self.assertEqual(res.data[0]["result"], "DUPLICATE")
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.scanned_at, self.t0)
+
+    def test_constant_query_count(self):
+        """True Negative : le nombre de requêtes ne dépend pas de la taille du lot"""
+        from tickets.utils.scan import scan_batch
+
+        entries = [
+            {"qr_hash": t.qr_hash, "scanned_at": self.t0 + timezone.timedelta(seconds=i), "device": "gate"}
+            for i, t in enumerate(self.tickets * 2)
+        ]
+        # SAVEPOINT, SELECT FOR UPDATE, UPDATE, INSERT ScanLog, RELEASE
+        with self.assertNumQueries(5):
+            results = scan_batch(entries)
+        self.assertEqual(results, ["VALID"] * 3 + ["DUPLICATE"] * 3)
+
+    def test_invalid_payload(self):
+        """True Positive : lot vide ou entrée sans horodatage → 400"""
+        res = self.client.post("/api/tickets/scan/batch/", [], format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post("/api/tickets/scan/batch/", [{"qr_hash": self.tickets[0].qr_payload}], format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ScanLog.objects.exists())
+
+    def test_requires_staff(self):
+        """True Positive : anonyme → 401/403, client non staff → 403, aucun billet validé"""
+        payload = [{"qr_hash": self.tickets[0].qr_payload, "scanned_at": self._at(0)}]
+        self.client.force_authenticate(user=None)
+        res = self.client.post("/api/tickets/scan/batch/", payload, format="json")
+        self.assertIn(res.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        customer = User.objects.create_user("batch_customer", password="pass123")
+        self.client.force_authenticate(user=customer)
+        res = self.client.post("/api/tickets/scan/batch/", payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Ticket.objects.filter(status="USED").exists())
+        self.assertFalse(ScanLog.objects.exists())
+
+
+class ScanCacheTest(APITestCase):
+    """
+    Index qr_hash en mémoire : préchargement par fenêtre, scans sans jointure,
+    écriture après scan, relecture par tampon de version (updated_at)
+    """
+
+    def setUp(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.test import override_settings
+        from tickets.utils.scan_cache import ScanCache
+
+        override = override_settings(SCAN_CACHE_ENABLED=True, SCAN_MANIFEST_CURSOR_LAG=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user("cache_user", password="pass123")
+        venue = Venue.objects.create(name="Stade Roumdé Adjia", address="Garoua", capacity=100)
+        today = Event.objects.create(
+            title="Derby du Nord",
+            start_time=timezone.now() + timezone.timedelta(hours=2),
+            end_time=timezone.now() + timezone.timedelta(hours=4),
+            venue=venue,
+            quota_global=20
+        )
+        later = Event.objects.create(
+            title="Saison prochaine",
+            start_time=timezone.now() + timezone.timedelta(days=60),
+            end_time=timezone.now() + timezone.timedelta(days=60, hours=2),
+            venue=venue,
+            quota_global=20
+        )
+        self.ticket_type = TicketType.objects.create(event=today, name="Tribune", price=Decimal("2000.00"), quota=20)
+        later_type = TicketType.objects.create(event=later, name="Tribune", price=Decimal("2000.00"), quota=20)
+        order = Order.objects.create(user=self.user)
+        self.tickets = [Ticket.objects.create(order=order, ticket_type=self.ticket_type) for _ in range(3)]
+        self.later_ticket = Ticket.objects.create(order=order, ticket_type=later_type)
+
+        self.cache = ScanCache(window=timedelta(hours=12), refresh_interval=3600, reload_interval=3600)
+        patcher = mock.patch("tickets.utils.scan.scan_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _scan(self, qr_hash):
+        from tickets.utils.scan import scan_ticket
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return scan_ticket(qr_hash)
+
+    def test_preloads_events_in_window(self):
+        """True Negative : seuls les billets des événements proches sont préchargés"""
+        self.cache.load()
+        self.assertEqual(len(self.cache), 3)
+        entry = self.cache.lookup(self.tickets[0].qr_hash)
+        self.assertEqual((entry.ticket_id, entry.status, entry.labels),
+                         (self.tickets[0].id, "UNUSED", ("Derby du Nord", "Tribune")))
+        # Libellés partagés par catégorie
+        self.assertIs(entry.labels, self.cache.lookup(self.tickets[1].qr_hash).labels)
+
+    def test_scan_without_join(self):
+        """True Negative : VALID = UPDATE seul ; DUPLICATE (écrit après commit) = aucune lecture"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.cache.load()
+        qr_hash = self.tickets[0].qr_hash
+        with CaptureQueriesContext(connection) as queries:
+            result, info = self._scan(qr_hash)
+        self.assertEqual((result, info), ("VALID", {"event": "Derby du Nord", "category": "Tribune"}))
+        self.assertFalse(any("SELECT" in q["sql"] for q in queries.captured_queries))
+        self.assertEqual(self.cache.lookup(qr_hash).status, "USED")
+
+        # SAVEPOINT, INSERT ScanLog, RELEASE
+        with self.assertNumQueries(3):
+            result, _ = self._scan(qr_hash)
+        self.assertEqual(result, "DUPLICATE")
+        self.assertEqual(ScanLog.objects.filter(ticket=self.tickets[0]).count(), 2)
+
+    def test_invalid_and_outside_window(self):
+        """True Positive : QR inconnu → INVALID sans jointure ; billet hors fenêtre lu à la demande"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.cache.load()
+        with CaptureQueriesContext(connection) as queries:
+            result, _ = self._scan("e" * 64)
+        self.assertEqual(result, "INVALID")
+        self.assertFalse(any("JOIN" in q["sql"] for q in queries.captured_queries))
+
+        result, info = self._scan(self.later_ticket.qr_hash)
+        self.assertEqual((result, info["event"]), ("VALID", "Saison prochaine"))
+
+    def test_outside_window_not_cached(self):
+        """True Negative : billet hors fenêtre lu sans être gardé ; re-scan tranché par la base"""
+        self.cache.load()
+        self.assertEqual(self.cache.lookup(self.later_ticket.qr_hash).ticket_id, self.later_ticket.id)
+        self.assertIsNone(self.cache.lookup("e" * 64))
+        self.assertEqual(len(self.cache), 3)
+
+        self.assertEqual(self._scan(self.later_ticket.qr_hash)[0], "VALID")
+        self.assertEqual(self._scan(self.later_ticket.qr_hash)[0], "DUPLICATE")
+        self.assertEqual(len(self.cache), 3)
+
+    def test_refresh_by_version_stamp(self):
+        """True Positive : remboursement / nouveau billet faits ailleurs relus via updated_at"""
+        self.cache.load()
+        self.tickets[1].refund()
+        new = Ticket.objects.create(order=self.tickets[0].order, ticket_type=self.ticket_type)
+        self.cache.refresh_interval = 0
+
+        self.assertEqual(self.cache.lookup(self.tickets[1].qr_hash).status, "REFUNDED")
+        self.assertEqual(len(self.cache), 4)
+        self.assertEqual(self._scan(self.tickets[1].qr_hash)[0], "DUPLICATE")
+        self.assertEqual(self._scan(new.qr_hash)[0], "VALID")
+
+    def test_stale_unused_entry_still_safe(self):
+        """True Positive : cache en retard (UNUSED) → le compare-and-set tranche DUPLICATE"""
+        self.cache.load()
+        Ticket.objects.filter(pk=self.tickets[2].pk).update(status="USED")
+        self.assertEqual(self._scan(self.tickets[2].qr_hash)[0], "DUPLICATE")
+        self.assertEqual(self.cache.lookup(self.tickets[2].qr_hash).status, "USED")
+
+
+class SignedQrCodeTest(APITestCase):
+    """
+    QR signés « billet.événement.mac » : rejet sans base des codes forgés,
+    mauvais événement, rotation de clé, compatibilité des anciens hash
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("signed_user", password="pass123")
+        self.staff = User.objects.create_user("signed_staff", password="pass123", is_staff=True)
+        venue = Venue.objects.create(name="Stade de Limbé", address="Limbé", capacity=100)
+        self.event = Event.objects.create(
+            title="Signed Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=10)
+        self.ticket = Ticket.objects.create(order=Order.objects.create(user=self.user), ticket_type=ticket_type)
+        self.client.force_authenticate(user=self.user)
+
+    def _scan(self, data):
+        return self.client.post("/api/tickets/scan/", data, format="json")
+
+    def test_payload_format_and_hash(self):
+        """True Negative : qr_hash = SHA-256 du contenu signé, exposé par l'API"""
+        import hashlib
+
+        payload = self.ticket.qr_payload
+        ticket_hex, event, mac = payload.split(".")
+        self.assertEqual((ticket_hex, event), (self.ticket.id.hex, str(self.event.id)))
+        self.assertEqual(len(mac), 22)
+        self.assertEqual(self.ticket.qr_hash, hashlib.sha256(payload.encode()).hexdigest())
+        self.assertEqual(self.ticket.qr_code, payload)
+
+        res = self.client.get(f"/api/tickets/{self.ticket.id}/")
+        self.assertEqual(res.data["qr_payload"], payload)
+
+    def test_scan_signed_payload(self):
+        """True Negative : contenu signé du bon événement → VALID"""
+        res = self._scan({"qr": self.ticket.qr_payload, "event": self.event.id})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["result"], "VALID")
+
+    def test_forged_codes_rejected_without_db(self):
+        """True Positive : signature fausse / format illisible → INVALID, aucune requête"""
+        ticket_hex, event, mac = self.ticket.qr_payload.split(".")
+        forged = f"{uuid.uuid4().hex}.{event}.{mac}"
+        for code, reason in [(forged, "signature"), (f"{ticket_hex}.{event}.{'A' * 22}", "signature"),
+                             ("bonjour", "format"), ("x.y.z", "format")]:
+            with self.assertNumQueries(0):
+                res = self._scan({"qr": code})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual((res.data["result"], res.data["reason"]), ("INVALID", reason))
+        self.assertFalse(ScanLog.objects.exists())
+
+    def test_wrong_event_rejected(self):
+        """True Positive : billet d'un autre événement → INVALID sans base"""
+        with self.assertNumQueries(0):
+            res = self._scan({"qr": self.ticket.qr_payload, "event": self.event.id + 1})
+        self.assertEqual(res.data["reason"], "event")
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, "UNUSED")
+
+    def test_key_rotation(self):
+        """True Negative : QR signé avec l'ancienne clé accepté via SECRET_KEY_FALLBACKS"""
+        from django.conf import settings
+        from django.test import override_settings
+
+        payload = self.ticket.qr_payload
+        with override_settings(SECRET_KEY="nouvelle-cle-" + "x" * 40, SECRET_KEY_FALLBACKS=[settings.SECRET_KEY]):
+            self.assertEqual(self._scan({"qr": payload}).data["result"], "VALID")
+        with override_settings(SECRET_KEY="nouvelle-cle-" + "x" * 40, SECRET_KEY_FALLBACKS=[]):
+            self.assertEqual(self._scan({"qr": payload}).data["reason"], "signature")
+
+    def test_rotation_render_then_scan(self):
+        """True Negative : billet émis avant la rotation, rendu après → même QR signé, scan VALID"""
+        import tempfile
+        from unittest import mock
+        from django.conf import settings
+        from django.test import override_settings
+        from tickets.utils import qr
+        from tickets.utils.pdf import build_ticket_pdf
+
+        issued = self.ticket.qr_payload
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with override_settings(SECRET_KEY="nouvelle-cle-" + "x" * 40, SECRET_KEY_FALLBACKS=[settings.SECRET_KEY],
+                               TICKET_PDF_RENDERER="template", TICKET_PDF_TEMPLATE_DIR=tmp.name):
+            ticket = Ticket.objects.select_related("ticket_type__event__venue").get(pk=self.ticket.pk)
+            self.assertEqual((ticket.qr_payload, ticket.qr_code), (issued, issued))
+            qr.clear_cache()
+            with mock.patch("tickets.utils.qr.qr_matrix", wraps=qr.qr_matrix) as encode:
+                build_ticket_pdf(ticket)
+            printed = encode.call_args.args[0]
+            self.assertEqual(printed, issued)
+            self.assertEqual(self.client.get(f"/api/tickets/{ticket.id}/").data["qr_payload"], issued)
+            res = self._scan({"qr": printed, "event": self.event.id})
+            self.assertEqual((res.status_code, res.data["result"]), (status.HTTP_200_OK, "VALID"))
+
+    def test_legacy_hash_compatibility(self):
+        """True Negative : ancien billet (hash opaque) toujours accepté, QR imprimé inchangé"""
+        from django.test import override_settings
+
+        legacy = "ab" * 32
+        Ticket.objects.filter(pk=self.ticket.pk).update(qr_hash=legacy, legacy_qr=True)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.qr_code, legacy)
+        with override_settings(TICKET_QR_ACCEPT_LEGACY=False):
+            self.assertEqual(self._scan({"qr_hash": legacy}).data["reason"], "format")
+        self.assertEqual(self._scan({"qr_hash": legacy}).data["result"], "VALID")
+
+    def test_signed_ticket_raw_hash_rejected(self):
+        """True Positive : qr_hash brut d'un billet signé (exposé par l'API) → INVALID, billet intact"""
+        for body in ({"qr_hash": self.ticket.qr_hash}, {"qr_hash": self.ticket.qr_hash, "event": self.event.id + 1}):
+            res = self._scan(body)
+            self.assertEqual((res.status_code, res.data["result"]), (status.HTTP_404_NOT_FOUND, "INVALID"))
+        self.client.force_authenticate(user=self.staff)
+        batch = self.client.post("/api/tickets/scan/batch/",
+                                 [{"qr_hash": self.ticket.qr_hash, "scanned_at": timezone.now().isoformat()}],
+                                 format="json")
+        self.assertEqual([entry["result"] for entry in batch.data], ["INVALID"])
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, "UNUSED")
+
+    def test_legacy_hash_wrong_event(self):
+        """True Positive : code opaque présenté au portique d'un autre événement → INVALID en base"""
+        Ticket.objects.filter(pk=self.ticket.pk).update(legacy_qr=True)
+        res = self._scan({"qr_hash": self.ticket.qr_hash, "event": self.event.id + 1})
+        self.assertEqual(res.data["result"], "INVALID")
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, "UNUSED")
+        self.assertEqual(self._scan({"qr_hash": self.ticket.qr_hash, "event": self.event.id}).data["result"], "VALID")
+
+    def test_batch_rejects_forged_entries(self):
+        """True Positive : lot mixte → entrées forgées INVALID, les autres appliquées"""
+        now = timezone.now().isoformat()
+        payload = [
+            {"qr_hash": self.ticket.qr_payload, "scanned_at": now},
+            {"qr_hash": f"{uuid.uuid4().hex}.{self.event.id}.{'A' * 22}", "scanned_at": now},
+        ]
+        self.client.force_authenticate(user=self.staff)
+        res = self.client.post("/api/tickets/scan/batch/", payload, format="json")
+        self.assertEqual([r["result"] for r in res.data], ["VALID", "INVALID"])
+        self.assertEqual(ScanLog.objects.count(), 1)
+
+
+class BinaryQrHashTest(APITestCase):
+    """
+    qr_hash stocké sur 32 octets (HexDigestField) : hexadécimal côté Python
+    et API, recherches exact / in, rejet des valeurs mal formées
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("binary_user", password="pass123")
+        venue = Venue.objects.create(name="Palais des Sports", address="Yaoundé", capacity=100)
+        event = Event.objects.create(
+            title="Binary Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        ticket_type = TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=10)
+        order = Order.objects.create(user=self.user)
+        self.tickets = [Ticket.objects.create(order=order, ticket_type=ticket_type) for _ in range(3)]
+        self.client.force_authenticate(user=self.user)
+
+    def test_stored_as_binary(self):
+        """True Negative : 32 octets en base, même valeur hexadécimale relue"""
+        from django.db import connection
+
+        ticket = self.tickets[0]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT qr_hash FROM tickets_ticket WHERE id = %s", [ticket.id.hex])
+            raw = bytes(cursor.fetchone()[0])
+        self.assertEqual(len(raw), 32)
+        self.assertEqual(raw.hex(), ticket.qr_hash)
+        ticket.refresh_from_db()
+        self.assertEqual(len(ticket.qr_hash), 64)
+
+    def test_hex_lookups(self):
+        """True Negative : filtres exact et in sur la chaîne hexadécimale"""
+        hashes = [t.qr_hash for t in self.tickets]
+        self.assertEqual(Ticket.objects.get(qr_hash=hashes[1]).pk, self.tickets[1].pk)
+        self.assertEqual(Ticket.objects.filter(qr_hash__in=hashes[:2]).count(), 2)
+        self.assertFalse(Ticket.objects.filter(qr_hash="00" * 32).exists())
+
+    def test_api_returns_hex(self):
+        """True Negative : l'API expose toujours l'empreinte en hexadécimal"""
+        ticket = self.tickets[0]
+        res = self.client.get(f"/api/tickets/{ticket.id}/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["qr_hash"], ticket.qr_hash)
+
+    def test_invalid_hex_rejected(self):
+        """True Positive : valeur non hexadécimale ou de mauvaise taille → ValidationError"""
+        from django.core.exceptions import ValidationError
+
+        with self.assertRaises(ValidationError):
+            Ticket.objects.filter(qr_hash="zz" * 32).exists()
+        with self.assertRaises(ValidationError):
+            Ticket.objects.filter(qr_hash="ab" * 16).exists()
+
+
+class UuidV7PrimaryKeyTest(APITestCase):
+    """
+    Clés primaires UUID v7 : version et variante RFC 9562, ordre croissant,
+    horodatage de création encodé dans l'identifiant
+    """
+
+    def test_uuid7_format_and_order(self):
+        """True Negative : version 7, variante RFC, strictement croissants"""
+        from tickets.utils.ids import uuid7
+
+        values = [uuid7() for _ in range(10000)]
+        self.assertTrue(all(v.version == 7 and v.variant == uuid.RFC_4122 for v in values))
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_models_use_uuid7(self):
+        """True Negative : commande et billet reçoivent un UUID v7 daté de leur création"""
+        from tickets.utils.ids import uuid7_datetime
+
+        user = User.objects.create_user("uuid7_user", password="pass123")
+        venue = Venue.objects.create(name="Salle UUID", address="Douala", capacity=10)
+        event = Event.objects.create(
+            title="UUID Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        ticket_type = TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=10)
+        order = Order.objects.create(user=user)
+        ticket = Ticket.objects.create(order=order, ticket_type=ticket_type)
+        log = ScanLog.objects.create(ticket=ticket, result="VALID")
+        self.assertEqual({order.id.version, ticket.id.version, log.id.version}, {7})
+        self.assertLess(order.id, ticket.id)
+        self.assertLess(abs(uuid7_datetime(ticket.id) - timezone.now()), timezone.timedelta(seconds=5))
+
+
+class ShardedInventoryTest(APITestCase):
+    """
+    Inventaire découpé en buckets : capacité retirée des compteurs, achats
+    servis par les buckets (repli si vide), rééquilibrage, remboursement,
+    jamais de survente
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("shard_user", password="pass123")
+        venue = Venue.objects.create(name="Stade Omnisports", address="Yaoundé", capacity=100)
+        self.event = Event.objects.create(
+            title="Flash Sale",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=20
+        )
+        self.hot = TicketType.objects.create(event=self.event, name="Fosse", price=Decimal("1000.00"), quota=10)
+        self.other = TicketType.objects.create(event=self.event, name="Tribune", price=Decimal("2000.00"), quota=10)
+        self.client.force_authenticate(user=self.user)
+
+    def _buy(self, *types):
+        return self.client.post("/api/orders/", {"tickets": [{"ticket_type": tt.id} for tt in types]}, format="json")
+
+    def test_shard_carves_counters(self):
+        """True Negative : 10 places en 4 buckets, compteurs réservés, disponibilités inchangées"""
+        from tickets.models import InventoryBucket
+        from tickets.utils.inventory import shard
+
+        self.assertEqual(shard(self.hot, 4), 10)
+        self.assertEqual(list(self.hot.buckets.values_list("capacity", flat=True)), [3, 3, 2, 2])
+        self.hot.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual((self.hot.sold_count, self.event.sold_count), (10, 10))
+        self.assertEqual(self.hot.quota_remaining(), 10)
+        self.assertEqual(self.event.quota_remaining(), 20)
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.hot), 10)
+
+    def test_purchase_uses_buckets_without_oversell(self):
+        """True Positive : quota épuisé via les buckets, l'achat suivant est refusé"""
+        from tickets.utils.inventory import shard
+
+        shard(self.hot, 3)
+        for _ in range(5):
+            self.assertEqual(self._buy(self.hot, self.hot).status_code, status.HTTP_201_CREATED)
+        res = self._buy(self.hot)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ticket.objects.filter(ticket_type=self.hot).count(), 10)
+        self.assertEqual(sum(b.sold_count for b in self.hot.buckets.all()), 10)
+        self.hot.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.hot.sold_count, 10)
+        self.assertEqual(self.hot.quota_remaining(), 0)
+        self.assertEqual(self.event.quota_remaining(), 10)
+
+    def test_fallback_and_split_across_buckets(self):
+        """True Negative : bucket vide → repli ; commande répartie sur plusieurs buckets"""
+        from tickets.models import InventoryBucket
+        from tickets.utils.inventory import shard
+
+        shard(self.hot, 2)
+        InventoryBucket.objects.filter(ticket_type=self.hot, index=0).update(sold_count=5)
+        self.assertTrue(InventoryBucket.take(self.hot.pk, 2, 1))
+        self.assertEqual(self.hot.buckets.get(index=1).sold_count, 1)
+        # 1 place libre dans le bucket 0, 4 dans le bucket 1 : 5 places en une commande
+        InventoryBucket.objects.filter(ticket_type=self.hot, index=0).update(sold_count=4)
+        self.assertTrue(InventoryBucket.take(self.hot.pk, 2, 5))
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.hot), 0)
+        self.assertFalse(InventoryBucket.take(self.hot.pk, 2, 1))
+
+    def test_mixed_order_and_event_quota(self):
+        """True Negative : commande mixte, la catégorie non découpée garde le chemin verrouillé"""
+        from io import StringIO
+        from django.core.management import call_command
+        from tickets.utils.inventory import shard
+
+        shard(self.hot, 2)
+        res = self._buy(self.hot, self.other, self.other)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.other.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.other.sold_count, 2)
+        self.assertEqual(self.event.sold_count, 12)  # 10 découpées + 2 Tribune
+        self.assertEqual(self.event.quota_remaining(), 17)
+
+        # Le recalcul depuis les billets conserve la capacité découpée
+        Event.objects.filter(pk=self.event.pk).update(sold_count=0)
+        call_command("rebuild_sold_counts", stdout=StringIO())
+        self.event.refresh_from_db()
+        self.hot.refresh_from_db()
+        self.assertEqual((self.event.sold_count, self.hot.sold_count), (12, 10))
+
+    def test_rebalance_and_refund(self):
+        """True Negative : rééquilibrage des buckets, remboursement rendu à un bucket"""
+        from django.core.management import call_command
+        from tickets.models import InventoryBucket
+        from tickets.utils.inventory import rebalance, shard
+
+        from io import StringIO
+
+        shard(self.hot, 2)
+        InventoryBucket.objects.filter(ticket_type=self.hot, index=0).update(sold_count=5)
+        self.assertEqual(rebalance(self.hot), 3)
+        self.assertEqual(list(self.hot.buckets.values_list("capacity", "sold_count")), [(8, 5), (2, 0)])
+
+        self._buy(self.hot)
+        Ticket.objects.get(ticket_type=self.hot).refund()
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.hot), 5)
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.sold_count, 10)
+
+        call_command("rebalance_inventory", "--once", stdout=StringIO())
+        free = [b.capacity - b.sold_count for b in self.hot.buckets.all()]
+        self.assertEqual(free, [3, 2])
+
+    def test_unshard_returns_stock(self):
+        """True Negative : retour au compteur unique, capacité invendue rendue"""
+        from tickets.utils.inventory import shard
+
+        shard(self.hot, 4)
+        self._buy(self.hot, self.hot, self.hot)
+        shard(self.hot, 0)
+        self.hot.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual((self.hot.inventory_shards, self.hot.sold_count, self.event.sold_count), (0, 3, 3))
+        self.assertFalse(self.hot.buckets.exists())
+
+
+class SeatHoldTest(APITestCase):
+    """
+    Retenue des places des commandes PENDING (ORDER_HOLD_TTL) : quotas
+    vendues + retenues, paiement, annulation, expiration par balayage
+    """
+
+    def setUp(self):
+        from django.test import override_settings
+
+        self.settings_override = override_settings(ORDER_HOLD_TTL=900)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user("hold_user", password="pass123")
+        self.staff = User.objects.create_user("hold_staff", password="pass123", is_staff=True)
+        venue = Venue.objects.create(name="Canal Olympia", address="Bessengue, Douala", capacity=100)
+        self.event = Event.objects.create(
+            title="Hold Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=5)
+        self.client.force_authenticate(user=self.user)
+
+    def _buy(self, n=1):
+        return self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}] * n}, format="json")
+
+    def _counters(self):
+        self.ticket_type.refresh_from_db()
+        self.event.refresh_from_db()
+        return (self.ticket_type.sold_count, self.ticket_type.held_count,
+                self.event.sold_count, self.event.held_count)
+
+    def test_order_holds_seats(self):
+        """True Negative : commande PENDING → places retenues, échéance exposée"""
+        res = self._buy(2)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["status"], "PENDING")
+        self.assertIsNotNone(res.data["hold_expires_at"])
+        self.assertEqual(self._counters(), (0, 2, 0, 2))
+        self.assertEqual(self.ticket_type.quota_remaining(), 3)
+        self.assertEqual(self.event.quota_remaining(), 8)
+
+    def test_held_seats_are_not_resold(self):
+        """True Positive : places retenues comptées dans le quota → 400"""
+        self._buy(4)
+        self.assertEqual(self._buy(2).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._counters(), (0, 4, 0, 4))
+
+    def test_confirm_converts_holds(self):
+        """True Negative : paiement confirmé par le staff → PAID, retenues converties en ventes"""
+        from tickets.models import SeatHold
+
+        order_id = self._buy(2).data["id"]
+        self.assertEqual(self.client.post(f"/api/orders/{order_id}/confirm/").status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.staff)
+        res = self.client.post(f"/api/orders/{order_id}/confirm/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], "PAID")
+        self.assertIsNone(res.data["hold_expires_at"])
+        self.assertEqual(self._counters(), (2, 0, 2, 0))
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(self.client.post(f"/api/orders/{order_id}/confirm/").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_cancel_releases_seats(self):
+        """True Negative : annulation par l'acheteur → CANCELLED, billets invalidés, places rendues"""
+        order_id = self._buy(3).data["id"]
+        res = self.client.post(f"/api/orders/{order_id}/cancel/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], "CANCELLED")
+        self.assertEqual(self._counters(), (0, 0, 0, 0))
+        self.assertEqual(set(Ticket.objects.filter(order_id=order_id).values_list("status", flat=True)), {"REFUNDED"})
+        self.assertEqual(self.client.post(f"/api/orders/{order_id}/cancel/").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_sweeper_expires_in_chunks(self):
+        """True Negative : retenues échues libérées par tranches, les autres conservées"""
+        from io import StringIO
+        from django.core.management import call_command
+        from tickets.models import SeatHold
+
+        expired = [self._buy(1).data["id"] for _ in range(3)]
+        kept = self._buy(1).data["id"]
+        SeatHold.objects.filter(order_id__in=expired).update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+
+        out = StringIO()
+        call_command("expire_holds", "--once", "--chunk-size", "2", stdout=out)
+        self.assertIn("3 commande(s)", out.getvalue())
+        self.assertEqual(Order.objects.filter(pk__in=expired, status="CANCELLED").count(), 3)
+        self.assertEqual(Order.objects.get(pk=kept).status, "PENDING")
+        self.assertEqual(self._counters(), (0, 1, 0, 1))
+
+    def test_confirm_after_expiry_releases(self):
+        """True Positive : paiement après l'échéance refusé, places libérées sur-le-champ"""
+        from tickets.models import SeatHold
+
+        order_id = self._buy(2).data["id"]
+        SeatHold.objects.filter(order_id=order_id).update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.post(f"/api/orders/{order_id}/confirm/").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.get(pk=order_id).status, "CANCELLED")
+        self.assertEqual(self._counters(), (0, 0, 0, 0))
+
+    def test_bucketed_hold_returns_to_buckets(self):
+        """True Negative : catégorie découpée → la place retenue retourne dans un bucket"""
+        from tickets.models import InventoryBucket
+        from tickets.utils.inventory import shard
+
+        shard(self.ticket_type, 2)
+        order_id = self._buy(2).data["id"]
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.ticket_type), 3)
+        self.assertEqual(self._counters(), (5, 0, 5, 0))  # capacité découpée, held_count inchangé
+        self.client.post(f"/api/orders/{order_id}/cancel/")
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.ticket_type), 5)
+
+    def test_multi_bucket_hold_released(self):
+        """True Negative : retenue répartie sur deux buckets → rendue en entier (annulation puis expiration)"""
+        from tickets.models import InventoryBucket, SeatHold
+        from tickets.utils.holds import expire_holds
+        from tickets.utils.inventory import shard
+
+        self.ticket_type.quota = 4
+        self.ticket_type.save()
+        shard(self.ticket_type, 2)  # buckets de 2 : 3 places réparties 2 + 1
+        order_id = self._buy(3).data["id"]
+        self.assertEqual(sorted(InventoryBucket.objects.values_list("sold_count", flat=True)), [1, 2])
+        self.assertEqual(self.client.post(f"/api/orders/{order_id}/cancel/").status_code, status.HTTP_200_OK)
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.ticket_type), 4)
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.quota_remaining(), 4)
+
+        order_id = self._buy(3).data["id"]
+        self.assertEqual(Order.objects.get(pk=order_id).status, "PENDING")
+        SeatHold.objects.filter(order_id=order_id).update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(expire_holds(), 1)
+        self.assertEqual(InventoryBucket.free_stock(ticket_type=self.ticket_type), 4)
+        self.assertEqual(self._buy(3).status_code, status.HTTP_201_CREATED)
+
+    def test_held_ticket_not_scannable(self):
+        """True Positive : billet d'une commande non payée → scan INVALID, ni PDF ni manifeste ; payé → VALID"""
+        order_id = self._buy(1).data["id"]
+        ticket = Ticket.objects.get(order_id=order_id)
+        self.assertEqual(ticket.status, "HELD")
+        res = self.client.post("/api/tickets/scan/", {"qr": ticket.qr_payload}, format="json")
+        self.assertEqual((res.status_code, res.data["result"]), (status.HTTP_404_NOT_FOUND, "INVALID"))
+        self.assertEqual(self.client.get(f"/api/tickets/{ticket.id}/pdf/").status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.staff)
+        manifest = self.client.get(f"/api/events/{self.event.id}/scan-manifest").content
+        self.assertEqual(int.from_bytes(manifest[5:9], "big"), 0)
+        batch = self.client.post("/api/tickets/scan/batch/",
+                                 [{"qr_hash": ticket.qr_payload, "scanned_at": timezone.now().isoformat()}], format="json")
+        self.assertEqual([entry["result"] for entry in batch.data], ["INVALID"])
+        self.client.post(f"/api/orders/{order_id}/confirm/")
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, "UNUSED")
+        res = self.client.post("/api/tickets/scan/", {"qr": ticket.qr_payload}, format="json")
+        self.assertEqual((res.status_code, res.data["result"]), (status.HTTP_200_OK, "VALID"))
+
+    def test_held_ticket_scan_cached(self):
+        """True Positive : index de scan en mémoire → retenu INVALID, payé ensuite VALID"""
+        from datetime import timedelta
+        from unittest import mock
+        from django.test import override_settings
+        from tickets.utils.holds import confirm_order
+        from tickets.utils.scan import scan_ticket
+        from tickets.utils.scan_cache import ScanCache
+
+        order_id = self._buy(1).data["id"]
+        ticket = Ticket.objects.get(order_id=order_id)
+        cache = ScanCache(window=timedelta(days=2), refresh_interval=3600, reload_interval=3600)
+        with override_settings(SCAN_CACHE_ENABLED=True), \
+                mock.patch("tickets.utils.scan.scan_cache", return_value=cache):
+            self.assertEqual(scan_ticket(ticket.qr_hash)[0], "INVALID")
+            self.assertEqual(cache.lookup(ticket.qr_hash).status, "HELD")
+            confirm_order(order_id)
+            self.assertEqual(scan_ticket(ticket.qr_hash)[0], "VALID")
+
+    def test_expired_hold_ticket_stays_unusable(self):
+        """True Positive : retenue expirée → billet REFUNDED sans être jamais passé USED"""
+        from tickets.models import SeatHold
+        from tickets.utils.holds import expire_holds
+
+        order_id = self._buy(1).data["id"]
+        ticket = Ticket.objects.get(order_id=order_id)
+        self.client.post("/api/tickets/scan/", {"qr": ticket.qr_payload}, format="json")
+        SeatHold.objects.update(expires_at=timezone.now())
+        expire_holds()
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.status, ticket.scanned_at), ("REFUNDED", None))
+
+    def test_rebuild_keeps_holds(self):
+        """True Negative : le recalcul distingue billets vendus et retenus"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        order_id = self._buy(2).data["id"]
+        self.client.force_authenticate(user=self.staff)
+        self.client.post(f"/api/orders/{order_id}/confirm/")
+        self.client.force_authenticate(user=self.user)
+        self._buy(1)
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(sold_count=0, held_count=0)
+        call_command("rebuild_sold_counts", stdout=StringIO())
+        self.assertEqual(self._counters(), (2, 1, 2, 1))
+
+
+class WaitingRoomTest(APITestCase):
+    """
+    File d'attente virtuelle : jetons espacés de 60 / rate secondes,
+    sondage sans authentification, commande admise par jeton uniquement
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("queue_user", password="pass123")
+        self.other = User.objects.create_user("queue_other", password="pass123")
+        self.staff = User.objects.create_user("queue_staff", password="pass123", is_staff=True)
+        venue = Venue.objects.create(name="Palais des Sports", address="Warda, Yaoundé", capacity=100)
+        self.event = Event.objects.create(
+            title="Queue Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=5)
+        self.client.force_authenticate(user=self.user)
+
+    def _open(self, rate=60):
+        from tickets.models import WaitingRoom
+        return WaitingRoom.objects.create(event=self.event, rate=rate)
+
+    def _join(self):
+        return self.client.post(f"/api/events/{self.event.id}/queue/")
+
+    def _buy(self, token=None):
+        headers = {"HTTP_X_QUEUE_TOKEN": str(token)} if token else {}
+        return self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}]},
+                                format="json", **headers)
+
+    def _admitted_token(self):
+        from tickets.models import QueueTicket
+        self._open()
+        token = self._join().data["token"]
+        QueueTicket.objects.filter(pk=token).update(admit_at=timezone.now() - timezone.timedelta(seconds=1))
+        return token
+
+    def test_no_room_no_queue(self):
+        """True Positive : pas de file → 404 au join, commande libre"""
+        self.assertEqual(self._join().status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self._buy().status_code, status.HTTP_201_CREATED)
+
+    def test_staff_configures_room(self):
+        """True Negative : le staff règle le débit ; un acheteur ne le peut pas"""
+        url = f"/api/events/{self.event.id}/waiting-room/"
+        self.assertEqual(self.client.put(url, {"rate": 100}, format="json").status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.put(url, {"rate": 100, "is_active": True}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((res.data["rate"], res.data["waiting"]), (100, 0))
+        self.assertEqual(self.client.put(url, {"rate": 0}, format="json").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url).data["rate"], 100)
+
+    def test_join_paces_admissions(self):
+        """True Negative : créneaux espacés de 60 / rate, rejoindre rend le même jeton"""
+        self._open(rate=600)
+        first = self._join()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(first.data["admitted"])
+        self.client.force_authenticate(user=self.other)
+        second = self._join().data
+        self.assertAlmostEqual((second["admit_at"] - first.data["admit_at"]).total_seconds(), 0.1, places=3)
+        self.assertEqual(second["position"], 1)
+        self.assertFalse(second["admitted"])
+        self.assertEqual(self._join().data["token"], second["token"])
+
+    def test_burst_spread_over_time(self):
+        """True Negative : 100 arrivées simultanées à 600/min → admissions étalées sur ~10 s"""
+        self._open(rate=600)
+        users = User.objects.bulk_create([User(username=f"queue_burst_{i}") for i in range(100)])
+        slots = []
+        for user in users:
+            self.client.force_authenticate(user=user)
+            slots.append(self._join().data["admit_at"])
+        self.assertAlmostEqual((slots[-1] - slots[0]).total_seconds(), 9.9, places=2)
+
+    def test_poll_unauthenticated(self):
+        """True Negative : sondage sans session, une seule requête"""
+        self._open()
+        self._join()
+        self.client.force_authenticate(user=self.other)
+        token = self._join().data["token"]
+        self.client.force_authenticate(user=None)
+        with self.assertNumQueries(1):
+            res = self.client.get(f"/api/queue/{token}/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["position"], 1)
+        self.assertGreaterEqual(res.data["poll_after"], 1)
+        self.assertEqual(self.client.get(f"/api/queue/{uuid.uuid4()}/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_poll_after_room_deleted(self):
+        """True Positive : file supprimée, jeton encore en base → 404 (pas de 500)"""
+        room = self._open()
+        token = self._join().data["token"]
+        room.delete()
+        self.client.force_authenticate(user=None)
+        res = self.client.get(f"/api/queue/{token}/")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_order_requires_token(self):
+        """True Positive : file active, commande sans jeton → 403, rien de vendu"""
+        self._open()
+        self.assertEqual(self._buy().status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self._buy("pas-un-uuid").status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Order.objects.exists())
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.sold_count, 0)
+
+    def test_order_before_admission_throttled(self):
+        """True Positive : jeton pas encore admis → 429 avec Retry-After"""
+        self._open(rate=1)
+        self._join()
+        self.client.force_authenticate(user=self.other)
+        token = self._join().data["token"]
+        res = self._buy(token)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(res["Retry-After"]), 50)
+        self.assertFalse(Order.objects.exists())
+
+    def test_admitted_token_single_use(self):
+        """True Negative : jeton admis → commande créée, puis jeton consommé"""
+        token = self._admitted_token()
+        self.assertEqual(self._buy(token).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._buy(token).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_token_bound_to_user(self):
+        """True Positive : jeton d'un autre acheteur → 403"""
+        token = self._admitted_token()
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self._buy(token).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_failed_order_keeps_token(self):
+        """True Negative : commande refusée (quota) → jeton rendu avec la transaction"""
+        from tickets.models import QueueTicket
+
+        token = self._admitted_token()
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(sold_count=5)
+        self.assertEqual(self._buy(token).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(QueueTicket.objects.get(pk=token).used_at)
+
+    def test_purge_expired_tokens(self):
+        """True Negative : la commande de purge supprime les jetons expirés uniquement"""
+        from io import StringIO
+        from django.core.management import call_command
+        from tickets.models import QueueTicket
+
+        self._open()
+        self._join()
+        self.client.force_authenticate(user=self.other)
+        self._join()
+        QueueTicket.objects.filter(user=self.user).update(expires_at=timezone.now())
+        call_command("purge_queue_tokens", "--chunk-size", "1", stdout=StringIO())
+        self.assertEqual(list(QueueTicket.objects.values_list("user", flat=True)), [self.other.pk])
+
+
+class IdempotencyKeyTest(APITestCase):
+    """
+    Idempotency-Key sur POST /api/orders/ : relance rejouée sans nouvelle
+    commande, clé liée à une requête et à un acheteur, purge par TTL
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("idem_user", password="pass123")
+        self.other = User.objects.create_user("idem_other", password="pass123")
+        venue = Venue.objects.create(name="Stade Omnisports", address="Mfandena, Yaoundé", capacity=100)
+        self.event = Event.objects.create(
+            title="Idem Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=5)
+        self.client.force_authenticate(user=self.user)
+
+    def _buy(self, key=None, n=1):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}] * n},
+                                format="json", **headers)
+
+    def test_retry_replays_original_response(self):
+        """True Negative : même clé → même réponse, une seule commande vendue"""
+        first = self._buy("retry-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        second = self._buy("retry-1")
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data["id"], str(first.data["id"]))
+        self.assertEqual(Order.objects.count(), 1)
+        self.ticket_type.refresh_from_db()
+        self.assertEqual(self.ticket_type.sold_count, 1)
+
+    def test_without_key_not_deduplicated(self):
+        """True Negative : sans en-tête, chaque requête crée sa commande"""
+        self._buy()
+        self._buy()
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """True Positive : même clé, corps différent → 422"""
+        self._buy("reused")
+        res = self._buy("reused", n=2)
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_scoped_to_user(self):
+        """True Negative : la même clé chez deux acheteurs → deux commandes"""
+        self._buy("shared")
+        self.client.force_authenticate(user=self.other)
+        self.assertNotIn("Idempotent-Replayed", self._buy("shared"))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_frees_key(self):
+        """True Positive : commande refusée → clé non enregistrée, la relance s'exécute"""
+        from tickets.models import IdempotencyKey
+
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(sold_count=5)
+        self.assertEqual(self._buy("after-failure").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(sold_count=0)
+        self.assertEqual(self._buy("after-failure").status_code, status.HTTP_201_CREATED)
+
+    def test_key_too_long(self):
+        """True Positive : clé de plus de 255 caractères → 400"""
+        self.assertEqual(self._buy("k" * 256).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_purge_expired_keys(self):
+        """True Negative : la commande de purge supprime les clés échues uniquement"""
+        from io import StringIO
+        from django.core.management import call_command
+        from tickets.models import IdempotencyKey
+
+        self._buy("old")
+        self._buy("recent")
+        IdempotencyKey.objects.filter(key="old").update(created_at=timezone.now() - timezone.timedelta(days=2))
+        call_command("purge_idempotency_keys", "--chunk-size", "1", stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["recent"])
+        self.assertEqual(self._buy("old").status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class AvailabilityTest(APITestCase):
+    """
+    GET /api/events/<id>/availability : vendues / retenues / restantes de
+    toutes les catégories en une requête, en cache sans effet de meute
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user("avail_user", password="pass123")
+        venue = Venue.objects.create(name="Salle des Fêtes d'Akwa", address="Akwa, Douala", capacity=100)
+        self.event = Event.objects.create(
+            title="Avail Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        self.standard = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=8)
+        self.vip = TicketType.objects.create(event=self.event, name="VIP", price=Decimal("5000.00"), quota=4)
+        self.url = f"/api/events/{self.event.id}/availability"
+
+    def _buy(self, ticket_type, n=1):
+        self.client.force_authenticate(user=self.user)
+        self.client.post("/api/orders/", {"tickets": [{"ticket_type": ticket_type.id}] * n}, format="json")
+        self.client.force_authenticate(user=None)
+
+    def test_single_query(self):
+        """True Negative : toutes les catégories en une seule requête, sans authentification"""
+        self._buy(self.standard, 3)
+        self._buy(self.vip, 1)
+        with self.assertNumQueries(1):
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((res.data["sold"], res.data["remaining"]), (4, 6))
+        self.assertEqual([(t["name"], t["sold"], t["remaining"]) for t in res.data["ticket_types"]],
+                         [("Standard", 3, 5), ("VIP", 1, 3)])
+
+    def test_remaining_capped_by_event_quota(self):
+        """True Negative : restant d'une catégorie borné par le quota global"""
+        self._buy(self.standard, 8)
+        vip = self.client.get(self.url).data["ticket_types"][1]
+        self.assertEqual(vip["remaining"], 2)
+
+    def test_sharded_and_held_stock(self):
+        """True Negative : stock libre des buckets disponible, places retenues à part"""
+        from django.test import override_settings
+        from tickets.utils.inventory import shard
+
+        shard(self.standard, 2)
+        self._buy(self.standard, 2)
+        with override_settings(ORDER_HOLD_TTL=900):
+            self._buy(self.vip, 1)
+        data = self.client.get(self.url).data
+        self.assertEqual((data["sold"], data["held"], data["remaining"]), (2, 1, 7))
+        self.assertEqual([(t["sold"], t["held"], t["remaining"]) for t in data["ticket_types"]],
+                         [(2, 0, 6), (0, 1, 3)])
+
+    def test_cached_then_refreshed(self):
+        """True Negative : réponse en cache pendant le TTL, recalculée ensuite"""
+        from django.core.cache import cache
+
+        self.client.get(self.url)
+        self._buy(self.standard, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data["sold"], 0)
+        key = f"tickets:availability:{self.event.id}"
+        cache.set(key, (0, cache.get(key)[1]))  # fraîcheur échue
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).data["sold"], 1)
+        self.assertIsNone(cache.get(f"{key}:lock"))
+
+    def test_stale_value_served_during_refresh(self):
+        """True Negative : recalcul déjà en cours ailleurs → valeur périmée servie, pas de requête"""
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        with override_settings(AVAILABILITY_CACHE_TTL=0):
+            self.client.get(self.url)
+            self._buy(self.standard, 1)
+            cache.add(f"tickets:availability:{self.event.id}:lock", 1)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(self.url).data["sold"], 0)
+
+    def test_unknown_event(self):
+        """True Positive : événement inconnu → 404 ; sans catégorie → quota global seul"""
+        self.assertEqual(self.client.get("/api/events/999999/availability").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get("/api/events/abc/availability/").status_code, status.HTTP_404_NOT_FOUND)
+        TicketType.objects.filter(event=self.event).delete()
+        res = self.client.get(f"/api/events/{self.event.id}/availability/")
+        self.assertEqual((res.data["remaining"], res.data["ticket_types"]), (10, []))
+
+
+class ResponseCacheTest(APITestCase):
+    """
+    Cache des lectures événements / lieux : clé versionnée par modèle,
+    version incrémentée après commit par les signaux, métriques hits / misses
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.settings_override = override_settings(RESPONSE_CACHE_ENABLED=True)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.staff = User.objects.create_user("cache_staff", password="pass123", is_staff=True)
+        self.venue = Venue.objects.create(name="Hôtel de Ville", address="Centre, Yaoundé", capacity=100)
+        self.event = Event.objects.create(
+            title="Cache Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=self.venue,
+            quota_global=10
+        )
+
+    def test_second_read_served_from_cache(self):
+        """True Negative : deuxième lecture sans ORM ni sérialisation, contenu identique"""
+        first = self.client.get(f"/api/events/{self.event.id}/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(1):  # seule l'agrégation de l'ETag (ConditionalGetMixin)
+            second = self.client.get(f"/api/events/{self.event.id}/")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_params_distinguish_entries(self):
+        """True Negative : formats et paramètres différents → entrées distinctes"""
+        self.client.get("/api/venues/")
+        self.assertEqual(self.client.get("/api/venues/?format=json")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/venues/?b=2&a=1")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/venues/?a=1&b=2")["X-Cache"], "HIT")
+
+    def test_write_invalidates_after_commit(self):
+        """True Negative : création via l'API → version incrémentée, nouvelle réponse"""
+        self.client.get("/api/venues/")
+        self.client.force_authenticate(user=self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/venues/", {"name": "Renamed", "address": "Bonapriso, Douala", "capacity": 50},
+                             format="json")
+        self.client.force_authenticate(user=None)
+        res = self.client.get("/api/venues/")
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual([v["name"] for v in res.data], ["Hôtel de Ville", "Renamed"])
+
+    def test_nested_models_invalidate(self):
+        """True Negative : lieu ou catégorie modifiés → réponse événement recalculée, lieux seuls inchangés"""
+        self.client.get(f"/api/events/{self.event.id}/")
+        self.client.get("/api/venues/")
+        with self.captureOnCommitCallbacks(execute=True):
+            TicketType.objects.create(event=self.event, name="VIP", price=Decimal("5000.00"), quota=5)
+        self.assertEqual(self.client.get("/api/venues/")["X-Cache"], "HIT")
+        res = self.client.get(f"/api/events/{self.event.id}/")
+        self.assertEqual([t["name"] for t in res.data["ticket_types"]], ["VIP"])
+        self.venue.name = "Palais des Congrès"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.venue.save()
+        res = self.client.get(f"/api/events/{self.event.id}/")
+        self.assertEqual(res.data["venue"]["name"], "Palais des Congrès")
+
+    def test_rolled_back_write_keeps_version(self):
+        """True Positive : modification annulée → pas de nouvelle version"""
+        from django.db import transaction
+
+        self.client.get("/api/venues/")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Venue.objects.create(name="Annulé", address="Douala", capacity=10)
+                transaction.set_rollback(True)
+        self.assertEqual(self.client.get("/api/venues/")["X-Cache"], "HIT")
+
+    def test_disabled_by_default(self):
+        """True Negative : RESPONSE_CACHE_ENABLED=False → ni en-tête ni cache"""
+        from django.test import override_settings
+
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            self.client.get("/api/venues/")
+            self.assertNotIn("X-Cache", self.client.get("/api/venues/"))
+
+    def test_metrics(self):
+        """True Negative : hits / misses comptés par vue, commande de statistiques"""
+        from io import StringIO
+        from django.core.management import call_command
+        from tickets.utils.response_cache import metrics
+
+        self.client.get("/api/events/")
+        self.client.get("/api/events/")
+        self.client.get("/api/events/")
+        self.assertEqual(self.client.get("/api/events/999999/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(metrics(["events"])["events"], {"hits": 2, "misses": 2, "hit_ratio": 0.5})
+        out = StringIO()
+        call_command("response_cache_stats", "--reset", stdout=out)
+        self.assertIn("50.0%", out.getvalue())
+        self.assertEqual(metrics(["events"])["events"]["hits"], 0)
+
+
+class ConditionalGetTest(APITestCase):
+    """
+    ETag / Last-Modified sur les lectures : empreinte max(updated_at) / nombre
+    de lignes, 304 sans sérialisation, ETag changé par toute modification
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("etag_user", password="pass123")
+        self.venue = Venue.objects.create(name="Centre Culturel", address="Bonanjo, Douala", capacity=100)
+        self.event = Event.objects.create(
+            title="ETag Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=self.venue,
+            quota_global=10
+        )
+        self.ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=5)
+
+    def _revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified_without_serializing(self):
+        """True Negative : même ETag → 304 après une seule requête d'agrégation"""
+        first = self.client.get("/api/events/")
+        self.assertTrue(first["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", first)
+        with self.assertNumQueries(1):
+            res = self._revalidate("/api/events/", first["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["ETag"], first["ETag"])
+
+    def test_retrieve_etag(self):
+        """True Negative : détail → 304 ; introuvable → 404 sans ETag"""
+        url = f"/api/events/{self.event.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self._revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        missing = self.client.get("/api/events/999999/")
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", missing)
+        self.assertEqual(self.client.get("/api/events/abc/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_changes_invalidate_etag(self):
+        """True Positive : modification, ajout ou suppression (y compris imbriqués) → 200 et nouvel ETag"""
+        etag = self.client.get("/api/events/")["ETag"]
+        TicketType.objects.filter(pk=self.ticket_type.pk).update(updated_at=timezone.now() + timezone.timedelta(seconds=1))
+        res = self._revalidate("/api/events/", etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res["ETag"]
+        self.ticket_type.delete()
+        res = self._revalidate("/api/events/", etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["ticket_types"], [])
+        etag = res["ETag"]
+        self.venue.name = "Nouveau nom"
+        self.venue.save()
+        self.assertEqual(self._revalidate("/api/events/", etag).status_code, status.HTTP_200_OK)
+
+    def test_query_string_in_etag(self):
+        """True Negative : paramètres différents → ETag différent"""
+        self.assertNotEqual(self.client.get("/api/venues/")["ETag"],
+                            self.client.get("/api/venues/?format=json")["ETag"])
+
+    def test_if_modified_since(self):
+        """True Negative : If-Modified-Since ≥ Last-Modified → 304"""
+        last_modified = self.client.get("/api/ticket-types/")["Last-Modified"]
+        res = self.client.get("/api/ticket-types/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_ticket_status_change(self):
+        """True Positive : billet scanné (UPDATE en masse avec updated_at) → nouvel ETag"""
+        self.client.force_authenticate(user=self.user)
+        order_id = self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}]},
+                                    format="json").data["id"]
+        ticket = Ticket.objects.get(order_id=order_id)
+        etag = self.client.get(f"/api/tickets/{ticket.id}/")["ETag"]
+        Ticket.objects.filter(pk=ticket.pk).update(status="USED",
+                                                   updated_at=timezone.now() + timezone.timedelta(seconds=1))
+        res = self._revalidate(f"/api/tickets/{ticket.id}/", etag)
+        self.assertEqual((res.status_code, res.data["status"]), (status.HTTP_200_OK, "USED"))
+
+
+class KeysetPaginationTest(APITestCase):
+    """
+    Pagination par clé (created_at, id) des commandes, billets et scans :
+    parcours complet sans doublon, coût constant par page, curseur opaque
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("page_user", password="pass123")
+        self.staff = User.objects.create_user("page_staff", password="pass123", is_staff=True)
+        venue = Venue.objects.create(name="Esplanade de Bonanjo", address="Bonanjo, Douala", capacity=100)
+        self.event = Event.objects.create(
+            title="Page Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=50
+        )
+        self.ticket_type = TicketType.objects.create(event=self.event, name="Standard", price=Decimal("1000.00"), quota=50)
+        self.client.force_authenticate(user=self.user)
+        self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}] * 25}, format="json")
+
+    def _walk(self, url):
+        ids, pages = [], 0
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [row["id"] for row in res.data["results"]]
+            url, pages = res.data["next"], pages + 1
+        return ids, pages
+
+    def test_walk_all_pages(self):
+        """True Negative : 25 billets par pages de 10 → 3 pages, ordre décroissant, aucun doublon"""
+        ids, pages = self._walk("/api/tickets/?page_size=10")
+        self.assertEqual(pages, 3)
+        expected = [str(pk) for pk in Ticket.objects.order_by("-created_at", "-id").values_list("pk", flat=True)]
+        self.assertEqual([str(pk) for pk in ids], expected)
+
+    def test_same_timestamp_ties(self):
+        """True Negative : horodatages identiques → départage par id, parcours complet"""
+        Ticket.objects.update(created_at=timezone.now())
+        ids, _ = self._walk("/api/tickets/?page_size=4")
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_constant_queries_per_page(self):
+        """True Negative : une page profonde coûte autant de requêtes que la première"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        first = self.client.get("/api/tickets/?page_size=5")
+        with CaptureQueriesContext(connection) as shallow:
+            self.client.get("/api/tickets/?page_size=5")
+        url = first.data["next"]
+        for _ in range(3):
+            url = self.client.get(url).data["next"]
+        with CaptureQueriesContext(connection) as deep:
+            res = self.client.get(url)
+        self.assertEqual(len(deep), len(shallow))
+        self.assertNotIn("OFFSET", deep.captured_queries[-1]["sql"].upper())
+        self.assertIsNone(res.data["next"])
+
+    def test_deep_page_etag_without_aggregate(self):
+        """True Negative : page profonde → une seule requête (la page), ETag de la page, 304 à l'identique"""
+        url = self.client.get("/api/tickets/?page_size=5").data["next"]
+        url = self.client.get(url).data["next"]
+        with self.assertNumQueries(1):
+            res = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+        Ticket.objects.filter(pk=res.data["results"][0]["id"]).update(
+            updated_at=timezone.now() + timezone.timedelta(seconds=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, status.HTTP_200_OK)
+
+    def test_insert_during_walk(self):
+        """True Negative : commande créée pendant le parcours → pas de doublon dans les pages suivantes"""
+        for _ in range(3):
+            self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}]}, format="json")
+        first = self.client.get("/api/orders/?page_size=2")
+        self.client.post("/api/orders/", {"tickets": [{"ticket_type": self.ticket_type.id}]}, format="json")
+        rest, _ = self._walk(first.data["next"])
+        ids = [row["id"] for row in first.data["results"]] + rest
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_invalid_cursor_and_page_size(self):
+        """True Positive : curseur invalide → 404 ; page_size borné"""
+        self.assertEqual(self.client.get("/api/tickets/?cursor=pas-un-curseur").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(self.client.get("/api/tickets/?page_size=0").data["results"]), 1)
+        self.assertEqual(len(self.client.get("/api/tickets/?page_size=abc").data["results"]), 25)
+
+    def test_scan_log_endpoint(self):
+        """True Negative : historique des scans paginé et filtré, réservé au staff"""
+        ticket = Ticket.objects.first()
+        ScanLog.objects.bulk_create(
+            [ScanLog(ticket=ticket, result="DUPLICATE") for _ in range(4)] + [ScanLog(result="INVALID")]
+        )
+        self.assertEqual(self.client.get("/api/scan-logs/").status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.staff)
+        ids, pages = self._walk("/api/scan-logs/?page_size=2")
+        self.assertEqual((len(ids), pages), (5, 3))
+        res = self.client.get(f"/api/scan-logs/?event={self.event.id}&result=duplicate")
+        self.assertEqual(len(res.data["results"]), 4)
+        self.assertEqual(self.client.get("/api/scan-logs/?event=x").status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsTest(APITestCase):
+    """
+    ?fields= / ?expand= : réponse réduite aux champs et relations demandés,
+    queryset ajusté (relations chargées à la demande, colonnes différées)
+    """
+
+    def setUp(self):
+        self.venue = Venue.objects.create(name="Stade de la Réunification", address="Bépanda, Douala", capacity=100)
+        for day in (1, 2):
+            event = Event.objects.create(
+                title=f"Sparse Event {day}",
+                description="Longue description " * 50,
+                start_time=timezone.now() + timezone.timedelta(days=day),
+                end_time=timezone.now() + timezone.timedelta(days=day, hours=2),
+                venue=self.venue,
+                quota_global=10
+            )
+            TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=5)
+            TicketType.objects.create(event=event, name="VIP", price=Decimal("5000.00"), quota=5)
+        self.event = event
+
+    def _sql(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, [q["sql"] for q in ctx.captured_queries]
+
+    def test_default_unchanged(self):
+        """True Negative : sans paramètre, lieu et catégories embarqués comme avant"""
+        res = self.client.get("/api/events/")
+        self.assertEqual(res.data[0]["venue"]["name"], self.venue.name)
+        self.assertEqual(res.data[0]["ticket_types"][0]["event"]["title"], "Sparse Event 1")
+
+    def test_fields_trim_payload_and_columns(self):
+        """True Negative : ?fields= → seuls ces champs, colonnes non demandées différées, pas de jointure"""
+        res, sql = self._sql("/api/events/?fields=id,title")
+        self.assertEqual([set(row) for row in res.data], [{"id", "title"}] * 2)
+        listing = sql[1]  # après l'agrégation de l'ETag
+        self.assertNotIn("description", listing)
+        self.assertNotIn("tickets_venue", listing)
+        self.assertEqual(len(sql), 2)  # ni lieu ni catégories chargés
+
+    def test_expand_none_renders_ids(self):
+        """True Negative : ?expand= vide → ids du lieu et des catégories, sans jointure ni catégories complètes"""
+        res, sql = self._sql(f"/api/events/{self.event.id}/?expand=")
+        self.assertEqual(res.data["venue"], self.venue.id)
+        self.assertEqual(sorted(res.data["ticket_types"]),
+                         sorted(self.event.ticket_types.values_list("pk", flat=True)))
+        sql = sql[1:]  # hors agrégation de l'ETag (ConditionalGetMixin)
+        self.assertFalse(any("tickets_venue" in q for q in sql))
+        self.assertFalse(any('"tickets_tickettype"."name"' in q for q in sql))
+
+    def test_expand_selected_relation(self):
+        """True Negative : ?expand=venue → lieu embarqué, catégories en ids"""
+        res = self.client.get("/api/events/?expand=venue&fields=id,venue,ticket_types")
+        self.assertEqual(res.data[0]["venue"]["name"], self.venue.name)
+        self.assertTrue(all(isinstance(pk, int) for pk in res.data[0]["ticket_types"]))
+
+    def test_list_queries_bounded(self):
+        """True Negative : nombre de requêtes indépendant du nombre d'événements"""
+        _, before = self._sql("/api/events/?fields=id,ticket_types&expand=")
+        Event.objects.create(title="Extra", start_time=timezone.now(), end_time=timezone.now() + timezone.timedelta(hours=1),
+                             venue=self.venue, quota_global=5)
+        _, after = self._sql("/api/events/?fields=id,ticket_types&expand=")
+        self.assertEqual(len(after), len(before))
+
+    def test_sparse_and_expanded_query_counts(self):
+        """True Negative : ?fields= avec catégories embarquées → 3 requêtes pour 10 événements, comme sans paramètre"""
+        for day in range(8):
+            event = Event.objects.create(title=f"Extra {day}", start_time=timezone.now(),
+                                         end_time=timezone.now() + timezone.timedelta(hours=1),
+                                         venue=self.venue, quota_global=5)
+            TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=5)
+        # Agrégation de l'ETag, événements, catégories préchargées
+        with self.assertNumQueries(3):
+            res = self.client.get("/api/events/?fields=id,ticket_types")
+        self.assertEqual(len(res.data), 10)
+        self.assertIn("Sparse Event 1", {row["ticket_types"][0]["event"]["title"] for row in res.data})
+        with self.assertNumQueries(3):
+            res = self.client.get("/api/events/?fields=id,venue,ticket_types&expand=venue,ticket_types")
+        self.assertEqual(res.data[0]["venue"]["name"], self.venue.name)
+        with self.assertNumQueries(3):
+            self.client.get("/api/events/")
+
+    def test_ticket_type_event_collapsed(self):
+        """True Negative : catégories avec ?expand= → événement réduit à son id"""
+        res = self.client.get("/api/ticket-types/?expand=&fields=id,name,event")
+        self.assertEqual(set(res.data[0]), {"id", "name", "event"})
+        self.assertIsInstance(res.data[0]["event"], int)
+
+    def test_write_ignores_fields(self):
+        """True Positive : POST avec ?fields= → validation et création inchangées"""
+        staff = User.objects.create_user("sparse_staff", password="pass123", is_staff=True)
+        self.client.force_authenticate(user=staff)
+        res = self.client.post("/api/venues/?fields=id", {"name": "Nouvelle salle", "address": "Douala", "capacity": 20},
+                               format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["name"], "Nouvelle salle")
@@ -8,30 +8,61 @@ Ces tests simulent des conditions réelles avec plusieurs utilisateurs
 qui tentent d'acheter des billets simultanément sur des quotas limités.
 """
 
+import contextlib
 from decimal import Decimal
 from django.utils import timezone
+from django.test import TransactionTestCase, skipUnlessDBFeature
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+import random
 import threading
 from threading import Thread
-from tickets.models import Venue, Event, TicketType, Order, Ticket
+from tickets.models import Venue, Event, TicketType, Order, Ticket, ScanLog
 import time
+import uuid
 
 User = get_user_model()
 
 
-class ConcurrentOrderStressTest(APITestCase):
+
+def _retry_locked(call):
+    """Exécute `call`, relancé tant que SQLite (mémoire partagée) rend un verrou sans attendre.
+
+    Délai aléatoire croissant entre les essais : évite la ruée synchronisée.
+    PostgreSQL attend le verrou de ligne, `call` n'y est exécuté qu'une fois.
+    """
+    from django.db import OperationalError
+
+    for attempt in range(500):
+        try:
+            return call()
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            time.sleep(random.uniform(0, min(0.2, 0.002 * 2 ** attempt)))
+    raise AssertionError("verrou SQLite jamais obtenu")
+
+
+class ConcurrentOrderStressTest(TransactionTestCase):
     """
     Tests de concurrence pour la création simultanée de commandes
     avec quotas limités - pour identifier les race conditions
+    (TransactionTestCase : les threads doivent voir les données committées)
     """
 
+    buyers = 200
+    quota = 100
+    # SQLite en mémoire partagée : verrous de table rendus sans attente, 200 écrivains
+    # simultanés s'affament. Les 200 acheteurs y passent par 8 requêtes en vol au plus,
+    # comme derrière un pool de workers ; aucune limite avec des verrous de ligne.
+    sqlite_workers = 8
+
     def setUp(self):
         self.user = User.objects.create_user("stress_user", password="pass123")
         self.venue = Venue.objects.create(
             name="Arena Test",
             address="Test Stress Address",
-            capacity=100
+            capacity=1000
         )
         self.event = Event.objects.create(
             title="Stress Test Event",
@@ -41,82 +72,81 @@ class ConcurrentOrderStressTest(APITestCase):
             quota_global=50
         )
 
+    def _purchase_concurrently(self, users, tickets):
+        """Une commande `tickets` par entrée de `users`, toutes lancées ensemble.
+
+        Retourne `([(statut HTTP, corps), …], durée)`. Chaque achat porte sa
+        propre Idempotency-Key : relancé après un verrou, il rejoue la réponse
+        d'origine si la commande a été validée — le statut compté est toujours
+        celui de la vraie réponse.
+        """
+        from django.db import connection
+        from rest_framework.test import APIClient
+
+        barrier = threading.Barrier(len(users))
+        results, exceptions = [], []
+        workers = (contextlib.nullcontext() if connection.features.has_select_for_update
+                   else threading.BoundedSemaphore(self.sqlite_workers))
+
+        def buyer(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            key = uuid.uuid4().hex
+
+            def purchase():
+                res = client.post("/api/orders/", {"tickets": tickets}, format="json", HTTP_IDEMPOTENCY_KEY=key)
+                return res.status_code, res.data
+
+            try:
+                barrier.wait(timeout=30)
+                with workers:
+                    results.append(_retry_locked(purchase))
+            except Exception as e:
+                exceptions.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [Thread(target=buyer, args=(user,), name=f"Buyer-{i}") for i, user in enumerate(users)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=120)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(exceptions, [], "Aucune exception ne devrait être levée")
+        self.assertEqual(len(results), len(users), "Chaque acheteur doit obtenir une réponse")
+        return results, elapsed
+
     def test_concurrent_ticket_creation_race_condition(self):
         """
         Test de concurrence : plusieurs threads tentent d'acheter les dernières places
         Objectif : détecter les race conditions dans la gestion des quotas
         """
-        # Créer un ticket type avec quota très limité
+        # Créer un ticket type avec quota très limité : 6 acheteurs pour 3 places
         limited_type = TicketType.objects.create(
             event=self.event,
             name="Ultra Limited",
             price=Decimal("500.00"),
-            quota=3  # Seulement 3 places disponibles
+            quota=3
         )
-        
-        results = []
-        exceptions = []
-        
-        def create_order_attempt():
-            """Tentative de création d'une commande dans un thread séparé"""
-            try:
-                # Créer un client pour ce thread
-                from rest_framework.test import APIClient
-                client = APIClient()
-                client.force_authenticate(user=self.user)
-                
-                res = client.post(
-                    "/api/orders/",
-                    {"tickets": [{"ticket_type": limited_type.id}]},
-                    format="json"
-                )
-                results.append(res.status_code)
-                
-            except Exception as e:
-                exceptions.append(str(e))
-        
-        # Lancer 6 threads simultanément pour 3 places seulement
-        threads = []
-        for _ in range(6):
-            thread = Thread(target=create_order_attempt)
-            threads.append(thread)
-        
-        # Démarrer tous les threads en même temps
-        start_time = time.time()
-        for thread in threads:
-            thread.start()
-        
-        # Attendre que tous se terminent
-        for thread in threads:
-            thread.join(timeout=10)  # Timeout de sécurité
-        
-        end_time = time.time()
-        
-        # Analyser les résultats
-        success_count = sum(1 for result in results if result == 201)
-        error_count = sum(1 for result in results if result == 400)
-        
-        # Assertions
-        self.assertEqual(success_count, 3, f"Exactement 3 commandes doivent réussir, {success_count} ont réussi")
-        self.assertEqual(error_count, 3, f"Exactement 3 commandes doivent échouer, {error_count} ont échoué")
-        self.assertEqual(len(exceptions), 0, f"Aucune exception ne devrait être levée: {exceptions}")
-        
-        # Vérifier l'état final des quotas
+
+        results, _ = self._purchase_concurrently([self.user] * 6, [{"ticket_type": limited_type.id}])
+        statuses = [code for code, _ in results]
+
+        self.assertEqual(statuses.count(201), 3, f"Exactement 3 commandes doivent réussir : {statuses}")
+        self.assertEqual(statuses.count(400), 3, f"Exactement 3 commandes doivent échouer : {statuses}")
+
+        # Vérifier l'état final des quotas et les billets créés
         limited_type.refresh_from_db()
         self.assertEqual(limited_type.quota_remaining(), 0, "Quota doit être épuisé")
-        
-        # Vérifier que les billets ont bien été créés
-        total_tickets = Ticket.objects.filter(ticket_type=limited_type).count()
-        self.assertEqual(total_tickets, 3, f"3 billets doivent exister, {total_tickets} trouvés")
-        
-        print(f"Test de concurrence terminé en {end_time - start_time:.2f}s")
+        self.assertEqual(Ticket.objects.filter(ticket_type=limited_type).count(), 3)
 
     def test_quota_exhaustion_under_load(self):
         """
         Test de charge : épuisement progressif des quotas sous forte charge
         Simule une vente de billets en conditions réelles
         """
-        # Événement avec quota modéré
         load_event = Event.objects.create(
             title="Load Test Concert",
             start_time=timezone.now() + timezone.timedelta(days=7),
@@ -124,194 +154,111 @@ class ConcurrentOrderStressTest(APITestCase):
             venue=self.venue,
             quota_global=20
         )
-        
-        # Plusieurs catégories de billets
-        standard = TicketType.objects.create(
-            event=load_event,
-            name="Standard",
-            price=Decimal("1000.00"),
-            quota=15
-        )
-        
-        vip = TicketType.objects.create(
-            event=load_event,
-            name="VIP",
-            price=Decimal("5000.00"),
-            quota=5
-        )
-        
-        results = []
-        
-        def bulk_purchase():
-            """Achat en lot dans un thread"""
-            try:
-                from rest_framework.test import APIClient
-                client = APIClient()
-                client.force_authenticate(user=self.user)
-                
-                # Tentative d'achat mixte (2 standard + 1 VIP)
-                res = client.post(
-                    "/api/orders/",
-                    {
-                        "tickets": [
-                            {"ticket_type": standard.id},
-                            {"ticket_type": standard.id},
-                            {"ticket_type": vip.id}
-                        ]
-                    },
-                    format="json"
-                )
-                results.append({
-                    'status': res.status_code,
-                    'thread_id': threading.current_thread().ident
-                })
-                
-            except Exception as e:
-                results.append({
-                    'error': str(e),
-                    'thread_id': threading.current_thread().ident
-                })
-        
-        # Lancer 10 threads pour épuiser les quotas
-        threads = []
-        for i in range(10):
-            thread = Thread(target=bulk_purchase, name=f"Buyer-{i}")
-            threads.append(thread)
-        
-        # Exécution simultanée
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
-        
-        # Analyse des résultats
-        successful_orders = [r for r in results if r.get('status') == 201]
-        failed_orders = [r for r in results if r.get('status') == 400]
-        errors = [r for r in results if 'error' in r]
-        
-        # Les quotas étant 15 standard + 5 VIP = 20 total, mais quota_global = 20
-        # Chaque commande réussie consomme 3 billets (2 standard + 1 VIP)
-        # Donc maximum 6 commandes peuvent réussir (6 * 3 = 18 ≤ 20)
-        # Mais le VIP (quota=5) va être le facteur limitant : max 5 commandes
-        
-        expected_success = min(5, 20 // 3)  # Limité par VIP ou quota global
-        
-        self.assertEqual(len(successful_orders), expected_success, 
-                        f"Attendu {expected_success} commandes réussies, obtenu {len(successful_orders)}")
-        self.assertEqual(len(errors), 0, f"Aucune exception attendue: {errors}")
-        
-        # Vérifier l'état final
-        standard.refresh_from_db()
+        standard = TicketType.objects.create(event=load_event, name="Standard", price=Decimal("1000.00"), quota=15)
+        vip = TicketType.objects.create(event=load_event, name="VIP", price=Decimal("5000.00"), quota=5)
+
+        # 10 acheteurs, commande mixte (2 standard + 1 VIP)
+        basket = [{"ticket_type": standard.id}, {"ticket_type": standard.id}, {"ticket_type": vip.id}]
+        results, _ = self._purchase_concurrently([self.user] * 10, basket)
+        statuses = [code for code, _ in results]
+
+        # Chaque commande réussie consomme 3 billets : le quota global (20) en permet 6,
+        # le VIP (quota=5) est le facteur limitant → 5 commandes
+        expected_success = min(5, 20 // 3)
+        self.assertEqual(statuses.count(201), expected_success, statuses)
+        self.assertEqual(statuses.count(400), 10 - expected_success, statuses)
+
+        # Le VIP est épuisé, aucun billet en trop
         vip.refresh_from_db()
-        load_event.refresh_from_db()
-        
-        # Le VIP doit être épuisé en premier
         self.assertEqual(vip.quota_remaining(), 0, "VIP doit être épuisé")
-        
-        print(f"Résultats du test de charge:")
-        print(f"- Commandes réussies: {len(successful_orders)}")
-        print(f"- Commandes échouées: {len(failed_orders)}")
-        print(f"- Quota Standard restant: {standard.quota_remaining()}")
-        print(f"- Quota VIP restant: {vip.quota_remaining()}")
-        print(f"- Quota global restant: {load_event.quota_remaining()}")
+        self.assertEqual(Ticket.objects.filter(ticket_type=standard).count(), 2 * expected_success)
+        self.assertEqual(Ticket.objects.filter(ticket_type=vip).count(), expected_success)
 
     def test_database_integrity_under_stress(self):
         """
         Test d'intégrité : vérifier que les contraintes DB tiennent sous stress
         Focus sur les contraintes unique et les clés étrangères
         """
-        # Créer plusieurs utilisateurs pour éviter les conflits d'auth
-        users = []
-        for i in range(5):
-            user = User.objects.create_user(f"stress_user_{i}", password="pass123")
-            users.append(user)
-        
-        # TicketType avec quota suffisant pour ce test
+        users = [User.objects.create_user(f"stress_user_{i}", password="pass123") for i in range(5)]
         integrity_ticket = TicketType.objects.create(
             event=self.event,
             name="Integrity Test",
             price=Decimal("1500.00"),
             quota=50
         )
-        
-        results = []
-        ticket_ids = []
-        
-        def create_order_with_user(user_index):
-            """Création de commande avec un utilisateur spécifique"""
-            try:
-                from rest_framework.test import APIClient
-                client = APIClient()
-                client.force_authenticate(user=users[user_index])
-                
-                res = client.post(
-                    "/api/orders/",
-                    {"tickets": [{"ticket_type": integrity_ticket.id}]},
-                    format="json"
-                )
-                
-                if res.status_code == 201:
-                    # Récupérer les IDs des tickets créés
-                    order_id = res.data['id']
-                    order = Order.objects.get(id=order_id)
-                    for ticket in order.tickets.all():
-                        ticket_ids.append(ticket.id)
-                
-                results.append({
-                    'status': res.status_code,
-                    'user': user_index,
-                    'order_id': res.data.get('id') if res.status_code == 201 else None
-                })
-                
-            except Exception as e:
-                results.append({
-                    'error': str(e),
-                    'user': user_index
-                })
-        
-        # Lancer un thread par utilisateur, plusieurs fois
-        threads = []
-        for round_num in range(3):  # 3 rounds d'achats
-            for user_idx in range(len(users)):
-                thread = Thread(
-                    target=create_order_with_user, 
-                    args=(user_idx,),
-                    name=f"Round{round_num}-User{user_idx}"
-                )
-                threads.append(thread)
-        
-        # Exécution
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
-        
-        # Vérifications d'intégrité
-        successful = [r for r in results if r.get('status') == 201]
-        errors = [r for r in results if 'error' in r]
-        
-        self.assertEqual(len(errors), 0, f"Aucune erreur d'intégrité: {errors}")
-        
-        # Vérifier l'unicité des tickets créés
-        unique_ticket_ids = set(ticket_ids)
-        self.assertEqual(len(ticket_ids), len(unique_ticket_ids), 
-                        "Tous les tickets doivent avoir des IDs uniques")
-        
-        # Vérifier que tous les tickets existent bien en base
-        existing_tickets = Ticket.objects.filter(id__in=ticket_ids).count()
-        self.assertEqual(existing_tickets, len(ticket_ids), 
-                        "Tous les tickets créés doivent exister en base")
-        
-        # Vérifier l'unicité des QR codes
-        qr_hashes = list(Ticket.objects.filter(id__in=ticket_ids).values_list('qr_hash', flat=True))
-        unique_qr_hashes = set(qr_hashes)
-        self.assertEqual(len(qr_hashes), len(unique_qr_hashes), 
-                        "Tous les QR codes doivent être uniques")
-        
-        print(f"Test d'intégrité terminé:")
-        print(f"- {len(successful)} commandes créées avec succès")
-        print(f"- {len(ticket_ids)} billets générés")
-        print(f"- Intégrité des QR codes: OK")
+
+        # 3 rounds d'achats par utilisateur, tous simultanés
+        results, _ = self._purchase_concurrently(users * 3, [{"ticket_type": integrity_ticket.id}])
+        self.assertEqual([code for code, _ in results], [201] * 15)
+
+        # Un billet par commande, rattaché à la bonne commande, identifiants et QR uniques
+        order_ids = {data["id"] for _, data in results}
+        self.assertEqual(len(order_ids), 15, "Chaque achat doit créer sa propre commande")
+        tickets = list(Ticket.objects.filter(order_id__in=order_ids).values_list("id", "qr_hash"))
+        self.assertEqual(len(tickets), 15)
+        self.assertEqual(len({pk for pk, _ in tickets}), 15, "Tous les tickets doivent avoir des IDs uniques")
+        self.assertEqual(len({qr for _, qr in tickets}), 15, "Tous les QR codes doivent être uniques")
+
+    def _flash_sale(self):
+        """
+        Vente flash : 200 acheteurs pour 100 places, sur un compteur unique
+        puis sur 8 buckets (utils/inventory.py) — ni survente ni vente perdue.
+        Retourne la durée de chaque course : {"single": s, "sharded": s}.
+        """
+        from tickets.models import InventoryBucket
+        from tickets.utils.inventory import shard
+
+        flash_event = Event.objects.create(
+            title="Flash Sale Stress",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=self.venue,
+            quota_global=self.quota * 2
+        )
+        single = TicketType.objects.create(event=flash_event, name="Fosse", price=Decimal("1000.00"), quota=self.quota)
+        sharded = TicketType.objects.create(event=flash_event, name="Pelouse", price=Decimal("1000.00"), quota=self.quota)
+        shard(sharded, 8)
+        # Un compte par acheteur (sans mot de passe : pas de hachage coûteux)
+        users = User.objects.bulk_create([User(username=f"flash_buyer_{i}") for i in range(self.buyers)])
+
+        elapsed = {}
+        for race, ticket_type in (("single", single), ("sharded", sharded)):
+            results, elapsed[race] = self._purchase_concurrently(users, [{"ticket_type": ticket_type.id}])
+            statuses = [code for code, _ in results]
+            self.assertEqual(statuses.count(201), self.quota, statuses)
+            self.assertEqual(statuses.count(400), self.buyers - self.quota, statuses)
+            self.assertEqual(Ticket.objects.filter(ticket_type=ticket_type).count(), self.quota)
+
+        single.refresh_from_db()
+        self.assertEqual(single.sold_count, self.quota)
+        # Buckets : aucun dépassé (pas de survente), aucun resté avec du stock
+        # pendant qu'un acheteur était refusé (pas de vente perdue)
+        buckets = list(InventoryBucket.objects.filter(ticket_type=sharded))
+        self.assertEqual(len(buckets), 8)
+        self.assertTrue(all(b.sold_count == b.capacity for b in buckets),
+                        [(b.sold_count, b.capacity) for b in buckets])
+        self.assertEqual(sum(b.sold_count for b in buckets), self.quota)
+        flash_event.refresh_from_db()
+        self.assertEqual(flash_event.quota_remaining(), 0)
+        return elapsed
+
+    def test_200_buyers_no_oversell(self):
+        """True Negative : compteur unique et 8 buckets → exactement `quota` ventes, aucune perdue"""
+        self._flash_sale()
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_200_buyers_sharded_throughput(self):
+        """
+        True Negative : verrous de ligne (PostgreSQL), seuls les acheteurs d'un
+        même bucket s'attendent → les buckets vendent plus vite que le compteur
+        unique. Sans verrous de ligne (SQLite sérialise toutes les écritures),
+        aucun gain n'est possible : test ignoré.
+        """
+        elapsed = self._flash_sale()
+        self.assertLess(
+            elapsed["sharded"], elapsed["single"],
+            f"8 buckets : {elapsed['sharded']:.2f}s, compteur unique : {elapsed['single']:.2f}s",
+        )
 
 
 class PerformanceStressTest(APITestCase):
@@ -385,4 +332,63 @@ class PerformanceStressTest(APITestCase):
         
         print(f"Performance test - Événement avec 20 catégories:")
         print(f"- Temps de création: {creation_time:.3f}s")
-        print(f"- Temps de requête: {query_time:.3f}s")
\ No newline at end of file
+        print(f"- Temps de requête: {query_time:.3f}s")
+
+class ConcurrentScanStressTest(TransactionTestCase):
+    """
+    Plusieurs portiques scannent le même QR au même instant :
+    le compare-and-set ne doit laisser passer qu'un seul VALID.
+    (TransactionTestCase : les threads doivent voir les données committées)
+    """
+
+    def setUp(self):
+        user = User.objects.create_user("scan_stress_user", password="pass123")
+        venue = Venue.objects.create(name="Porte Nord", address="Stade, Yaoundé", capacity=100)
+        event = Event.objects.create(
+            title="Scan Stress Event",
+            start_time=timezone.now() + timezone.timedelta(days=1),
+            end_time=timezone.now() + timezone.timedelta(days=1, hours=2),
+            venue=venue,
+            quota_global=10
+        )
+        ticket_type = TicketType.objects.create(event=event, name="Standard", price=Decimal("1000.00"), quota=10)
+        self.ticket = Ticket.objects.create(order=Order.objects.create(user=user), ticket_type=ticket_type)
+
+    def test_same_ticket_scanned_by_many_gates(self):
+        """True Negative : N scans simultanés → exactement 1 VALID, N-1 DUPLICATE"""
+        from django.db import OperationalError, connection
+        from tickets.utils.scan import scan_ticket
+
+        gates = 8
+        barrier = threading.Barrier(gates)
+        results, exceptions = [], []
+
+        def gate():
+            try:
+                barrier.wait(timeout=5)
+                for _ in range(200):
+                    try:
+                        results.append(scan_ticket(self.ticket.qr_hash)[0])
+                        break
+                    except OperationalError as e:
+                        # SQLite en mémoire partagée : verrou de table rendu sans attente,
+                        # le portique réessaie (PostgreSQL attend le verrou de ligne)
+                        if "locked" not in str(e):
+                            raise
+                        time.sleep(0.005)
+            except Exception as e:
+                exceptions.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [Thread(target=gate, name=f"Gate-{i}") for i in range(gates)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        self.assertEqual(exceptions, [])
+        self.assertEqual(results.count("VALID"), 1, results)
+        self.assertEqual(results.count("DUPLICATE"), gates - 1, results)
+        self.assertEqual(ScanLog.objects.filter(ticket=self.ticket, result="VALID").count(), 1)
+        self.assertEqual(ScanLog.objects.filter(ticket=self.ticket).count(), gates)
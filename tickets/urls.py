@@ -1,7 +1,8 @@
 # tickets/urls.py
 from django.urls import path, include
 from rest_framework_nested import routers
-from .views import VenueViewSet, EventViewSet, TicketTypeViewSet, OrderViewSet, TicketViewSet, TicketScanView
+from .views import (VenueViewSet, EventViewSet, TicketTypeViewSet, OrderViewSet, TicketViewSet, TicketScanView,
+                    TicketScanBatchView, QueueStatusView, ScanLogViewSet)
 
 router = routers.DefaultRouter()
 router.register("venues", VenueViewSet)
@@ -9,14 +10,32 @@ router.register("events", EventViewSet)
 router.register("ticket-types", TicketTypeViewSet, basename="tickettype")  # ✅ racine
 router.register("orders", OrderViewSet, basename="order")
 router.register("tickets", TicketViewSet, basename="ticket")  # ✅ basename ajouté
+router.register("scan-logs", ScanLogViewSet, basename="scanlog")
 
 event_router = routers.NestedDefaultRouter(router, "events", lookup="event")
 event_router.register("ticket-types", TicketTypeViewSet, basename="event-ticket-types")  # ✅ nested
 
 urlpatterns = [
+    # Avant le routeur : sinon "scan" est pris pour le pk de tickets/<pk>/
+    path("tickets/scan/", TicketScanView.as_view(), name="ticket-scan"),
+    path("tickets/scan/batch/", TicketScanBatchView.as_view(), name="ticket-scan-batch"),
+    path("queue/<uuid:token>/", QueueStatusView.as_view(), name="queue-status"),
     path("", include(router.urls)),
     path("", include(event_router.urls)),
     # Route explicite vers le téléchargement PDF si besoin hors DRF router
     path("tickets/<uuid:pk>/pdf/", TicketViewSet.as_view({"get": "pdf"}), name="ticket-pdf"),
-    path("tickets/scan/", TicketScanView.as_view(), name="ticket-scan"),
+    # Exports groupés sans slash final (extension de fichier dans l'URL)
+    path("orders/<uuid:pk>/tickets.pdf", OrderViewSet.as_view({"get": "tickets_pdf"}), name="order-tickets-pdf"),
+    path("orders/<uuid:pk>/tickets.zip", OrderViewSet.as_view({"get": "tickets_zip"}), name="order-tickets-zip"),
+    # (les kwargs de @action portent la restriction staff, à reprendre hors routeur)
+    path("events/<int:pk>/tickets.pdf", EventViewSet.as_view({"get": "tickets_pdf"}, **EventViewSet.tickets_pdf.kwargs),
+         name="event-tickets-pdf"),
+    path("events/<int:pk>/tickets.zip", EventViewSet.as_view({"get": "tickets_zip"}, **EventViewSet.tickets_zip.kwargs),
+         name="event-tickets-zip"),
+    path("events/<int:pk>/availability", EventViewSet.as_view({"get": "availability"}), name="event-availability"),
+    path("events/<int:pk>/scan-manifest", EventViewSet.as_view({"get": "scan_manifest"}, **EventViewSet.scan_manifest.kwargs),
+         name="event-scan-manifest"),
+    path("events/<int:pk>/scan-manifest/delta",
+         EventViewSet.as_view({"get": "scan_manifest_delta"}, **EventViewSet.scan_manifest_delta.kwargs),
+         name="event-scan-manifest-delta"),
 ]
@@ -0,0 +1,64 @@
+"""
+Disponibilités d'un événement : vendues, retenues et restantes par catégorie.
+
+Calculées depuis les compteurs (`sold_count`, `held_count`) et le stock
+libre des buckets en une seule requête groupée (catégories ⨝ événement,
+LEFT JOIN buckets), au lieu d'un `quota_remaining()` — et de son agrégat —
+par catégorie. Le résultat est mis en cache AVAILABILITY_CACHE_TTL secondes
+avec protection contre l'effet de meute (cf. `cache.py`) : le jour de
+l'ouverture des ventes, la base voit au plus un calcul par TTL et par
+événement, quel que soit le nombre de clients qui sondent.
+"""
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from tickets.models import Event, TicketType
+from tickets.utils.cache import get_or_refresh
+
+
+def availability(event_id) -> dict:
+    """Disponibilités en cache (quelques secondes de retard au plus) ; None si l'événement n'existe pas."""
+    return get_or_refresh(f"tickets:availability:{event_id}", lambda: compute_availability(event_id),
+                          settings.AVAILABILITY_CACHE_TTL, settings.AVAILABILITY_CACHE_STALE)
+
+
+def compute_availability(event_id) -> dict:
+    """Disponibilités calculées en base (une requête, deux si l'événement n'a aucune catégorie)."""
+    rows = list(
+        TicketType.objects.filter(event_id=event_id).order_by("pk")
+        .annotate(bucket_free=Coalesce(Sum(F("buckets__capacity") - F("buckets__sold_count")), 0))
+        .values("pk", "name", "price", "quota", "sold_count", "held_count", "bucket_free",
+                "event__quota_global", "event__sold_count", "event__held_count")
+    )
+    if rows:
+        event = {field: rows[0][f"event__{field}"] for field in ("quota_global", "sold_count", "held_count")}
+    else:
+        event = Event.objects.filter(pk=event_id).values("quota_global", "sold_count", "held_count").first()
+        if event is None:
+            return None
+    # Stock découpé en buckets et non vendu : compté dans sold_count, mais disponible (cf. inventory.py)
+    event_sold = event["sold_count"] - sum(row["bucket_free"] for row in rows)
+    event_remaining = max(event["quota_global"] - event_sold - event["held_count"], 0)
+    ticket_types = []
+    for row in rows:
+        sold = row["sold_count"] - row["bucket_free"]
+        ticket_types.append({
+            "id": row["pk"],
+            "name": row["name"],
+            "price": row["price"],
+            "quota": row["quota"],
+            "sold": sold,
+            "held": row["held_count"],
+            "remaining": min(max(row["quota"] - sold - row["held_count"], 0), event_remaining),
+        })
+    return {
+        "event": int(event_id),
+        "quota_global": event["quota_global"],
+        "sold": event_sold,
+        "held": event["held_count"],
+        "remaining": event_remaining,
+        "ticket_types": ticket_types,
+        "computed_at": timezone.now(),
+    }
@@ -0,0 +1,40 @@
+"""
+Cache partagé (CACHES["default"]) protégé contre l'effet de meute.
+
+Quand une entrée très demandée expire, toutes les requêtes qui la lisent
+en même temps la recalculent et frappent la base ensemble. Ici l'entrée
+garde sa valeur `stale` secondes au-delà de sa fraîcheur (`ttl`) : un
+seul processus, celui qui obtient le verrou (`cache.add`, atomique sur
+Redis / Memcached), la recalcule pendant que les autres servent la valeur
+périmée. Sans valeur du tout (démarrage), les autres attendent brièvement
+le résultat du premier au lieu de lancer le même calcul.
+"""
+import time
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 5  # secondes : durée max d'un recalcul avant qu'un autre processus ne le reprenne
+
+
+def get_or_refresh(key: str, compute, ttl: float, stale: float):
+    """Valeur en cache de `key`, recalculée par `compute()` au plus par un processus à la fois."""
+    entry = cache.get(key)
+    lock = f"{key}:lock"
+    if entry is not None:
+        fresh_until, value = entry
+        if fresh_until > time.time() or not cache.add(lock, 1, LOCK_TIMEOUT):
+            return value  # fraîche, ou déjà en cours de recalcul ailleurs
+    elif not cache.add(lock, 1, LOCK_TIMEOUT):
+        deadline = time.time() + LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.02)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        return compute()  # calcul abandonné par son détenteur : ne pas bloquer davantage
+    try:
+        value = compute()
+        cache.set(key, (time.time() + ttl, value), ttl + stale)
+    finally:
+        cache.delete(lock)
+    return value
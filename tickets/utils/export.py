@@ -0,0 +1,67 @@
+"""
+Export groupé des billets (commande ou événement) sans tout charger en mémoire.
+
+- PDF : un document multi-pages assemblé au fil de l'eau (pdf_template) ;
+- ZIP : un PDF par billet, archive écrite en flux (descripteurs de données,
+  aucun `seek` nécessaire).
+Les billets sont lus par paquets via `QuerySet.iterator()` ; seuls les
+billets valables (UNUSED, USED) sont exportés : ni ceux d'une commande pas
+encore payée (HELD), ni les billets remboursés (REFUNDED).
+"""
+import zipfile
+
+from django.http import StreamingHttpResponse
+
+from .pdf import build_ticket_pdf
+from .pdf_template import iter_tickets_pdf
+
+CHUNK_SIZE = 500
+
+
+class _ZipSink:
+    """Flux d'écriture non positionnable : zipfile bascule en mode streaming."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _ticket_pdf_bytes(ticket) -> bytes:
+    # Copie stockée si elle existe (rendu WeasyPrint éventuel), sinon rendu à la volée
+    if ticket.pdf_file:
+        with ticket.pdf_file.open("rb") as fh:
+            return fh.read()
+    return build_ticket_pdf(ticket).getvalue()
+
+
+def iter_tickets_zip(tickets):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for ticket in tickets:
+            archive.writestr(f"ticket_{ticket.id}.pdf", _ticket_pdf_bytes(ticket))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def tickets_export_response(queryset, basename: str, kind: str) -> StreamingHttpResponse:
+    """Réponse streamée `kind` ("pdf" ou "zip") pour les billets de `queryset`."""
+    tickets = (queryset.filter(status__in=("UNUSED", "USED")).select_related("ticket_type__event__venue")
+               .order_by("created_at", "pk")
+               .iterator(chunk_size=CHUNK_SIZE))
+    if kind == "pdf":
+        response = StreamingHttpResponse(iter_tickets_pdf(tickets), content_type="application/pdf")
+    else:
+        response = StreamingHttpResponse(iter_tickets_zip(tickets), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{basename}.{kind}"'
+    return response
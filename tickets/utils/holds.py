@@ -0,0 +1,108 @@
+"""
+Retenues de places des commandes en attente de paiement.
+
+Avec ORDER_HOLD_TTL > 0, une commande est créée PENDING et ses places sont
+comptées dans `held_count` (catégorie et événement) au lieu de `sold_count`,
+avec une SeatHold par catégorie valable ORDER_HOLD_TTL secondes. Les quotas
+comptent vendues + retenues : une place retenue n'est jamais revendue.
+
+Les billets d'une commande retenue sont créés HELD : refusés au scan, absents
+du manifeste des portiques et des exports, jusqu'au paiement.
+
+- `confirm_order` : paiement reçu, retenues converties en ventes (PAID) et
+  billets HELD → UNUSED ;
+- `release_orders` : annulation ou expiration, commandes CANCELLED, billets
+  invalidés et places rendues ; la commande `expire_holds` l'applique par
+  tranches aux retenues échues, sans intervention manuelle.
+
+Les places prises dans des buckets d'inventaire (`bucketed`, cf.
+`inventory.py`) ne passent pas par `held_count` : elles retournent dans les
+buckets à la libération (réparties sur plusieurs si la retenue l'était),
+le reste éventuel aux compteurs de la catégorie et de l'événement.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from tickets.models import Event, InventoryBucket, Order, SeatHold, Ticket, TicketType, adjust_counters
+
+
+def confirm_order(order_id) -> None:
+    """Paiement reçu : la commande passe PAID et ses places retenues deviennent des ventes.
+
+    ValueError si la commande n'est plus en attente, ou si sa retenue a expiré
+    (elle est alors libérée sans attendre le balayage).
+    """
+    with transaction.atomic():
+        # Verrou des retenues d'abord : même ordre que `release_orders`
+        holds = list(SeatHold.objects.select_for_update(of=("self",))
+                     .filter(order_id=order_id)
+                     .values_list("ticket_type_id", "ticket_type__event_id", "quantity", "bucketed", "expires_at"))
+        expired = any(expires_at <= timezone.now() for *_, expires_at in holds)
+        if not expired:
+            if not Order.objects.filter(pk=order_id, status="PENDING").update(status="PAID"):
+                raise ValueError("Commande déjà payée ou annulée.")
+            per_type, per_event = _held_quantities(holds)
+            adjust_counters(TicketType, per_type, held_count=-1, sold_count=1)
+            adjust_counters(Event, per_event, held_count=-1, sold_count=1)
+            SeatHold.objects.filter(order_id=order_id).delete()
+            # updated_at : repris par les deltas de manifeste et le cache de scan
+            Ticket.objects.filter(order_id=order_id, status="HELD").update(status="UNUSED", updated_at=timezone.now())
+    if expired:
+        release_orders([order_id])
+        raise ValueError("Délai de paiement dépassé : les places ont été libérées.")
+
+
+def release_orders(order_ids) -> int:
+    """Annule les commandes PENDING données et rend leurs places retenues.
+
+    Retourne le nombre de commandes annulées. Une commande sans retenue
+    (ou déjà payée) est ignorée.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        holds = list(SeatHold.objects.select_for_update(of=("self",))
+                     .filter(order_id__in=order_ids)
+                     .values_list("order_id", "ticket_type_id", "ticket_type__event_id", "quantity", "bucketed"))
+        held_orders = {hold[0] for hold in holds}
+        pending = set(Order.objects.filter(pk__in=held_orders, status="PENDING").values_list("pk", flat=True))
+        if pending:
+            Order.objects.filter(pk__in=pending).update(status="CANCELLED")
+            # Billets invalidés (updated_at : repris par les deltas de manifeste et le cache de scan)
+            Ticket.objects.filter(order_id__in=pending).exclude(status="REFUNDED").update(
+                status="REFUNDED", updated_at=now
+            )
+            released = [hold[1:] for hold in holds if hold[0] in pending]
+            per_type, per_event = _held_quantities(released)
+            adjust_counters(TicketType, per_type, held_count=-1)
+            adjust_counters(Event, per_event, held_count=-1)
+            for ticket_type_id, event_id, quantity, bucketed in released:
+                if bucketed:
+                    rest = quantity - InventoryBucket.release(ticket_type_id, quantity)
+                    if rest:
+                        TicketType(pk=ticket_type_id).release_quota(rest)
+                        Event(pk=event_id).release_quota(rest)
+        SeatHold.objects.filter(order_id__in=held_orders).delete()
+    return len(pending)
+
+
+def expire_holds(chunk_size: int = 500) -> int:
+    """Libère toutes les retenues échues, `chunk_size` commandes par transaction."""
+    released = 0
+    while True:
+        order_ids = set(SeatHold.objects.filter(expires_at__lte=timezone.now())
+                        .order_by("expires_at").values_list("order_id", flat=True)[:chunk_size])
+        if not order_ids:
+            return released
+        released += release_orders(order_ids)
+
+
+def _held_quantities(holds):
+    """Quantités retenues hors buckets, par catégorie et par événement."""
+    per_type, per_event = Counter(), Counter()
+    for ticket_type_id, event_id, quantity, bucketed, *_ in holds:
+        if not bucketed:
+            per_type[ticket_type_id] += quantity
+            per_event[event_id] += quantity
+    return per_type, per_event
@@ -0,0 +1,179 @@
+"""
+Réponses HTTP conditionnelles et service des fichiers privés.
+
+Lectures de l'API (`ConditionalGetMixin`) : ETag faible et Last-Modified
+calculés par une seule agrégation (max(updated_at), nombre de lignes) sur le
+queryset de la vue, sans sérialiser ; `If-None-Match` / `If-Modified-Since`
+→ 304 avant toute sérialisation. Listes paginées par curseur : l'empreinte
+est celle de la page lue (lignes + curseur suivant), pas du queryset entier
+— une agrégation complète à chaque page annulerait le gain du keyset.
+
+Fichiers privés (PDF des billets), après contrôle des droits :
+
+- requêtes conditionnelles : ETag / Last-Modified → 304 (ou 412) ;
+- requêtes partielles : un intervalle `Range: bytes=a-b` → 206 / 416 ;
+- délégation au proxy frontal : `X-Accel-Redirect` (nginx) ou `X-Sendfile`
+  (Apache, lighttpd), le worker gunicorn est alors libéré immédiatement.
+"""
+import hashlib
+import re
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+BLOCK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ConditionalGetMixin:
+    """list / retrieve avec ETag / Last-Modified et 304 sans sérialisation.
+
+    `etag_relations` : relations imbriquées dans la réponse (préfixes de
+    lookup, ex. "venue") dont les modifications, ajouts et suppressions
+    doivent aussi changer l'ETag ; chaque modèle concerné porte `updated_at`.
+    """
+    etag_relations = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is None:
+            return self._conditional(request, self._fingerprint(request, queryset), super().list, *args, **kwargs)
+        page = self.paginate_queryset(queryset)
+
+        def render(request, *args, **kwargs):
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        return self._conditional(request, self._page_fingerprint(request, page), render)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: kwargs[lookup]})
+        except (TypeError, ValueError, ValidationError):
+            return super().retrieve(request, *args, **kwargs)  # identifiant invalide : 404 habituel
+        return self._conditional(request, self._fingerprint(request, queryset), super().retrieve, *args, **kwargs)
+
+    def _conditional(self, request, fingerprint, handler, *args, **kwargs):
+        etag, last_modified = fingerprint
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def _fingerprint(self, request, queryset):
+        """(ETag, horodatage Last-Modified) ; (None, None) si le queryset est vide (retrieve → 404)."""
+        aggregates = {"rows": Count("pk", distinct=True), "updated": Max("updated_at")}
+        for index, relation in enumerate(self.etag_relations):
+            aggregates[f"rows_{index}"] = Count(f"{relation}__pk", distinct=True)
+            aggregates[f"updated_{index}"] = Max(f"{relation}__updated_at")
+        values = queryset.order_by().aggregate(**aggregates)
+        if not values["rows"] and self.action == "retrieve":
+            return None, None
+        stamps = [value for name, value in values.items() if name.startswith("updated") and value is not None]
+        last_modified = int(max(stamps).timestamp()) if stamps else 0
+        state = ":".join(f"{name}={value.isoformat() if hasattr(value, 'isoformat') else value}"
+                         for name, value in sorted(values.items()))
+        return self._etag(request, state), last_modified
+
+    def _page_fingerprint(self, request, page):
+        """(ETag, Last-Modified) d'une page déjà lue par le paginateur : aucune requête de plus."""
+        stamps = [row.updated_at for row in page]
+        last_modified = int(max(stamps).timestamp()) if stamps else 0
+        state = ":".join(f"{row.pk}@{row.updated_at.isoformat()}" for row in page)
+        return self._etag(request, f"{state} next={self.paginator.next_cursor}"), last_modified
+
+    @staticmethod
+    def _etag(request, state: str) -> str:
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(f"{request.accepted_renderer.format} {request.path}?{query} {state}".encode()).hexdigest()
+        return f'W/"{digest}"'
+
+
+def serve_field_file(request, field_file, filename: str, content_type: str = "application/pdf"):
+    storage, name = field_file.storage, field_file.name
+    size = storage.size(name)
+    modified = int(storage.get_modified_time(name).timestamp())
+    etag = quote_etag(hashlib.md5(f"{name}:{size}:{modified}".encode()).hexdigest())
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        mode = settings.TICKET_PDF_SENDFILE
+        if mode == "nginx":
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = settings.TICKET_PDF_ACCEL_PREFIX + quote(name)
+        elif mode == "apache":
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = storage.path(name)
+        else:
+            response = _django_response(request, field_file, size, etag, modified, content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _django_response(request, field_file, size, etag, modified, content_type):
+    byte_range = _requested_range(request, size, etag, modified)
+    if byte_range is None:
+        return FileResponse(field_file.open("rb"), content_type=content_type)
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range
+    response = StreamingHttpResponse(_read_range(field_file, start, end), status=206,
+                                     content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    return response
+
+
+def _requested_range(request, size, etag, modified):
+    """(début, fin) inclus, "unsatisfiable", ou None pour servir le fichier entier."""
+    header = request.META.get("HTTP_RANGE", "")
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # absent, multi-intervalles ou invalide : réponse complète (RFC 9110 §14.2)
+
+    # If-Range : l'intervalle n'est valable que si la ressource n'a pas changé
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != modified:
+        return None
+
+    first, last = match.groups()
+    if first == "":  # suffixe : les N derniers octets
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # intervalle syntaxiquement invalide : ignoré (RFC 9110 §14.1.1)
+    if start >= size:
+        return "unsatisfiable"
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _read_range(field_file, start, end):
+    with field_file.open("rb") as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,81 @@
+"""
+Clés d'idempotence (`Idempotency-Key`) de la création de commandes.
+
+Un client mobile qui relance `POST /api/orders/` après un timeout crée une
+seconde commande et consomme deux fois le stock. Avec l'en-tête
+`Idempotency-Key`, la première exécution enregistre sa réponse sous la clé
+(par acheteur) ; une relance avec la même clé la rejoue telle quelle, sans
+repasser par `OrderSerializer.create`.
+
+La clé est insérée au début de la transaction de la commande et la réponse
+écrite avant le commit : clé, commande et réponse sont validées ensemble ou
+pas du tout. Un doublon arrivé pendant la première exécution bute sur la
+contrainte d'unicité (user, key) et attend son issue sur le verrou de
+l'index : commit → réponse rejouée ; rollback (commande refusée) → la clé
+est libre et le doublon s'exécute à son tour. Aucun état « en cours » ne
+reste en base si le worker meurt.
+
+Une même clé réutilisée pour une requête différente (empreinte SHA‑256 de
+la méthode, du chemin et du corps) est refusée. Les clés sont purgées après
+IDEMPOTENCY_KEY_TTL secondes (commande `purge_idempotency_keys`).
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from tickets.models import IdempotencyKey
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyConflict(Exception):
+    """Clé déjà utilisée pour une autre requête."""
+
+
+def request_fingerprint(request) -> str:
+    """Empreinte SHA‑256 (hexadécimale) de la méthode, du chemin et du corps décodé."""
+    body = json.dumps(request.data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def run_once(user, key: str, fingerprint: str, handler) -> Response:
+    """Exécute `handler` (qui retourne une Response) une seule fois par (user, key).
+
+    Une réponse 2xx est enregistrée et rejouée aux relances ; une erreur
+    annule la transaction et libère la clé. Lève IdempotencyConflict si
+    l'empreinte diffère de celle de la première requête.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint)
+        except IntegrityError:
+            # Première requête validée entre-temps (l'insertion a attendu son commit)
+            record = IdempotencyKey.objects.get(user=user, key=key)
+            if record.fingerprint != fingerprint:
+                raise IdempotencyConflict("Idempotency-Key déjà utilisée pour une autre requête.")
+            return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: "true"})
+
+        response = handler()
+        if not 200 <= response.status_code < 300:
+            transaction.set_rollback(True)
+            return response
+        record.status_code, record.response = response.status_code, response.data
+        record.save(update_fields=["status_code", "response"])
+    return response
+
+
+def purge_expired(chunk_size: int = 1000) -> int:
+    """Supprime par tranches les clés plus vieilles que IDEMPOTENCY_KEY_TTL ; retourne le nombre supprimé."""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    purged = 0
+    while True:
+        pks = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
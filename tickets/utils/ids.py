@@ -0,0 +1,46 @@
+"""
+Identifiants ordonnés dans le temps (UUID version 7, RFC 9562).
+
+Les 48 premiers bits portent l'heure Unix en millisecondes : les nouvelles
+lignes arrivent en fin d'index de clé primaire au lieu d'être dispersées
+dans tout le B-tree comme avec `uuid.uuid4` (moins de découpes de pages,
+index plus compact, pages chaudes en cache). Le type reste `uuid.UUID`,
+donc `UUIDField` et les URL `<uuid:pk>` sont inchangés.
+
+Dans un même processus les valeurs sont strictement croissantes : les 12
+bits `rand_a` servent de compteur à l'intérieur d'une milliseconde
+(méthode 1 de la RFC), les 62 bits `rand_b` restent aléatoires.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """UUID v7 : horodatage ms + compteur 12 bits + 62 bits aléatoires."""
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms, _counter = ms, int.from_bytes(os.urandom(2), "big") & 0x1FF
+        else:
+            # Même milliseconde (ou horloge reculée) : on incrémente le compteur
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms, _counter = _last_ms + 1, 0
+            ms = _last_ms
+        counter = _counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def uuid7_datetime(value: uuid.UUID):
+    """Instant de création (UTC) encodé dans un UUID v7."""
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
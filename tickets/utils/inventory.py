@@ -0,0 +1,101 @@
+"""
+Inventaire découpé en buckets pour les catégories très demandées (ventes flash).
+
+Sans découpage, chaque achat verrouille la ligne TicketType (select_for_update)
+puis la ligne Event (UPDATE conditionnel du quota global) jusqu'au commit :
+tous les acheteurs d'une même catégorie passent l'un après l'autre.
+
+Avec `TicketType.inventory_shards = N`, le stock libre de la catégorie est
+découpé en N InventoryBucket. Cette capacité est retirée d'avance des
+compteurs `sold_count` de la catégorie et de l'événement (elle ne peut plus
+servir ailleurs) ; un achat ne touche alors qu'un bucket tiré au hasard, par
+un UPDATE conditionnel `sold_count + n <= capacity` (`InventoryBucket.take`).
+Deux acheteurs ne se bloquent que s'ils tombent sur le même bucket, et aucun
+bucket ne dépasse sa capacité : pas de survente possible.
+
+Les buckets se vident inégalement : `rebalance` (commande
+`rebalance_inventory`) redistribue le stock restant, et y ajoute les places
+rendues hors buckets depuis le dernier passage.
+
+Ordre des verrous : catégorie, buckets (par index), puis événement — le même
+que celui d'une commande.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from tickets.models import Event, InventoryBucket, TicketType
+
+
+def shard(ticket_type: TicketType, shards: int) -> int:
+    """Découpe le stock libre de la catégorie en `shards` buckets (0 = compteur unique).
+
+    Opération d'administration, à faire avant l'ouverture de la vente : les
+    buckets existants sont supprimés et leur capacité invendue rendue aux
+    compteurs avant le nouveau découpage. Retourne le stock découpé.
+    """
+    with transaction.atomic():
+        TicketType.objects.select_for_update().get(pk=ticket_type.pk)
+        buckets = list(InventoryBucket.objects.select_for_update()
+                       .filter(ticket_type_id=ticket_type.pk).order_by("index"))
+        free = sum(b.capacity - b.sold_count for b in buckets)
+        if free:
+            TicketType(pk=ticket_type.pk).release_quota(free)
+            Event(pk=ticket_type.event_id).release_quota(free)
+        InventoryBucket.objects.filter(ticket_type_id=ticket_type.pk).delete()
+
+        stock = _carve(ticket_type.pk) if shards else 0
+        InventoryBucket.objects.bulk_create([
+            InventoryBucket(ticket_type_id=ticket_type.pk, index=index, capacity=capacity)
+            for index, capacity in enumerate(_split(stock, shards))
+        ])
+        TicketType.objects.filter(pk=ticket_type.pk).update(inventory_shards=shards)
+        Event.objects.filter(pk=ticket_type.event_id).update(sharded_inventory=Exists(
+            TicketType.objects.filter(event_id=OuterRef("pk"), inventory_shards__gt=0)
+        ))
+    ticket_type.inventory_shards = shards
+    return stock
+
+
+def rebalance(ticket_type: TicketType) -> int:
+    """Répartit à parts égales le stock invendu entre les buckets de la catégorie.
+
+    Les capacités sont modifiées sur place (un achat en attente sur un bucket
+    relit la nouvelle capacité). Retourne le nombre de places déplacées.
+    """
+    with transaction.atomic():
+        tt = TicketType.objects.select_for_update().get(pk=ticket_type.pk)
+        buckets = list(InventoryBucket.objects.select_for_update()
+                       .filter(ticket_type_id=tt.pk).order_by("index"))
+        if not tt.inventory_shards or not buckets:
+            return 0
+        free = sum(b.capacity - b.sold_count for b in buckets) + _carve(tt.pk)
+        moved = 0
+        for bucket, share in zip(buckets, _split(free, len(buckets))):
+            moved += max(bucket.sold_count + share - bucket.capacity, 0)
+            bucket.capacity = bucket.sold_count + share
+        InventoryBucket.objects.bulk_update(buckets, ["capacity"])
+    return moved
+
+
+def _carve(ticket_type_id) -> int:
+    """Retire des compteurs le stock encore libre hors buckets ; retourne la quantité.
+
+    L'appelant détient le verrou de la catégorie.
+    """
+    tt = TicketType.objects.get(pk=ticket_type_id)
+    event = Event.objects.select_for_update().get(pk=tt.event_id)
+    stock = min(tt.quota - tt.sold_count - tt.held_count,
+                event.quota_global - event.sold_count - event.held_count)
+    if stock <= 0:
+        return 0
+    TicketType(pk=tt.pk).take_quota(stock)
+    event.take_quota(stock)
+    return stock
+
+
+def _split(total: int, parts: int) -> list:
+    """`total` réparti en `parts` entiers, écart d'au plus 1."""
+    if not parts:
+        return []
+    share, extra = divmod(total, parts)
+    return [share + (1 if index < extra else 0) for index in range(parts)]
@@ -0,0 +1,74 @@
+"""
+Manifeste hors-ligne des portiques.
+
+Un portique télécharge, par événement, l'ensemble trié des préfixes de 8
+octets des `qr_hash` encore valides (billets UNUSED) et valide ensuite
+localement par recherche dichotomique (`qr_hash` = SHA-256 du contenu lu,
+cf. `qr_signing.py`). Il se resynchronise par deltas :
+seuls les billets émis, utilisés ou remboursés depuis son curseur sont
+renvoyés.
+
+Format binaire (big-endian) :
+    4 octets  b"EVTM"
+    1 octet   version du format
+    4 octets  nombre de préfixes N
+    8 octets  curseur (µs depuis l'epoch)
+    N × 8     préfixes triés
+
+Le curseur est `updated_at` du billet, reculé de SCAN_MANIFEST_CURSOR_LAG
+secondes : une transaction committée après la lecture mais horodatée avant
+reste couverte par le delta suivant (les doublons sont idempotents).
+"""
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from tickets.models import Ticket
+
+MAGIC = b"EVTM"
+FORMAT_VERSION = 1
+PREFIX_SIZE = 8
+_HEADER = struct.Struct(">4sBIQ")
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def qr_prefix(qr_hash: str) -> bytes:
+    return bytes.fromhex(qr_hash[:PREFIX_SIZE * 2])
+
+
+def current_cursor() -> int:
+    moment = timezone.now() - timedelta(seconds=settings.SCAN_MANIFEST_CURSOR_LAG)
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def cursor_datetime(cursor: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=cursor)
+
+
+def parse_cursor(value) -> int:
+    """Curseur transmis par le portique ; ValueError si illisible."""
+    cursor = int(value)
+    if cursor < 0:
+        raise ValueError("curseur négatif")
+    return cursor
+
+
+def build_manifest(event_id) -> bytes:
+    cursor = current_cursor()
+    hashes = (Ticket.objects.filter(ticket_type__event_id=event_id, status="UNUSED")
+              .values_list("qr_hash", flat=True))
+    prefixes = sorted(qr_prefix(h) for h in hashes.iterator(chunk_size=2000))
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(prefixes), cursor) + b"".join(prefixes)
+
+
+def manifest_delta(event_id, since: int) -> dict:
+    """Préfixes à ajouter (UNUSED) et à retirer (HELD / USED / REFUNDED) depuis `since`."""
+    cursor = max(current_cursor(), since)
+    changes = (Ticket.objects.filter(ticket_type__event_id=event_id, updated_at__gt=cursor_datetime(since))
+               .values_list("qr_hash", "status"))
+    add, remove = [], []
+    for qr_hash, status in changes.iterator(chunk_size=2000):
+        (add if status == "UNUSED" else remove).append(qr_hash[:PREFIX_SIZE * 2])
+    return {"cursor": str(cursor), "add": add, "remove": remove}
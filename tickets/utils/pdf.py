@@ -1,16 +1,43 @@
-import io, base64, qrcode, weasyprint
+import io
+import django
+from django.core.files.base import ContentFile
 from django.template.loader import render_to_string
 from django.conf import settings
 
+from .pdf_template import render_ticket_pdf
+from .qr import qr_svg
+
 def build_ticket_pdf(ticket):
-    qr_img = qrcode.make(ticket.qr_hash)
-    qr_io  = io.BytesIO()
-    qr_img.save(qr_io, format="PNG")
-    qr_b64 = base64.b64encode(qr_io.getvalue()).decode()
+    """PDF du billet selon `settings.TICKET_PDF_RENDERER` ("template" ou "weasyprint")."""
+    if settings.TICKET_PDF_RENDERER == "weasyprint":
+        return build_ticket_pdf_html(ticket)
+    return io.BytesIO(render_ticket_pdf(ticket))
+
+
+def build_ticket_pdf_html(ticket):
+    """Rendu complet HTML → PDF de `tickets/pdf_ticket.html` (chemin historique)."""
+    # Import local : WeasyPrint (et ses libs natives) n'est chargé que par le worker PDF
+    import weasyprint
 
     html = render_to_string("tickets/pdf_ticket.html", {
         "ticket": ticket,
-        "qr_b64": qr_b64
+        "qr_svg": qr_svg(ticket.qr_code),  # SVG inline : ni PNG ni base64 à décoder
     })
     pdf_bytes = weasyprint.HTML(string=html, base_url=settings.BASE_DIR).write_pdf()
     return io.BytesIO(pdf_bytes)
+
+
+def store_ticket_pdf(ticket):
+    """Génère le PDF du billet et l'enregistre dans `Ticket.pdf_file`."""
+    pdf_io = build_ticket_pdf(ticket)
+    ticket.pdf_file.save(f"ticket_{ticket.id}.pdf", ContentFile(pdf_io.read()), save=False)
+    ticket.pdf_status = "READY"
+    ticket.save(update_fields=["pdf_file", "pdf_status"])
+
+
+def init_render_process():
+    """Initialiseur des processus du pool `pdf_worker` (démarrés en « spawn »).
+
+    Défini ici car ce module n'importe aucun modèle au chargement.
+    """
+    django.setup()
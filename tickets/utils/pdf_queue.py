@@ -0,0 +1,111 @@
+"""
+Planification des rendus PDF et file d'attente stockée en base (PdfJob).
+
+`settings.TICKET_PDF_MODE` choisit la stratégie :
+- "eager"      : rendu dans le processus web, juste après le commit ;
+- "lazy"       : rendu au premier téléchargement (TicketViewSet.pdf) ;
+- "background" : job PdfJob consommé par `manage.py pdf_worker`.
+
+Les jobs sont insérés dans la même transaction que les billets : ils ne
+deviennent visibles du worker qu'au commit, et aucun billet validé ne peut
+rester sans job.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from tickets.models import PdfJob, Ticket
+from .pdf import store_ticket_pdf
+
+PDF_MODES = ("eager", "lazy", "background")
+
+# Un job RUNNING plus vieux que ça est considéré comme orphelin (worker tué)
+STALE_AFTER = timedelta(minutes=10)
+
+
+def schedule_ticket_pdfs(tickets) -> None:
+    """Point d'entrée unique après création de billets (commande, signal)."""
+    mode = settings.TICKET_PDF_MODE
+    if mode not in PDF_MODES:
+        raise ImproperlyConfigured(f"TICKET_PDF_MODE doit valoir {PDF_MODES}, pas {mode!r}.")
+    if mode == "eager":
+        transaction.on_commit(partial(_store_all, list(tickets)))
+    elif mode == "background":
+        enqueue_ticket_pdfs(tickets)
+
+
+def _store_all(tickets) -> None:
+    for ticket in tickets:
+        store_ticket_pdf(ticket)
+
+
+def ensure_ticket_pdf(ticket_id) -> Ticket:
+    """Renvoie le billet avec son PDF, en le générant au besoin.
+
+    Le verrou de ligne sert de verrou par billet : des premières demandes
+    simultanées attendent le rendu en cours au lieu d'en lancer un autre.
+    """
+    with transaction.atomic():
+        ticket = (Ticket.objects.select_for_update(of=("self",))
+                  .select_related("ticket_type__event__venue")
+                  .get(pk=ticket_id))
+        if not ticket.pdf_file:
+            store_ticket_pdf(ticket)
+            PdfJob.objects.filter(ticket=ticket, status="PENDING").update(
+                status="DONE", updated_at=timezone.now()
+            )
+    return ticket
+
+
+def enqueue_ticket_pdfs(tickets) -> None:
+    PdfJob.objects.bulk_create([PdfJob(ticket=t) for t in tickets], ignore_conflicts=True)
+
+
+def claim_jobs(limit: int):
+    """Réserve jusqu'à `limit` jobs prêts ; renvoie [(job_id, ticket_id, attempts)]."""
+    now = timezone.now()
+    ready = (Q(status="PENDING", run_after__lte=now)
+             | Q(status="RUNNING", updated_at__lt=now - STALE_AFTER))
+    with transaction.atomic():
+        jobs = list(
+            PdfJob.objects.select_for_update(skip_locked=True)
+            .filter(ready)
+            .order_by("run_after", "pk")
+            .values_list("pk", "ticket_id", "attempts")[:limit]
+        )
+        PdfJob.objects.filter(pk__in=[pk for pk, _, _ in jobs]).update(
+            status="RUNNING", attempts=F("attempts") + 1, updated_at=now
+        )
+    return [(pk, ticket_id, attempts + 1) for pk, ticket_id, attempts in jobs]
+
+
+def render_ticket(ticket_id) -> None:
+    """Exécuté dans un processus du pool : rendu + enregistrement du PDF."""
+    ticket = Ticket.objects.select_related("ticket_type__event__venue").get(pk=ticket_id)
+    if not ticket.pdf_file:
+        store_ticket_pdf(ticket)
+
+
+def mark_done(job_ids) -> None:
+    PdfJob.objects.filter(pk__in=job_ids).update(status="DONE", last_error="", updated_at=timezone.now())
+
+
+def mark_failed(job_id, ticket_id, attempts: int, error: str, max_attempts: int, backoff: int) -> None:
+    """Replanifie le job (backoff exponentiel) ou l'abandonne après `max_attempts` essais."""
+    now = timezone.now()
+    if attempts < max_attempts:
+        PdfJob.objects.filter(pk=job_id).update(
+            status="PENDING",
+            run_after=now + timedelta(seconds=backoff * 2 ** (attempts - 1)),
+            last_error=error,
+            updated_at=now,
+        )
+        return
+    with transaction.atomic():
+        PdfJob.objects.filter(pk=job_id).update(status="FAILED", last_error=error, updated_at=now)
+        Ticket.objects.filter(pk=ticket_id).update(pdf_status="FAILED")
@@ -0,0 +1,256 @@
+"""
+Rendu rapide des billets : PDF de base compilé par (Event, TicketType).
+
+Tout ce qui est commun aux billets d'une catégorie (bordure, titre, lieu,
+date, catégorie, prix) est écrit une fois dans un PDF de base, mis en cache
+sur disque. Chaque billet n'est ensuite qu'une *mise à jour incrémentale*
+de ce PDF (ISO 32000, §7.5.6) : un flux de contenu avec le QR-code
+(vectoriel, cf. `qr.py`) et l'identifiant, plus la page réécrite pour
+référencer ce flux. Aucun moteur HTML n'est sollicité par billet.
+
+La mise en page reprend celle de `tickets/pdf_ticket.html` (A4, Helvetica).
+"""
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.template.defaultfilters import floatformat
+from django.utils import dateformat, timezone
+
+from .qr import qr_pdf_path
+
+# À incrémenter si la mise en page change : invalide tous les PDF de base
+LAYOUT_VERSION = 2
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842   # A4 en points
+MARGIN = 56
+BOX_TOP, BOX_BOTTOM = 786, 585
+# QR zone de silence comprise (4 modules blancs) : à l'intérieur du cadre, entre
+# la ligne « Catégorie » et l'identifiant du billet
+QR_LEFT, QR_TOP, QR_SIZE = MARGIN + 1, 708, 104
+
+# Objets du PDF de base : 1 catalogue, 2 pages, 3 page, 4 contenu, 5-6 polices.
+# Chaque billet ajoute l'objet 7 (son flux) et réécrit la page 3.
+_STAMP_OBJ = 7
+_STAMPED_PAGE = (
+    b"3 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+    b"/Contents [4 0 R 7 0 R] /Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> >>\nendobj\n"
+    % (PAGE_WIDTH, PAGE_HEIGHT)
+)
+
+
+# ───────────────────────── Primitives PDF ───────────────────────── #
+def _pdf_text(value) -> bytes:
+    """Chaîne littérale PDF en WinAnsiEncoding (caractères hors cp1252 → « ? »)."""
+    raw = str(value).encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _text_line(font: bytes, size: float, x: float, y: float, value) -> bytes:
+    return b"BT /%s %g Tf %g %g Td %s Tj ET\n" % (font, size, x, y, _pdf_text(value))
+
+
+def _stream(number: int, content: bytes) -> bytes:
+    return (b"%d 0 obj\n<< /Length %d >>\nstream\n" % (number, len(content))
+            + content + b"\nendstream\nendobj\n")
+
+
+def _font(number: int, name: bytes) -> bytes:
+    return (b"%d 0 obj\n<< /Type /Font /Subtype /Type1 /BaseFont /%s "
+            b"/Encoding /WinAnsiEncoding >>\nendobj\n" % (number, name))
+
+
+def _xref(entries) -> bytes:
+    """Table xref à partir de [(numéro, offset)] triés, regroupés en sous-sections."""
+    out, run = [b"xref\n"], []
+    for number, offset in entries:
+        if run and number != run[-1][0] + 1:
+            out.append(_xref_section(run))
+            run = []
+        run.append((number, offset))
+    if run:
+        out.append(_xref_section(run))
+    return b"".join(out)
+
+
+def _xref_section(run) -> bytes:
+    lines = [b"%d %d\n" % (run[0][0], len(run))]
+    for number, offset in run:
+        lines.append(b"0000000000 65535 f \n" if number == 0 else b"%010d 00000 n \n" % offset)
+    return b"".join(lines)
+
+
+# ───────────────────────── Modèle compilé ───────────────────────── #
+class CompiledTicketTemplate:
+    """PDF de base d'une catégorie + ce qu'il faut pour y tamponner un billet."""
+
+    def __init__(self, base_pdf: bytes):
+        self.base_pdf = base_pdf
+        self.startxref = int(base_pdf.rsplit(b"startxref", 1)[1].split()[0])
+        # Flux de contenu commun (objet 4), réutilisé par l'export multi-pages
+        start = base_pdf.index(b"4 0 obj")
+        self.content = base_pdf[base_pdf.index(b"stream\n", start) + 7:base_pdf.index(b"\nendstream", start)]
+
+    @classmethod
+    def compile(cls, fields: dict) -> "CompiledTicketTemplate":
+        return cls(_build_base_pdf(base_content(fields)))
+
+    def stamp(self, ticket_id, qr_data: str) -> bytes:
+        stamp = _stream(_STAMP_OBJ, stamp_content(ticket_id, qr_data))
+        page_offset = len(self.base_pdf)
+        stamp_offset = page_offset + len(_STAMPED_PAGE)
+        xref_offset = stamp_offset + len(stamp)
+        trailer = (b"trailer\n<< /Size %d /Root 1 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n"
+                   % (_STAMP_OBJ + 1, self.startxref, xref_offset))
+        return b"".join([
+            self.base_pdf, _STAMPED_PAGE, stamp,
+            _xref([(0, 0), (3, page_offset), (_STAMP_OBJ, stamp_offset)]), trailer,
+        ])
+
+
+def template_fields(ticket_type) -> dict:
+    """Champs imprimés communs à tous les billets d'une catégorie."""
+    event = ticket_type.event
+    return {
+        "title": event.title,
+        "venue": event.venue.name,
+        "date": dateformat.format(timezone.localtime(event.start_time), "d/m/Y H:i"),
+        "category": f"{ticket_type.name} – {floatformat(ticket_type.price, 0)} FCFA",
+    }
+
+
+def base_content(fields: dict) -> bytes:
+    left = MARGIN + 7.5
+    return b"".join([
+        b"0.75 w %d %d %d %d re S\n" % (MARGIN, BOX_BOTTOM, PAGE_WIDTH - 2 * MARGIN, BOX_TOP - BOX_BOTTOM),
+        _text_line(b"F2", 13.5, left, 762, fields["title"]),
+        _text_line(b"F1", 9, left, 740, f"Lieu : {fields['venue']}"),
+        _text_line(b"F1", 9, left, 726, f"Date : {fields['date']}"),
+        _text_line(b"F1", 9, left, 712, f"Catégorie : {fields['category']}"),
+    ])
+
+
+def stamp_content(ticket_id, qr_data: str) -> bytes:
+    return (qr_pdf_path(qr_data, QR_LEFT, QR_TOP - QR_SIZE, QR_SIZE)
+            + _text_line(b"F1", 9, MARGIN + 7.5, 592, f"ID billet : {ticket_id}"))
+
+
+def _build_base_pdf(content: bytes) -> bytes:
+    objects = [
+        b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+        b"2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n",
+        b"3 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> >>\nendobj\n" % (PAGE_WIDTH, PAGE_HEIGHT),
+        _stream(4, content),
+        _font(5, b"Helvetica"),
+        _font(6, b"Helvetica-Bold"),
+    ]
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = [(0, 0)]
+    for number, obj in enumerate(objects, start=1):
+        offsets.append((number, len(out)))
+        out += obj
+    xref_offset = len(out)
+    out += _xref(offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+# ───────────────────────── Cache disque / mémoire ───────────────────────── #
+def template_dir() -> Path:
+    return Path(settings.TICKET_PDF_TEMPLATE_DIR)
+
+
+def template_path(ticket_type, fields: dict) -> Path:
+    """Nom adressé par le contenu : toute modification des champs change le fichier."""
+    digest = hashlib.sha256(repr((LAYOUT_VERSION, sorted(fields.items()))).encode()).hexdigest()[:16]
+    return template_dir() / f"{ticket_type.event_id}-{ticket_type.pk}-{digest}.pdf"
+
+
+@lru_cache(maxsize=256)
+def _load(path: Path, fields: tuple) -> CompiledTicketTemplate:
+    try:
+        return CompiledTicketTemplate(path.read_bytes())
+    except (FileNotFoundError, ValueError, IndexError):
+        pass
+    compiled = CompiledTicketTemplate.compile(dict(fields))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Écriture atomique : un autre processus ne lit jamais un fichier partiel
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(compiled.base_pdf)
+    os.replace(tmp, path)
+    return compiled
+
+
+def get_compiled_template(ticket_type) -> CompiledTicketTemplate:
+    fields = template_fields(ticket_type)
+    return _load(template_path(ticket_type, fields), tuple(sorted(fields.items())))
+
+
+def render_ticket_pdf(ticket) -> bytes:
+    return get_compiled_template(ticket.ticket_type).stamp(ticket.id, ticket.qr_code)
+
+
+def invalidate_templates(event_id, ticket_type_id=None) -> None:
+    """Supprime du disque les PDF de base d'un événement (ou d'une seule catégorie)."""
+    pattern = f"{event_id}-{ticket_type_id if ticket_type_id is not None else '*'}-*.pdf"
+    for path in template_dir().glob(pattern):
+        path.unlink(missing_ok=True)
+    _load.cache_clear()
+
+
+# ───────────────────────── Export multi-pages ───────────────────────── #
+def iter_tickets_pdf(tickets):
+    """Un seul PDF, une page par billet, produit au fil de l'eau.
+
+    Le flux commun de chaque catégorie est écrit une seule fois et partagé
+    par ses pages ; seuls les offsets xref (un entier par objet) restent en
+    mémoire, quelle que soit la taille de la commande.
+    """
+    offsets, kids, shared = {}, [], {}
+    position = 0
+    next_number = 5  # 1 catalogue, 2 arbre des pages (écrit en dernier), 3-4 polices
+
+    def emit(number, obj):
+        nonlocal position
+        offsets[number] = position
+        position += len(obj)
+        return obj
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position = len(header)
+    yield header + b"".join([
+        emit(1, b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"),
+        emit(3, _font(3, b"Helvetica")),
+        emit(4, _font(4, b"Helvetica-Bold")),
+    ])
+
+    for ticket in tickets:
+        chunks = []
+        base_number = shared.get(ticket.ticket_type_id)
+        if base_number is None:
+            base_number = shared[ticket.ticket_type_id] = next_number
+            next_number += 1
+            content = get_compiled_template(ticket.ticket_type).content
+            chunks.append(emit(base_number, _stream(base_number, content)))
+        stamp_number, page_number = next_number, next_number + 1
+        next_number += 2
+        chunks.append(emit(stamp_number, _stream(stamp_number, stamp_content(ticket.id, ticket.qr_code))))
+        chunks.append(emit(page_number, (
+            b"%d 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Contents [%d 0 R %d 0 R] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>\nendobj\n"
+            % (page_number, PAGE_WIDTH, PAGE_HEIGHT, base_number, stamp_number)
+        )))
+        kids.append(page_number)
+        yield b"".join(chunks)
+
+    pages = emit(2, b"2 0 obj\n<< /Type /Pages /Kids [%s] /Count %d >>\nendobj\n"
+                 % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    xref_offset = position
+    yield pages + _xref([(0, 0)] + sorted(offsets.items())) + (
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_number, xref_offset)
+    )
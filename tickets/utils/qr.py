@@ -0,0 +1,70 @@
+"""
+QR-codes vectoriels des billets, avec cache LRU borné par contenu de QR.
+
+Le QR n'est jamais rastérisé : on produit directement soit un chemin SVG
+(gabarit HTML / WeasyPrint), soit des opérateurs PDF (modèle compilé).
+Une régénération de PDF pour un même billet ne réencode donc pas le QR.
+La matrice inclut la zone de silence de 4 modules blancs exigée par la
+norme (ISO/IEC 18004) : SVG et PDF la réservent sans que la mise en page
+ait à y penser.
+Le masque reste choisi par qrcode selon les pénalités de la norme (8
+essais, ~10 ms par code) : le cache ci-dessous évite de le payer aux rendus
+suivants.
+"""
+from functools import lru_cache
+
+import qrcode
+from django.conf import settings
+
+QUIET_ZONE = 4  # modules
+
+
+def qr_matrix(data: str):
+    qr = qrcode.QRCode(border=QUIET_ZONE)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _runs(matrix):
+    """Suites horizontales de modules noirs : (colonne, ligne, longueur)."""
+    for y, row in enumerate(matrix):
+        x, n = 0, len(row)
+        while x < n:
+            if row[x]:
+                start = x
+                while x < n and row[x]:
+                    x += 1
+                yield start, y, x - start
+            else:
+                x += 1
+
+
+@lru_cache(maxsize=settings.TICKET_QR_CACHE_SIZE)
+def qr_svg(data: str) -> str:
+    """Élément <svg> inline : un seul chemin, coordonnées en modules."""
+    matrix = qr_matrix(data)
+    n = len(matrix)
+    path = "".join(f"M{x} {y}h{w}v1h-{w}z" for x, y, w in _runs(matrix))
+    return (f'<svg class="qr" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {n} {n}" '
+            f'shape-rendering="crispEdges"><path d="{path}" fill="#000"/></svg>')
+
+
+@lru_cache(maxsize=settings.TICKET_QR_CACHE_SIZE)
+def qr_pdf_ops(data: str):
+    """(taille en modules, opérateurs PDF `re`) ; l'origine est le coin bas-gauche."""
+    matrix = qr_matrix(data)
+    n = len(matrix)
+    ops = b"".join(b"%d %d %d 1 re\n" % (x, n - 1 - y, w) for x, y, w in _runs(matrix))
+    return n, ops
+
+
+def qr_pdf_path(data: str, x: float, y: float, size: float) -> bytes:
+    """QR de `size` points posé en (x, y), prêt à insérer dans un flux de contenu."""
+    n, ops = qr_pdf_ops(data)
+    return b"q %g 0 0 %g %g %g cm\n" % (size / n, size / n, x, y) + ops + b"f Q\n"
+
+
+def clear_cache() -> None:
+    qr_svg.cache_clear()
+    qr_pdf_ops.cache_clear()
@@ -0,0 +1,105 @@
+"""
+Contenu signé des QR-codes.
+
+Le QR d'un billet encode `<ticket>.<event>.<mac>` :
+- `ticket` : UUID du billet en hexadécimal (32 caractères) ;
+- `event`  : id de l'événement ;
+- `mac`    : HMAC-SHA256 (clé dérivée de SECRET_KEY) des deux premiers
+  champs, tronqué à 128 bits, en base64url.
+
+Le portique vérifie la signature (comparaison à temps constant, clés de
+SECRET_KEY_FALLBACKS acceptées pendant une rotation) et l'événement avant
+toute requête : un code forgé ou aléatoire est rejeté sans toucher la base.
+En base, `qr_hash` reste un SHA-256 hexadécimal : celui du contenu signé.
+
+Les billets émis avant la signature (`Ticket.legacy_qr`) portent un
+`qr_hash` opaque imprimé tel quel : ils restent acceptés (64 caractères
+hexadécimaux, recherche en base) tant que TICKET_QR_ACCEPT_LEGACY est actif.
+Le `qr_hash` d'un billet signé, lui, n'est jamais accepté seul : sinon il
+contournerait la signature et le contrôle d'événement.
+"""
+import base64
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+_SALT = "tickets.qr"
+_MAC_BYTES = 16
+_LEGACY = re.compile(r"[0-9a-f]{64}")
+
+
+class InvalidQRCode(ValueError):
+    """Code rejeté avant la base ; `reason` : format, signature ou event."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _mac(message: str, secret) -> str:
+    digest = salted_hmac(_SALT, message, secret=secret, algorithm="sha256").digest()
+    return base64.urlsafe_b64encode(digest[:_MAC_BYTES]).rstrip(b"=").decode()
+
+
+def _message(ticket_id, event_id) -> str:
+    return f"{uuid.UUID(str(ticket_id)).hex}.{int(event_id)}"
+
+
+def sign_payload(ticket_id, event_id) -> str:
+    message = _message(ticket_id, event_id)
+    return f"{message}.{_mac(message, settings.SECRET_KEY)}"
+
+
+def issued_payload(ticket_id, event_id, qr_hash: str):
+    """Contenu signé dont le SHA-256 est `qr_hash`, ou None.
+
+    Un billet émis avant une rotation de SECRET_KEY garde le MAC de l'ancienne
+    clé : on la cherche parmi SECRET_KEY_FALLBACKS pour réimprimer le même QR.
+    """
+    message = _message(ticket_id, event_id)
+    for secret in [settings.SECRET_KEY, *settings.SECRET_KEY_FALLBACKS]:
+        payload = f"{message}.{_mac(message, secret)}"
+        if payload_hash(payload) == qr_hash:
+            return payload
+    return None
+
+
+def payload_hash(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def verify_payload(payload: str):
+    """Retourne `(ticket_id, event_id)` d'un contenu signé, ou lève InvalidQRCode."""
+    try:
+        ticket_hex, event, mac = payload.split(".")
+        ticket_id, event_id = uuid.UUID(hex=ticket_hex), int(event)
+    except ValueError:
+        raise InvalidQRCode("format")
+    message = f"{ticket_hex}.{event}"
+    # Toutes les clés sont testées : la durée ne dépend pas de celle qui signe
+    valid = False
+    for secret in [settings.SECRET_KEY, *settings.SECRET_KEY_FALLBACKS]:
+        valid |= constant_time_compare(mac, _mac(message, secret))
+    if not valid:
+        raise InvalidQRCode("signature")
+    return ticket_id, event_id
+
+
+def qr_hash_from_code(code: str, event_id=None):
+    """`(qr_hash, legacy)` à chercher en base pour le contenu lu par le portique.
+
+    `event_id` : événement contrôlé par le portique, s'il est connu.
+    `legacy` : code opaque d'avant la signature, à ne chercher que parmi les
+    billets `legacy_qr` (et à contrôler en base contre `event_id`).
+    """
+    if "." in code:
+        _, signed_event = verify_payload(code)
+        if event_id is not None and signed_event != int(event_id):
+            raise InvalidQRCode("event")
+        return payload_hash(code), False
+    if settings.TICKET_QR_ACCEPT_LEGACY and _LEGACY.fullmatch(code):
+        return code, True
+    raise InvalidQRCode("format")
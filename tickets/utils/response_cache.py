@@ -0,0 +1,121 @@
+"""
+Cache des réponses de lecture (list / retrieve) des référentiels peu modifiés.
+
+Les événements et les lieux sont lus bien plus souvent qu'ils ne changent ;
+chaque lecture refaisait pourtant les requêtes ORM et la sérialisation DRF.
+`VersionedCacheMixin` met en cache `response.data` sous une clé qui contient
+la version de chaque modèle dont la réponse dépend (`cache_models`).
+
+Les versions sont des compteurs du cache partagé (CACHES["default"]),
+incrémentés par les signaux post_save / post_delete (`tickets/signals.py`)
+après le commit : toute modification rend aussitôt inatteignables les
+réponses qui la précèdent, pour tous les workers et tous les nœuds, sans
+liste de clés à purger ; les anciennes entrées expirent d'elles-mêmes
+(RESPONSE_CACHE_TTL). Les mises à jour en masse (`QuerySet.update`) ne
+déclenchent pas de signal : elles ne doivent pas toucher aux champs exposés
+(les compteurs sold_count / held_count ne le sont pas).
+
+Les réponses ne dépendent pas de l'utilisateur (lecture publique). Les
+compteurs de hits / misses par vue sont tenus dans le même cache
+(`metrics`, commande `response_cache_stats`) ; chaque réponse porte un
+en-tête `X-Cache: HIT|MISS`.
+
+Désactivé par défaut (RESPONSE_CACHE_ENABLED).
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+CACHE_HEADER = "X-Cache"
+OUTCOMES = ("hits", "misses")
+
+
+def _version_key(model) -> str:
+    return f"tickets:version:{model._meta.label_lower}"
+
+
+def bump_version(model) -> None:
+    """Nouvelle version du modèle : les réponses en cache qui en dépendent ne sont plus servies."""
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Compteur absent (premier usage, éviction) : repartir d'une valeur jamais servie
+        cache.set(key, time.time_ns(), None)
+
+
+def versions(models) -> list:
+    """Versions courantes des modèles (un aller-retour vers le cache)."""
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def metrics(names) -> dict:
+    """Hits, misses et taux de hits par vue."""
+    keys = {(name, outcome): f"tickets:response_cache:{outcome}:{name}" for name in names for outcome in OUTCOMES}
+    counts = cache.get_many(keys.values())
+    stats = {}
+    for name in names:
+        hits, misses = (counts.get(keys[name, outcome], 0) for outcome in OUTCOMES)
+        stats[name] = {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else None}
+    return stats
+
+
+def reset_metrics(names) -> None:
+    cache.delete_many([f"tickets:response_cache:{outcome}:{name}" for name in names for outcome in OUTCOMES])
+
+
+def _record(name: str, outcome: str) -> None:
+    key = f"tickets:response_cache:{outcome}:{name}"
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+class VersionedCacheMixin:
+    """list / retrieve servis depuis le cache tant que `cache_models` n'ont pas changé.
+
+    `cache_name` identifie la vue (clés et métriques) ; `cache_models` liste
+    les modèles présents dans la réponse, sérialiseurs imbriqués compris.
+    """
+    cache_name = None
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, "list", super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, "retrieve", super().retrieve, *args, **kwargs)
+
+    def _cached(self, request, action, handler, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return handler(request, *args, **kwargs)
+        key = self._response_key(request, action)
+        data = cache.get(key)
+        if data is not None:
+            _record(self.cache_name, "hits")
+            return Response(data, headers={CACHE_HEADER: "HIT"})
+        _record(self.cache_name, "misses")
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TTL)
+        response[CACHE_HEADER] = "MISS"
+        return response
+
+    def _response_key(self, request, action) -> str:
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.sha1(f"{request.accepted_renderer.format} {request.path}?{query}".encode()).hexdigest()
+        version = ".".join(str(v) for v in versions(self.cache_models))
+        return f"tickets:response:{self.cache_name}:{action}:{version}:{digest}"
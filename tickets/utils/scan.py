@@ -0,0 +1,174 @@
+"""
+Validation des billets au contrôle d'accès.
+
+Le scan est un compare-and-set : un seul `UPDATE ... WHERE qr_hash = %s AND
+status = 'UNUSED'` décide du résultat, le nombre de lignes modifiées valant
+VALID (1) ou DUPLICATE / INVALID (0). Deux portiques qui lisent le même QR au
+même instant ne peuvent donc pas obtenir VALID tous les deux, et aucune
+lecture préalable du billet n'est nécessaire. Un billet HELD (commande pas
+encore payée, cf. `holds.py`) est INVALID.
+
+Le ScanLog est écrit dans la même transaction, ou différé par lots si
+SCAN_LOG_WRITE_BEHIND est actif (cf. `scan_log.py`). Avec SCAN_CACHE_ENABLED,
+billet et libellés viennent de l'index en mémoire (cf. `scan_cache.py`).
+
+`scan_batch` rejoue d'un coup les scans accumulés par un portique resté
+hors-ligne : un seul SELECT FOR UPDATE sur les `qr_hash`, un seul UPDATE,
+un seul `bulk_create` des ScanLog.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from tickets.models import ScanLog, Ticket
+from tickets.utils.scan_cache import scan_cache
+from tickets.utils.scan_log import scan_log_buffer
+
+VALID, DUPLICATE, INVALID = "VALID", "DUPLICATE", "INVALID"
+_UPDATE_CHUNK = 500
+
+
+def scan_ticket(qr_hash: str, device_info: str = "", scanner=None, event_id=None, legacy: bool = False):
+    """Valide un QR-code et journalise le scan.
+
+    `event_id` : événement du portique (billet d'un autre événement → INVALID) ;
+    `legacy` : code opaque, accepté seulement pour un billet `legacy_qr`.
+    Retourne `(résultat, infos)` où `infos` contient `event` et `category`
+    pour un billet connu, `None` sinon.
+    """
+    now = timezone.now()
+    cache = scan_cache() if settings.SCAN_CACHE_ENABLED else None
+    # Lecture / rafraîchissement du cache hors transaction : aucun verrou pris avant l'UPDATE
+    entry = cache.lookup(qr_hash) if cache is not None else None
+    with transaction.atomic():
+        if cache is not None:
+            result, ticket_id, labels = _scan_cached(entry, now, event_id, legacy)
+        else:
+            result, ticket_id, labels = _scan_db(qr_hash, now, event_id, legacy)
+        log = ScanLog(
+            ticket_id=ticket_id,
+            scanner=scanner,
+            result=result,
+            device_info=device_info[:120],
+        )
+        if not settings.SCAN_LOG_WRITE_BEHIND:
+            log.save(force_insert=True)
+        if cache is not None and ticket_id is not None:
+            transaction.on_commit(partial(cache.mark_used, qr_hash))
+    if settings.SCAN_LOG_WRITE_BEHIND:
+        # L'état du billet est committé ; l'audit part dans le lot suivant
+        scan_log_buffer().add(log)
+    if labels is None:
+        return result, None
+    return result, {"event": labels[0], "category": labels[1]}
+
+
+def _scan_db(qr_hash, now, event_id=None, legacy=False):
+    tickets = Ticket.objects.filter(qr_hash=qr_hash)
+    if event_id is not None:
+        tickets = tickets.filter(ticket_type__event_id=event_id)
+    if legacy:
+        tickets = tickets.filter(legacy_qr=True)
+    updated = tickets.filter(status="UNUSED").update(status="USED", scanned_at=now, updated_at=now)
+    ticket = (tickets
+              .values_list("id", "status", "ticket_type__event__title", "ticket_type__name")
+              .first())
+    if ticket is None:
+        return INVALID, None, None
+    if ticket[1] == "HELD":
+        return INVALID, ticket[0], None
+    return (VALID if updated else DUPLICATE), ticket[0], ticket[2:]
+
+
+def _scan_cached(entry, now, event_id=None, legacy=False):
+    """Même arbitrage, sans jointure : le cache fournit pk, statut, événement et libellés."""
+    if (entry is None or (legacy and not entry.legacy)
+            or (event_id is not None and entry.event_id != int(event_id))):
+        return INVALID, None, None
+    updated = 0
+    if entry.status in ("UNUSED", "HELD"):
+        updated = (Ticket.objects.filter(pk=entry.ticket_id, status="UNUSED")
+                   .update(status="USED", scanned_at=now, updated_at=now))
+        # Retenue en cache : payée depuis (VALID ci-dessus) ou toujours en attente
+        if not updated and entry.status == "HELD" and (
+                Ticket.objects.filter(pk=entry.ticket_id, status="HELD").exists()):
+            return INVALID, entry.ticket_id, None
+    return (VALID if updated else DUPLICATE), entry.ticket_id, entry.labels
+
+
+def scan_batch(entries, scanner=None) -> list:
+    """Applique une liste de scans `{qr_hash, scanned_at, device[, legacy]}` horodatés par le portique.
+
+    Le premier scan gagne, d'après l'heure du portique : pour un billet encore
+    UNUSED, l'entrée la plus ancienne du lot est VALID (et fixe `scanned_at`),
+    les autres DUPLICATE. Un billet déjà utilisé ou remboursé reste DUPLICATE ;
+    si le lot prouve une entrée plus ancienne, `scanned_at` est avancé. Un
+    billet HELD (commande non payée) est INVALID, de même qu'un code opaque
+    (`legacy`) qui ne désigne pas un billet `legacy_qr`.
+    Retourne le résultat de chaque entrée, dans l'ordre reçu.
+    """
+    results = [INVALID] * len(entries)
+    # Entrées par billet, de la plus ancienne à la plus récente (tri stable)
+    by_hash = {}
+    for index in sorted(range(len(entries)), key=lambda i: entries[i]["scanned_at"]):
+        by_hash.setdefault(entries[index]["qr_hash"], []).append(index)
+    legacy_hashes = {entry["qr_hash"] for entry in entries if entry.get("legacy")}
+
+    with transaction.atomic():
+        tickets = {
+            qr_hash: (pk, status, scanned_at)
+            for pk, qr_hash, status, scanned_at, legacy_qr in (
+                Ticket.objects.select_for_update()
+                .filter(qr_hash__in=list(by_hash))
+                .values_list("pk", "qr_hash", "status", "scanned_at", "legacy_qr")
+            )
+            if legacy_qr or qr_hash not in legacy_hashes
+        }
+
+        first_scans = {}
+        for qr_hash, indexes in by_hash.items():
+            ticket = tickets.get(qr_hash)
+            if ticket is None or ticket[1] == "HELD":
+                continue
+            pk, status, scanned_at = ticket
+            first = entries[indexes[0]]["scanned_at"]
+            for index in indexes:
+                results[index] = DUPLICATE
+            if status == "UNUSED":
+                results[indexes[0]] = VALID
+                first_scans[pk] = first
+            elif status == "USED" and (scanned_at is None or first < scanned_at):
+                first_scans[pk] = first
+
+        # Un UPDATE par tranche (nombre de paramètres SQL borné)
+        now, pending = timezone.now(), list(first_scans.items())
+        for start in range(0, len(pending), _UPDATE_CHUNK):
+            chunk = pending[start:start + _UPDATE_CHUNK]
+            Ticket.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                status="USED",
+                scanned_at=Case(
+                    *[When(pk=pk, then=Value(moment)) for pk, moment in chunk],
+                    output_field=models.DateTimeField(),
+                ),
+                updated_at=now,
+            )
+
+        ScanLog.objects.bulk_create([
+            ScanLog(
+                ticket_id=tickets[entry["qr_hash"]][0] if entry["qr_hash"] in tickets else None,
+                scanner=scanner,
+                result=result,
+                device_info=entry.get("device", "")[:120],
+                scanned_at=entry["scanned_at"],
+            )
+            for entry, result in zip(entries, results)
+        ], batch_size=1000)
+        if settings.SCAN_CACHE_ENABLED:
+            cache = scan_cache()
+            for qr_hash in by_hash:
+                if qr_hash in tickets:
+                    transaction.on_commit(partial(cache.mark_used, qr_hash))
+    return results
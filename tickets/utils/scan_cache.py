@@ -0,0 +1,156 @@
+"""
+Index `qr_hash` en mémoire pour le jour J (un par worker).
+
+Au premier scan, le worker charge les billets des événements qui commencent
+dans les SCAN_CACHE_WINDOW_HOURS (ou sont en cours) : `qr_hash` → billet,
+statut et libellés (événement, catégorie), ces derniers partagés par
+catégorie. Le scan n'a alors plus besoin de la jointure billet → catégorie →
+événement :
+
+- statut en cache USED / REFUNDED → DUPLICATE sans lecture : ces statuts
+  sont définitifs, le cache ne peut pas être « trop » en retard ;
+- statut UNUSED → le compare-and-set par pk reste l'arbitre (VALID/DUPLICATE) ;
+- statut HELD (commande non payée) → même compare-and-set, INVALID si le
+  billet est toujours retenu en base ;
+- absent → une lecture de `tickets_ticket` seule, sans jointure (INVALID
+  si rien) ; le billet n'est gardé que si son événement est dans la
+  fenêtre, le cache reste borné aux billets du jour.
+
+Les scans de ce worker sont écrits dans le cache après commit ; les
+changements faits ailleurs (autres workers, remboursements) sont relus par
+tampon de version : `updated_at` au-delà du dernier curseur, au plus toutes
+les SCAN_CACHE_REFRESH_INTERVAL secondes. Rechargement complet toutes les
+SCAN_CACHE_RELOAD_INTERVAL secondes (nouveaux événements dans la fenêtre,
+libellés modifiés).
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from tickets.models import Event, Ticket, TicketType
+from tickets.utils.manifest import current_cursor, cursor_datetime
+
+
+class ScanEntry:
+    __slots__ = ("ticket_id", "status", "labels", "event_id", "legacy")
+
+    def __init__(self, ticket_id, status, labels, event_id, legacy=False):
+        self.ticket_id = ticket_id
+        self.status = status
+        self.labels = labels  # (titre de l'événement, catégorie), partagé par catégorie
+        self.event_id = event_id
+        self.legacy = legacy  # QR opaque d'avant la signature (Ticket.legacy_qr)
+
+
+class ScanCache:
+    def __init__(self, window: timedelta, refresh_interval: float, reload_interval: float):
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self._entries = {}
+        self._labels = {}          # ticket_type_id → (événement, catégorie)
+        self._events = {}          # ticket_type_id → id de l'événement
+        self._window_types = set()  # catégories relues par tampon de version
+        self._cursor = None
+        self._loaded_at = self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, qr_hash: str):
+        """Entrée du billet, ou None s'il n'existe pas."""
+        self._maybe_refresh()
+        entry = self._entries.get(qr_hash)
+        if entry is None:
+            row = (Ticket.objects.filter(qr_hash=qr_hash)
+                   .values_list("pk", "status", "ticket_type_id", "legacy_qr").first())
+            if row is None:
+                return None
+            pk, status, ticket_type_id, legacy = row
+            entry = ScanEntry(pk, status, self._labels_for(ticket_type_id), self._events[ticket_type_id], legacy)
+            if ticket_type_id in self._window_types:
+                self._entries[qr_hash] = entry
+        return entry
+
+    def mark_used(self, qr_hash: str) -> None:
+        """Écriture après un scan committé : le billet n'est plus UNUSED."""
+        entry = self._entries.get(qr_hash)
+        if entry is not None and entry.status == "UNUSED":
+            entry.status = "USED"
+
+    def load(self) -> None:
+        cursor = cursor_datetime(current_cursor())
+        now = timezone.now()
+        events = Event.objects.filter(start_time__lte=now + self.window, end_time__gte=now)
+        labels, event_ids = {}, {}
+        for pk, name, title, event_id in (TicketType.objects.filter(event__in=events)
+                                          .values_list("pk", "name", "event__title", "event_id")):
+            labels[pk], event_ids[pk] = (title, name), event_id
+        rows = (Ticket.objects.filter(ticket_type_id__in=list(labels))
+                .values_list("qr_hash", "pk", "status", "ticket_type_id", "legacy_qr"))
+        entries = {
+            qr_hash: ScanEntry(pk, status, labels[ticket_type_id], event_ids[ticket_type_id], legacy)
+            for qr_hash, pk, status, ticket_type_id, legacy in rows.iterator(chunk_size=5000)
+        }
+        self._entries, self._labels, self._events = entries, labels, event_ids
+        self._window_types = set(labels)
+        self._cursor = cursor
+        self._loaded_at = self._refreshed_at = time.monotonic()
+
+    def refresh(self) -> None:
+        """Applique les billets modifiés depuis le dernier tampon de version."""
+        cursor = cursor_datetime(current_cursor())
+        rows = (Ticket.objects.filter(ticket_type_id__in=self._window_types, updated_at__gt=self._cursor)
+                .values_list("qr_hash", "pk", "status", "ticket_type_id", "legacy_qr"))
+        for qr_hash, pk, status, ticket_type_id, legacy in rows.iterator(chunk_size=5000):
+            entry = self._entries.get(qr_hash)
+            if entry is None:
+                self._entries[qr_hash] = ScanEntry(pk, status, self._labels[ticket_type_id],
+                                                   self._events[ticket_type_id], legacy)
+            elif entry.status == "HELD" or (entry.status == "UNUSED" and status != "HELD"):
+                # Statuts monotones (HELD → UNUSED → USED / REFUNDED) : jamais de retour en arrière
+                entry.status = status
+        self._cursor = max(self._cursor, cursor)
+        self._refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self) -> None:
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at >= self.reload_interval:
+                self.load()
+            elif now - self._refreshed_at >= self.refresh_interval:
+                self.refresh()
+
+    def _labels_for(self, ticket_type_id):
+        labels = self._labels.get(ticket_type_id)
+        if labels is None:
+            name, title, event_id = (TicketType.objects.values_list("name", "event__title", "event_id")
+                                     .get(pk=ticket_type_id))
+            labels = self._labels[ticket_type_id] = (title, name)
+            self._events[ticket_type_id] = event_id
+        return labels
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def scan_cache() -> ScanCache:
+    """Cache du processus courant, chargé au premier scan."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScanCache(
+                    window=timedelta(hours=settings.SCAN_CACHE_WINDOW_HOURS),
+                    refresh_interval=settings.SCAN_CACHE_REFRESH_INTERVAL,
+                    reload_interval=settings.SCAN_CACHE_RELOAD_INTERVAL,
+                )
+    return _cache
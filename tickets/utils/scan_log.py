@@ -0,0 +1,124 @@
+"""
+Écriture différée (write-behind) du journal des scans.
+
+À l'ouverture des portes, l'INSERT ScanLog synchrone coûte un aller-retour
+par scan alors que seul l'état du billet doit être durable avant la réponse.
+Les ScanLog sont donc déposés dans une file bornée et écrits par un thread
+du processus, en `bulk_create`, dès que `batch_size` entrées sont prêtes ou
+que `flush_interval` est écoulé depuis la première. File pleine → le scan
+attend une place (back-pressure) plutôt que de perdre l'audit ; la file est
+vidée à l'arrêt du processus (atexit).
+
+Activé par SCAN_LOG_WRITE_BEHIND (désactivé par défaut).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from tickets.models import ScanLog
+
+logger = logging.getLogger(__name__)
+
+
+class ScanLogBuffer:
+    def __init__(self, batch_size: int, flush_interval: float, max_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, log: ScanLog) -> None:
+        self._ensure_started()
+        # Bloque tant que la file est pleine : le débit des scans suit celui des écritures
+        self._queue.put(log)
+
+    def close(self) -> None:
+        """Arrête le thread après avoir écrit tout ce qui est en file."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def flush(self) -> None:
+        """Écrit immédiatement, dans le thread appelant, tout ce qui est en file."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="scanlog-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not (self._stopping.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+        finally:
+            connection.close()  # connexion propre à ce thread
+
+    def _next_batch(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                batch += self._drain(self.batch_size - len(batch))
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        try:
+            ScanLog.objects.bulk_create(batch)
+        except DatabaseError:
+            logger.exception("Écriture de %d ScanLog impossible, entrées perdues", len(batch))
+            connection.close()  # reconnexion au prochain lot
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def scan_log_buffer() -> ScanLogBuffer:
+    """Tampon du processus courant, créé au premier scan."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ScanLogBuffer(
+                    batch_size=settings.SCAN_LOG_BATCH_SIZE,
+                    flush_interval=settings.SCAN_LOG_FLUSH_INTERVAL_MS / 1000,
+                    max_size=settings.SCAN_LOG_QUEUE_SIZE,
+                )
+                atexit.register(_buffer.close)
+    return _buffer
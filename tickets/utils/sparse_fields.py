@@ -0,0 +1,115 @@
+"""
+Champs partiels (`?fields=`) et relations embarquées (`?expand=`) en lecture.
+
+- `?fields=id,title` : seuls ces champs sont rendus, et les colonnes non
+  demandées sont différées (`.only()`) ;
+- `?expand=venue` : seules les relations citées sont embarquées en entier,
+  les autres sont rendues par leur id (ou liste d'ids) ; `?expand=` vide
+  n'embarque rien. Sans paramètre, rien ne change : toutes les relations
+  sont embarquées, comme avant.
+
+Le queryset suit la réponse : `select_related` / `prefetch_related`
+uniquement pour les relations embarquées, une relation rendue par ids est
+préchargée sur sa seule clé, une relation absente n'est pas chargée.
+
+Côté sérialiseur, `SparseFieldsMixin` et `expandable_fields` (nom →
+(fabrique du champ réduit, "select" | "prefetch")), plus `expanded_columns`
+(nom → colonnes du parent relues par la relation embarquée, ex. le titre de
+l'événement dans chaque catégorie : jamais différées, sinon une requête par
+ligne) ; côté vue,
+`SparseFieldsViewMixin` pour list / retrieve. Seul le sérialiseur racine
+est filtré : les sérialiseurs imbriqués gardent tous leurs champs.
+"""
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+def requested_fields(request):
+    """(champs, relations embarquées) demandés ; None = pas de restriction."""
+    def names(param):
+        value = request.query_params.get(param)
+        return None if value is None else {name.strip() for name in value.split(",") if name.strip()}
+
+    fields = names("fields")
+    return fields or None, names("expand")
+
+
+class SparseFieldsMixin:
+    """Sérialiseur dont les champs rendus suivent `?fields=` / `?expand=`."""
+    expandable_fields = {}
+    expanded_columns = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS or not self._is_root():
+            return fields
+        only, expand = requested_fields(request)
+        if expand is not None:
+            for name, (collapsed, _) in self.expandable_fields.items():
+                if name in fields and name not in expand:
+                    fields[name] = collapsed()
+        if only is not None:
+            fields = type(fields)((name, field) for name, field in fields.items()
+                                  if name in only or field.write_only)
+        return fields
+
+    def _is_root(self) -> bool:
+        parent = self.parent
+        return parent is None or (isinstance(parent, ListSerializer) and parent.parent is None)
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        """`queryset` restreint aux colonnes et relations rendues pour cette requête."""
+        only, expand = requested_fields(request)
+        if only is None and expand is None:
+            return queryset
+        model = cls.Meta.model
+        concrete = {}
+        for field in model._meta.concrete_fields:
+            concrete[field.name] = concrete[field.attname] = field.name
+        columns, deferrable = {model._meta.pk.name}, only is not None
+        queryset = queryset.select_related(None).prefetch_related(None)
+
+        for name, field in cls().fields.items():
+            if field.write_only or (only is not None and name not in only):
+                continue
+            if name in cls.expandable_fields:
+                kind = cls.expandable_fields[name][1]
+                expanded = expand is None or name in expand
+                if expanded:
+                    columns.update(cls.expanded_columns.get(name, ()))
+                if kind == "select":
+                    columns.add(name)
+                    if expanded:
+                        queryset = queryset.select_related(name)
+                elif expanded:
+                    queryset = queryset.prefetch_related(name)
+                else:
+                    # Ids seuls : clé primaire et clé de rattachement
+                    remote = model._meta.get_field(name)
+                    related = remote.related_model
+                    queryset = queryset.prefetch_related(
+                        Prefetch(name, queryset=related.objects.only(related._meta.pk.name, remote.field.name))
+                    )
+                continue
+            root = (name if field.source == "*" else field.source).split(".")[0]
+            if root in concrete:
+                columns.add(concrete[root])
+            else:
+                deferrable = False  # propriété ou méthode : colonnes utilisées inconnues
+
+        return queryset.only(*columns) if deferrable else queryset
+
+
+class SparseFieldsViewMixin:
+    """Vue dont le queryset de list / retrieve suit `?fields=` / `?expand=`."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            serializer_class = self.get_serializer_class()
+            if issubclass(serializer_class, SparseFieldsMixin):
+                queryset = serializer_class.sparse_queryset(queryset, self.request)
+        return queryset
@@ -0,0 +1,117 @@
+"""
+File d'attente virtuelle devant la création de commandes (ouvertures de vente).
+
+Sans file, tous les acheteurs d'une grosse ouverture arrivent en même temps
+sur `POST /api/orders/` et s'empilent sur le verrou de ligne TicketType
+jusqu'au timeout des workers : le débit s'effondre. Avec une WaitingRoom
+active, l'acheteur prend d'abord un jeton (`join`) qui lui attribue un
+créneau `admit_at` ; les créneaux sont espacés de 60 / `rate` secondes, donc
+au plus `rate` commandes par minute atteignent les verrous, quelle que soit
+la charge.
+
+- `join` : un UPDATE court sur la ligne WaitingRoom (pas sur Event ni
+  TicketType) ; un acheteur qui a déjà un jeton valide le récupère.
+- `queue_status` : lecture du jeton par clé primaire, la position est
+  calculée depuis `admit_at` (aucun COUNT).
+- `admit` : au moment de la commande, jeton consommé par UPDATE
+  conditionnel, dans la transaction de la commande (rendu si elle échoue).
+  Un jeton manquant, invalide ou pas encore admis est refusé avant tout
+  verrou d'inventaire.
+"""
+import math
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from tickets.models import QueueTicket, WaitingRoom
+
+
+class QueueRejected(Exception):
+    """Commande refusée par la file ; `wait` (s) renseigné si le jeton n'est pas encore admis."""
+
+    def __init__(self, message: str, wait: int = None):
+        super().__init__(message)
+        self.wait = wait
+
+
+def join(event_id, user):
+    """`(jeton, file)` de l'acheteur pour l'événement ; None s'il n'y a pas de file active."""
+    now = timezone.now()
+    existing = (QueueTicket.objects.select_related("event__waiting_room")
+                .filter(event_id=event_id, user=user, used_at__isnull=True, expires_at__gt=now,
+                        event__waiting_room__is_active=True)
+                .order_by("admit_at").first())
+    if existing is not None:
+        # Rejoindre à nouveau ne fait pas reculer (ni avancer) dans la file
+        return existing, existing.event.waiting_room
+    with transaction.atomic():
+        room = WaitingRoom.objects.select_for_update().filter(event_id=event_id, is_active=True).first()
+        if room is None:
+            return None
+        admit_at = max(room.next_slot or now, now)
+        room.next_slot = admit_at + timedelta(seconds=60 / room.rate)
+        room.save(update_fields=["next_slot"])
+    ticket = QueueTicket.objects.create(
+        event_id=event_id, user=user, admit_at=admit_at,
+        expires_at=admit_at + timedelta(seconds=settings.QUEUE_ADMISSION_WINDOW),
+    )
+    return ticket, room
+
+
+def queue_status(ticket: QueueTicket, rate: int) -> dict:
+    """Position estimée et délai conseillé avant le prochain sondage."""
+    now = timezone.now()
+    wait = max((ticket.admit_at - now).total_seconds(), 0)
+    admitted = wait == 0 and ticket.used_at is None and ticket.expires_at > now
+    return {
+        "token": ticket.token,
+        "event": ticket.event_id,
+        "admitted": admitted,
+        "position": math.ceil(wait * rate / 60),
+        "admit_at": ticket.admit_at,
+        "expires_at": ticket.expires_at,
+        # Sondages espacés à mesure que l'admission s'éloigne
+        "poll_after": min(max(math.ceil(wait / 2), 1), settings.QUEUE_POLL_MAX_INTERVAL),
+    }
+
+
+def admit(ticket_type_ids, token, user) -> None:
+    """Contrôle d'admission d'une commande ; lève QueueRejected.
+
+    Sans file active sur les événements commandés, ne fait rien (une requête).
+    À appeler dans la transaction de la commande.
+    """
+    rooms = set(WaitingRoom.objects.filter(event__ticket_types__in=ticket_type_ids, is_active=True)
+                .values_list("event_id", flat=True))
+    if not rooms:
+        return
+    if len(rooms) > 1:
+        raise QueueRejected("Une commande par événement en file d'attente.")
+    if not token:
+        raise QueueRejected("Jeton de file d'attente requis (en-tête X-Queue-Token).")
+    try:
+        token = uuid.UUID(str(token))
+    except ValueError:
+        raise QueueRejected("Jeton de file d'attente invalide, expiré ou déjà utilisé.")
+    event_id, now = rooms.pop(), timezone.now()
+    tickets = QueueTicket.objects.filter(token=token, event_id=event_id, user=user)
+    if tickets.filter(used_at__isnull=True, admit_at__lte=now, expires_at__gt=now).update(used_at=now):
+        return
+    ticket = tickets.first()
+    if ticket is not None and ticket.used_at is None and ticket.admit_at > now:
+        raise QueueRejected("Pas encore admis.", wait=math.ceil((ticket.admit_at - now).total_seconds()))
+    raise QueueRejected("Jeton de file d'attente invalide, expiré ou déjà utilisé.")
+
+
+def purge_expired(chunk_size: int = 1000) -> int:
+    """Supprime les jetons expirés par tranches ; retourne le nombre supprimé."""
+    purged = 0
+    while True:
+        pks = list(QueueTicket.objects.filter(expires_at__lte=timezone.now())
+                   .values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return purged
+        purged += QueueTicket.objects.filter(pk__in=pks).delete()[0]
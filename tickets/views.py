@@ -1,29 +1,110 @@
 # tickets/views.py
 from rest_framework import viewsets, permissions
-from rest_framework.exceptions import ValidationError
-from django.http import FileResponse
+from rest_framework.exceptions import NotFound, PermissionDenied, Throttled, ValidationError
 from rest_framework.decorators import action
-from django.db import IntegrityError
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.http import HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Venue, Event, TicketType, Order, Ticket, ScanLog
-from .serializers import VenueSerializer, EventSerializer, TicketTypeSerializer, OrderSerializer, TicketSerializer
+from .models import Venue, Event, TicketType, Order, Ticket, ScanLog, QueueTicket, WaitingRoom
+from .serializers import (VenueSerializer, EventSerializer, TicketTypeSerializer, OrderSerializer, TicketSerializer,
+                          ScanBatchEntrySerializer, ScanLogSerializer, WaitingRoomSerializer)
+from .pagination import KeysetPagination, ScanLogPagination
+from .utils.availability import availability
+from .utils.export import tickets_export_response
+from .utils.holds import confirm_order, release_orders
+from .utils.http import ConditionalGetMixin, serve_field_file
+from .utils.manifest import build_manifest, manifest_delta, parse_cursor
+from .utils.pdf_queue import ensure_ticket_pdf
+from .utils.qr_signing import InvalidQRCode, qr_hash_from_code
+from .utils.response_cache import VersionedCacheMixin
+from .utils.scan import scan_ticket, scan_batch, VALID, DUPLICATE, INVALID
+from .utils.sparse_fields import SparseFieldsViewMixin
+from .utils.idempotency import IdempotencyConflict, request_fingerprint, run_once
+from .utils.waiting_room import QueueRejected, admit, join, queue_status
 
-class VenueViewSet(viewsets.ModelViewSet):
+class VenueViewSet(ConditionalGetMixin, VersionedCacheMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset           = Venue.objects.all()
     serializer_class   = VenueSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_name         = "venues"
+    cache_models       = (Venue,)
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(ConditionalGetMixin, VersionedCacheMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset           = Event.objects.select_related("venue").prefetch_related("ticket_types")
     serializer_class   = EventSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_name         = "events"
+    cache_models       = (Event, Venue, TicketType)  # lieu et catégories imbriqués dans la réponse
+    etag_relations     = ("venue", "ticket_types")
 
-class TicketTypeViewSet(viewsets.ModelViewSet):
+    # Export guichet (staff) : tous les billets de l'événement, générés en flux
+    @action(detail=True, methods=["get"], url_path=r"tickets\.pdf", permission_classes=[permissions.IsAdminUser])
+    def tickets_pdf(self, request, pk=None):
+        event = self.get_object()
+        return tickets_export_response(Ticket.objects.filter(ticket_type__event=event),
+                                       f"event_{event.id}_tickets", "pdf")
+
+    @action(detail=True, methods=["get"], url_path=r"tickets\.zip", permission_classes=[permissions.IsAdminUser])
+    def tickets_zip(self, request, pk=None):
+        event = self.get_object()
+        return tickets_export_response(Ticket.objects.filter(ticket_type__event=event),
+                                       f"event_{event.id}_tickets", "zip")
+
+    # Portiques hors-ligne (staff) : préfixes des billets valides + deltas depuis un curseur
+    @action(detail=True, methods=["get"], url_path="scan-manifest", permission_classes=[permissions.IsAdminUser])
+    def scan_manifest(self, request, pk=None):
+        event = self.get_object()
+        return HttpResponse(build_manifest(event.pk), content_type="application/octet-stream")
+
+    @action(detail=True, methods=["get"], url_path="scan-manifest/delta", permission_classes=[permissions.IsAdminUser])
+    def scan_manifest_delta(self, request, pk=None):
+        event = self.get_object()
+        try:
+            since = parse_cursor(request.query_params.get("since", ""))
+        except ValueError:
+            raise ValidationError({"since": "Curseur invalide ou absent."})
+        return Response(manifest_delta(event.pk, since))
+
+    # Disponibilités de toutes les catégories (public, sondé à l'ouverture des ventes) : une requête, en cache
+    @action(detail=True, methods=["get"])
+    def availability(self, request, pk=None):
+        data = availability(pk) if str(pk).isdigit() else None
+        if data is None:
+            raise NotFound()
+        return Response(data)
+
+    # File d'attente de l'ouverture des ventes : réglage (staff) puis prise de jeton (acheteurs)
+    @action(detail=True, methods=["get", "put"], url_path="waiting-room", permission_classes=[permissions.IsAdminUser])
+    def waiting_room(self, request, pk=None):
+        event = self.get_object()
+        room = WaitingRoom.objects.filter(event=event).first()
+        if request.method == "PUT":
+            serializer = WaitingRoomSerializer(room, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            room = serializer.save(event=event)
+        elif room is None:
+            return Response({"detail": "Pas de file d'attente pour cet événement."}, status=status.HTTP_404_NOT_FOUND)
+        waiting = QueueTicket.objects.filter(event=event, used_at__isnull=True, admit_at__gt=timezone.now()).count()
+        return Response({**WaitingRoomSerializer(room).data, "waiting": waiting})
+
+    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def queue(self, request, pk=None):
+        joined = join(pk, request.user)
+        if joined is None:
+            return Response({"detail": "Pas de file d'attente active pour cet événement."},
+                            status=status.HTTP_404_NOT_FOUND)
+        ticket, room = joined
+        return Response(queue_status(ticket, room.rate), status=status.HTTP_201_CREATED)
+
+class TicketTypeViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class   = TicketTypeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     queryset           = TicketType.objects.select_related("event").all()  # ✅ permet la route racine
+    etag_relations     = ("event",)  # titre de l'événement dans la réponse
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -63,26 +144,122 @@ class TicketTypeViewSet(viewsets.ModelViewSet):
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class   = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class   = KeysetPagination
 
     def get_queryset(self):
-        qs = Order.objects.prefetch_related("tickets__ticket_type")
+        qs = Order.objects.prefetch_related("tickets__ticket_type", "holds")
         return qs if self.request.user.is_staff else qs.filter(user=self.request.user)
 
-class TicketViewSet(viewsets.ModelViewSet):
+    def create(self, request, *args, **kwargs):
+        # Idempotency-Key : une relance (timeout mobile) rejoue la réponse d'origine sans recréer la commande
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            raise ValidationError({"Idempotency-Key": "255 caractères au plus."})
+        try:
+            return run_once(request.user, key, request_fingerprint(request),
+                            lambda: super(OrderViewSet, self).create(request, *args, **kwargs))
+        except IdempotencyConflict as e:
+            return Response({"detail": str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def perform_create(self, serializer):
+        # File d'attente : jeton contrôlé et consommé avant tout verrou d'inventaire,
+        # rendu avec la transaction si la commande échoue (cf. utils/waiting_room.py)
+        ticket_type_ids = {line["ticket_type"] for line in serializer.validated_data["tickets"]}
+        with transaction.atomic():
+            try:
+                admit(ticket_type_ids, self.request.headers.get("X-Queue-Token"), self.request.user)
+            except QueueRejected as e:
+                if e.wait is not None:
+                    raise Throttled(wait=e.wait, detail=str(e))
+                raise PermissionDenied(str(e))
+            serializer.save()
+
+    # Paiement reçu (back-office / notification du prestataire) : places retenues → vendues
+    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
+    def confirm(self, request, pk=None):
+        order = self.get_object()
+        try:
+            confirm_order(order.pk)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        return Response(self.get_serializer(self.get_object()).data)
+
+    # Abandon par l'acheteur : places rendues sans attendre l'expiration
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        order = self.get_object()
+        if not release_orders([order.pk]):
+            raise ValidationError("Seule une commande en attente de paiement peut être annulée.")
+        return Response(self.get_serializer(self.get_object()).data)
+
+    # Tous les billets de la commande en un seul téléchargement (PDF multi-pages ou ZIP)
+    @action(detail=True, methods=["get"], url_path=r"tickets\.pdf")
+    def tickets_pdf(self, request, pk=None):
+        order = self.get_object()
+        return tickets_export_response(order.tickets.all(), f"order_{order.id}_tickets", "pdf")
+
+    @action(detail=True, methods=["get"], url_path=r"tickets\.zip")
+    def tickets_zip(self, request, pk=None):
+        order = self.get_object()
+        return tickets_export_response(order.tickets.all(), f"order_{order.id}_tickets", "zip")
+
+class TicketViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Ticket.objects.select_related("ticket_type", "order")
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     @action(detail=True, methods=["get"])
     def pdf(self, request, pk=None):
         ticket = self.get_object()
+        if ticket.status == "HELD":
+            # QR scannable une fois imprimé : pas de PDF avant le paiement (cf. utils/holds.py)
+            raise ValidationError("Commande en attente de paiement : billet disponible après confirmation.")
         if not ticket.pdf_file:
-            return Response({"error": "Aucun PDF généré pour ce billet."}, status=404)
-        return FileResponse(
-            ticket.pdf_file.open(),
-            as_attachment=True,
-            filename=f"ticket_{ticket.id}.pdf"
-        )
+            # Mode "lazy" (ou job pas encore traité) : rendu au premier téléchargement,
+            # puis la copie stockée est servie aux appels suivants
+            ticket = ensure_ticket_pdf(ticket.pk)
+        # ETag / Range / X-Accel-Redirect, une fois les droits vérifiés par get_object()
+        return serve_field_file(request, ticket.pdf_file, f"ticket_{ticket.id}.pdf")
+
+class ScanLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Historique des scans (staff), du plus récent au plus ancien ; filtres ?event= et ?result=."""
+    queryset           = ScanLog.objects.all()
+    serializer_class   = ScanLogSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class   = ScanLogPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        event = self.request.query_params.get("event")
+        if event:
+            if not event.isdigit():
+                raise ValidationError({"event": "Identifiant d'événement invalide."})
+            qs = qs.filter(ticket__ticket_type__event_id=event)
+        result = self.request.query_params.get("result")
+        if result:
+            qs = qs.filter(result=result.upper())
+        return qs
+
+class QueueStatusView(APIView):
+    """
+    Sondage de la file d'attente : position estimée et admission.
+    Le jeton (aléatoire) sert de secret : ni session ni authentification,
+    une seule lecture par clé primaire.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, token):
+        # File supprimée après l'émission du jeton : jeton caduc, comme un jeton inconnu
+        ticket = (QueueTicket.objects.select_related("event__waiting_room")
+                  .filter(pk=token, event__waiting_room__isnull=False).first())
+        if ticket is None:
+            return Response({"detail": "Jeton inconnu."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(queue_status(ticket, ticket.event.waiting_room.rate))
+
 
 class TicketScanView(APIView):
     """
@@ -90,58 +267,70 @@ class TicketScanView(APIView):
     Elle retourne un statut : 
     - VALID     → billet valide et première utilisation
     - DUPLICATE → billet déjà scanné
-    - INVALID   → billet introuvable
+    - INVALID   → billet introuvable, signature invalide ou autre événement
     """
 
     def post(self, request):
-        # Récupération du hash QR envoyé par le client (lecteur QR ou app mobile)
-        qr_hash = request.data.get("qr_hash")
-        if not qr_hash:
+        # Contenu du QR lu par le portique (signé) ; "qr_hash" reste accepté pour les anciens billets
+        code = request.data.get("qr") or request.data.get("qr_hash")
+        if not code:
             # Si aucun hash n'est fourni → erreur
             return Response({"error": "QR hash requis"}, status=status.HTTP_400_BAD_REQUEST)
+        event_id = request.data.get("event")
+        if event_id is not None and not str(event_id).isdigit():
+            return Response({"error": "Événement invalide"}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Signature et événement vérifiés avant toute requête
         try:
-            # On cherche le ticket correspondant dans la base
-            ticket = Ticket.objects.select_related("ticket_type__event").get(qr_hash=qr_hash)
-        except Ticket.DoesNotExist:
-            # Si aucun ticket trouvé → on log comme INVALID
-            ScanLog.objects.create(result="INVALID", device_info=request.META.get("HTTP_USER_AGENT", ""))
-            return Response({"result": "INVALID"}, status=status.HTTP_404_NOT_FOUND)
-
-        # Si le ticket est encore valide et jamais scanné
-        if ticket.status == "UNUSED":
-            # On marque le ticket comme utilisé
-            ticket.mark_used()
-            # On log comme VALID
-            ScanLog.objects.create(ticket=ticket, result="VALID", device_info=request.META.get("HTTP_USER_AGENT", ""))
-            return Response({
-                "result": "VALID",
-                "event": ticket.ticket_type.event.title,   # Nom de l'évènement
-                "category": ticket.ticket_type.name        # Type de billet
-            })
-
-        # Si le ticket existe mais a déjà été scanné → DUPLICATE
-        ScanLog.objects.create(ticket=ticket, result="DUPLICATE", device_info=request.META.get("HTTP_USER_AGENT", ""))
-        return Response({"result": "DUPLICATE"}, status=status.HTTP_400_BAD_REQUEST)
+            qr_hash, legacy = qr_hash_from_code(str(code), event_id)
+        except InvalidQRCode as exc:
+            return Response({"result": INVALID, "reason": exc.reason}, status=status.HTTP_404_NOT_FOUND)
+
+        # Validation atomique + journalisation dans la même transaction (cf. utils/scan.py)
+        result, info = scan_ticket(
+            qr_hash,
+            device_info=request.META.get("HTTP_USER_AGENT", ""),
+            scanner=request.user if request.user.is_authenticated else None,
+            event_id=event_id,
+            legacy=legacy,  # code opaque : billets d'avant la signature seulement, événement contrôlé en base
+        )
+        if result == VALID:
+            # Nom de l'évènement + type de billet
+            return Response({"result": VALID, **info})
+        if result == INVALID:
+            return Response({"result": INVALID}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"result": DUPLICATE}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TicketScanBatchView(APIView):
+    """
+    Rejoue en une requête les scans accumulés par un portique hors-ligne.
+    Corps : liste de {qr_hash, scanned_at, device} ; réponse : un résultat
+    (VALID / DUPLICATE / INVALID) par entrée, dans le même ordre.
+    Réservé aux comptes portiques (staff), comme le manifeste hors-ligne.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
     def post(self, request):
-        qr_hash = request.data.get("qr_hash")
-        if not qr_hash:
-            return Response({"error": "QR hash requis"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ScanBatchEntrySerializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.SCAN_BATCH_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.validated_data
 
-        try:
-            ticket = Ticket.objects.select_related("ticket_type__event").get(qr_hash=qr_hash)
-        except Ticket.DoesNotExist:
-            ScanLog.objects.create(result="INVALID", device_info=request.META.get("HTTP_USER_AGENT", ""))
-            return Response({"result": "INVALID"}, status=status.HTTP_404_NOT_FOUND)
-
-        if ticket.status == "UNUSED":
-            ticket.mark_used()
-            ScanLog.objects.create(ticket=ticket, result="VALID", device_info=request.META.get("HTTP_USER_AGENT", ""))
-            return Response({
-                "result": "VALID",
-                "event": ticket.ticket_type.event.title,
-                "category": ticket.ticket_type.name
-            })
-
-        ScanLog.objects.create(ticket=ticket, result="DUPLICATE", device_info=request.META.get("HTTP_USER_AGENT", ""))
-        return Response({"result": "DUPLICATE"}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        # Codes forgés / illisibles : INVALID sans passer par la base
+        results, accepted = [INVALID] * len(entries), []
+        for index, entry in enumerate(entries):
+            try:
+                qr_hash, legacy = qr_hash_from_code(entry["qr_hash"])
+                accepted.append((index, {**entry, "qr_hash": qr_hash, "legacy": legacy}))
+            except InvalidQRCode:
+                pass
+        if accepted:
+            scanner = request.user if request.user.is_authenticated else None
+            applied = scan_batch([entry for _, entry in accepted], scanner=scanner)
+            for (index, _), result in zip(accepted, applied):
+                results[index] = result
+        return Response([
+            {"qr_hash": entry["qr_hash"], "result": result} for entry, result in zip(entries, results)
+        ])